@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Exporter result streams benchmark.
+
+Compares the throughput (records/second) of the exporter result streams on a
+synthetic dump, e.g.::
+
+    $ python benchmarks/exporter_streams.py --records 1000000 --workers 8
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import time
+
+from zenodo.modules.exporter import BZip2ResultStream, \
+    ParallelBZip2ResultStream, ParallelGzipResultStream
+
+
+class Hit(dict):
+    """Search hit."""
+
+    def __init__(self, source):
+        """Initialize hit."""
+        super(Hit, self).__init__(source)
+
+        class Meta(object):
+            id = source['id']
+
+        self.meta = Meta()
+        self._d_ = source
+
+
+class SyntheticSearch(object):
+    """Search returning synthetic records."""
+
+    def __init__(self, count):
+        """Initialize search."""
+        self.count = count
+
+    def scan(self):
+        """Generate the records."""
+        for i in range(self.count):
+            yield Hit({
+                'id': i,
+                'recid': i,
+                'doi': '10.5281/zenodo.{}'.format(i),
+                'title': 'Synthetic record {}'.format(i),
+                'description': 'Lorem ipsum dolor sit amet. ' * 20,
+                'creators': [{'name': 'Doe, John', 'affiliation': 'CERN'}],
+                'keywords': ['synthetic', 'benchmark', str(i % 100)],
+            })
+
+
+class Serializer(object):
+    """JSON lines serializer."""
+
+    def serialize_exporter(self, pid, record):
+        """Serialize a record."""
+        return json.dumps(record['_source']).encode('utf8') + b'\n'
+
+
+def run(stream_cls, records, **kwargs):
+    """Read the whole stream, returning records/second and output size."""
+    stream = stream_cls(
+        SyntheticSearch(records), lambda id_, hit: id_, Serializer(),
+        **kwargs)
+    size = 0
+    start = time.time()
+    data = stream.read()
+    while data:
+        size += len(data)
+        data = stream.read()
+    return records / (time.time() - start), size
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    streams = [
+        (BZip2ResultStream, {}),
+        (ParallelBZip2ResultStream, {'workers': args.workers}),
+        (ParallelGzipResultStream, {'workers': args.workers}),
+    ]
+    for stream_cls, kwargs in streams:
+        rate, size = run(stream_cls, args.records, **kwargs)
+        print('{0:<30} {1:>12.0f} records/s {2:>14} bytes'.format(
+            stream_cls.__name__, rate, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""File download permission checks benchmark.
+
+Measures the permission checks per second done for the file downloads of an
+existing record, with the record of the bucket resolved once per check, once
+per request, and through the shared cache, e.g.::
+
+    $ python benchmarks/files_permissions.py --recid 123 --requests 2000
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import time
+
+from invenio_pidstore.models import PersistentIdentifier
+
+from zenodo.factory import create_app
+from zenodo.modules.records.api import ZenodoRecord
+from zenodo.modules.records.permissions import files_permission_factory
+
+CHECKS_PER_REQUEST = 3
+"""Permission checks per download (object read, bucket read, stats)."""
+
+
+def run(app, bucket, requests, per_check_context=False):
+    """Run the permission checks of file downloads, returning checks/s."""
+    start = time.time()
+    for _ in range(requests):
+        if per_check_context:
+            for _ in range(CHECKS_PER_REQUEST):
+                with app.test_request_context():
+                    files_permission_factory(bucket, 'object-read').can()
+        else:
+            with app.test_request_context():
+                for _ in range(CHECKS_PER_REQUEST):
+                    files_permission_factory(bucket, 'object-read').can()
+    return requests * CHECKS_PER_REQUEST / (time.time() - start)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recid', required=True)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        pid = PersistentIdentifier.get('recid', args.recid)
+        bucket = ZenodoRecord.get_record(pid.object_uuid).files.bucket
+        timeout = app.config['ZENODO_RECORDS_BUCKET_CACHE_TIMEOUT']
+        modes = [
+            ('per check', 0, True),
+            ('per request', 0, False),
+            ('shared cache', timeout, False),
+        ]
+        for name, cache_timeout, per_check_context in modes:
+            app.config['ZENODO_RECORDS_BUCKET_CACHE_TIMEOUT'] = cache_timeout
+            rate = run(app, bucket, args.requests, per_check_context)
+            print('{0:<15} {1:>10.0f} checks/s'.format(name, rate))
+
+
+if __name__ == '__main__':
+    main()
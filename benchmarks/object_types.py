@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+
+"""Object type lookups benchmark.
+
+Measures the object type lookups per second done when serializing the
+resource type of records, e.g.::
+
+    $ python benchmarks/object_types.py --lookups 100000
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+from timeit import timeit
+
+from zenodo.modules.records.models import ObjectType
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lookups', type=int, default=100000)
+    args = parser.parse_args()
+
+    resource_type = {'type': 'publication', 'subtype': 'article'}
+    lookups = [
+        ('get', lambda: ObjectType.get('publication-article')),
+        ('get_by_dict', lambda: ObjectType.get_by_dict(resource_type)),
+    ]
+    for name, lookup in lookups:
+        duration = timeit(lookup, number=args.lookups)
+        print('{0:<15} {1:>10.0f} lookups/s'.format(
+            name, args.lookups / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+
+"""ScienceData preserved objects listing benchmark.
+
+Measures the time to list the first and a deep page of the preserved objects
+of a user, with their latest releases, among many synthetic objects. The
+objects are inserted in a transaction which is rolled back at the end, e.g.::
+
+    $ python benchmarks/sciencedata_objects.py --user-id 1 --objects 100000
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from invenio_db import db
+
+from zenodo.factory import create_app
+from zenodo.modules.sciencedata.models import Release, ReleaseStatus, \
+    ScienceDataObject
+
+
+def insert_objects(user_id, count):
+    """Bulk insert synthetic objects with a release history for a tenth."""
+    start = datetime(2022, 1, 1)
+    objects, releases = [], []
+    for i in range(count):
+        created = start + timedelta(seconds=i)
+        objects.append(dict(
+            id=uuid.uuid4(), created=created, updated=created,
+            path=u'/benchmark-{0}'.format(i), name=u'benchmark-{0}'.format(i),
+            kind=u'file', group=u'', user_id=user_id,
+        ))
+    for row in objects[::10]:
+        for v in range(1, 4):
+            created = row['created'] + timedelta(days=v)
+            releases.append(dict(
+                id=uuid.uuid4(), created=created, updated=created,
+                version=str(v), sciencedata_object_id=row['id'],
+                status=ReleaseStatus.PUBLISHED,
+            ))
+    db.session.execute(ScienceDataObject.__table__.insert(), objects)
+    db.session.execute(Release.__table__.insert(), releases)
+    return [row['id'] for row in reversed(objects)]
+
+
+def fetch_page(user_id, after, limit):
+    """List a page of objects with their latest releases, returning seconds."""
+    db.session.expire_all()
+    start = time.time()
+    page = ScienceDataObject.get_user_objects(
+        user_id, after=after, limit=limit)
+    Release.get_latest([o.id for o in page])
+    return time.time() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--objects', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            ids = insert_objects(args.user_id, args.objects)
+            deep = ids[-args.limit - 1]
+            for name, after in (('first page', None), ('deep page', deep)):
+                duration = fetch_page(args.user_id, after, args.limit)
+                print('{0:<15} {1:>10.3f}s'.format(name, duration))
+        finally:
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,9 @@ extras_require = {
         'Sphinx>=1.5,<1.6',
     ],
     'tests': tests_require,
+    'zstd': [
+        'zstandard>=0.13.0',
+    ],
 }
 
 extras_require['all'] = []
@@ -237,6 +240,7 @@ setup(
             'zenodo_rest = zenodo.modules.rest.views:blueprint',
             'zenodo_deposit = zenodo.modules.deposit.views_rest:blueprint',
             'zenodo_metrics = zenodo.modules.metrics.views:blueprint',
+            'zenodo_records = zenodo.modules.records.views_rest:blueprint',
             #'zenodo_sciencedata = zenodo.modules.sciencedata.views.sciencedata:blueprint', # This will break things. See invenio_deposit/ext.py.
         ],
         'invenio_base.api_converters': [
@@ -252,10 +256,12 @@ setup(
             'zenodo_sipstore = zenodo.modules.sipstore.tasks',
             'zenodo_sitemap = zenodo.modules.sitemap.tasks',
             'zenodo_exporter = zenodo.modules.exporter.tasks',
+            'zenodo_metrics = zenodo.modules.metrics.tasks',
             # Trying this out. FO
             'invenio_stats = invenio_stats.stats.tasks',
             'zenodo_stats = zenodo.modules.stats.tasks',
             'zenodo_communities = zenodo.modules.communities.tasks',
+            'zenodo_sciencedata = zenodo.modules.sciencedata.tasks',
         ],
         'invenio_config.module': [
             'zenodo = zenodo.config',
@@ -306,8 +312,15 @@ setup(
             'zenodo_stats_queries = zenodo.modules.stats.registrations:register_queries',
             'zenodo_stats_aggregations = zenodo.modules.stats.registrations:register_aggregations',
         ],
-        "invenio_db.alembic": ["zenodo_spam = zenodo.modules.spam:alembic"],
-        "invenio_db.models": ["zenodo_spam = zenodo.modules.spam.models"],
+        "invenio_db.alembic": [
+            "zenodo_records = zenodo.modules.records:alembic",
+            "zenodo_spam = zenodo.modules.spam:alembic",
+            "zenodo_metrics = zenodo.modules.metrics:alembic",
+        ],
+        "invenio_db.models": [
+            "zenodo_spam = zenodo.modules.spam.models",
+            "zenodo_metrics = zenodo.modules.metrics.models",
+        ],
     },
     extras_require=extras_require,
     install_requires=install_requires,
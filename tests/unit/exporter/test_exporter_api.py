@@ -26,10 +26,14 @@
 
 from __future__ import absolute_import, print_function
 
+import json
+
 from invenio_files_rest.models import ObjectVersion
 from invenio_indexer.api import RecordIndexer
 from invenio_search import current_search
 
+from zenodo.modules.exporter.checkpoints import ExportCheckpoint, \
+    ExportWatermark
 from zenodo.modules.exporter.tasks import export_job
 
 
@@ -43,3 +47,63 @@ def test_exporter(app, db, es, exporter_bucket, record_with_files_creation):
         assert ObjectVersion.get_by_bucket(exporter_bucket).count() == 0
         export_job(job_id='records')
         assert ObjectVersion.get_by_bucket(exporter_bucket).count() == 1
+
+
+def test_sharded_exporter(app, db, es, exporter_bucket,
+                          record_with_files_creation):
+    """Test resuming a sharded record export."""
+    pid, record, record_url = record_with_files_creation
+    RecordIndexer().index_by_id(record.id)
+    current_search.flush_and_refresh('records')
+
+    jobs = app.config['EXPORTER_JOBS']
+    app.config['EXPORTER_JOBS'] = dict(
+        jobs, records=dict(jobs['records'], shards=3))
+    try:
+        # Simulate a crashed run, where only the first shard finished.
+        checkpoint = ExportCheckpoint('records')
+        checkpoint.start('records-test.json.bz2', 3)
+        checkpoint.mark_done(0, {'key': 'records-test.json.bz2.part-0000'})
+
+        export_job(job_id='records')
+
+        keys = {o.key for o in ObjectVersion.get_by_bucket(exporter_bucket)}
+        assert keys == {
+            'records-test.json.bz2.part-0001',
+            'records-test.json.bz2.part-0002',
+            'records-test.json.bz2.manifest.json',
+        }
+        manifest = ObjectVersion.get(
+            exporter_bucket, 'records-test.json.bz2.manifest.json')
+        with manifest.file.storage().open() as fp:
+            parts = json.loads(fp.read().decode('utf8'))['parts']
+        assert [p['key'] for p in parts] == [
+            'records-test.json.bz2.part-0000',
+            'records-test.json.bz2.part-0001',
+            'records-test.json.bz2.part-0002',
+        ]
+        assert checkpoint.get() is None
+    finally:
+        app.config['EXPORTER_JOBS'] = jobs
+
+
+def test_delta_exporter(app, db, es, exporter_bucket,
+                        record_with_files_creation):
+    """Test incremental record export."""
+    pid, record, record_url = record_with_files_creation
+    RecordIndexer().index_by_id(record.id)
+    current_search.flush_and_refresh('records')
+
+    export_job(job_id='records')
+    watermark = ExportWatermark('records').get()
+    assert watermark
+
+    export_job(job_id='records-delta')
+    assert ExportWatermark('records-delta').get() >= watermark
+    delta = [o for o in ObjectVersion.get_by_bucket(exporter_bucket)
+             if o.key.startswith('records-delta-')]
+    assert len(delta) == 2
+    removed = [o for o in delta if o.key.endswith('.removed.json')][0]
+    with removed.file.storage().open() as fp:
+        data = json.loads(fp.read().decode('utf8'))
+    assert data == {'since': watermark.isoformat(), 'removed': []}
@@ -27,10 +27,12 @@
 from __future__ import absolute_import, print_function
 
 import bz2
+import zlib
 
 import pytest
 
-from zenodo.modules.exporter import BZip2ResultStream, ResultStream
+from zenodo.modules.exporter import BZip2ResultStream, \
+    ParallelBZip2ResultStream, ParallelGzipResultStream, ResultStream
 
 
 @pytest.fixture()
@@ -101,3 +103,39 @@ def test_resultstream(bzip2resultstream):
 
     assert bzip2resultstream.read() == data
     assert bzip2resultstream.read() == b''
+
+
+@pytest.mark.parametrize('stream_cls,decompress', [
+    (ParallelBZip2ResultStream, bz2.BZ2Decompressor),
+    (ParallelGzipResultStream,
+     lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)),
+])
+def test_parallel_resultstream(searchobj, serializerobj, fetcher, stream_cls,
+                               decompress):
+    """Test parallel compressed result stream."""
+    # One record per block, compressed in order as independent streams.
+    stream = stream_cls(
+        searchobj, fetcher, serializerobj, block_size=1, workers=2)
+    blocks = []
+    data = stream.read()
+    while data:
+        blocks.append(data)
+        data = stream.read()
+    assert len(blocks) == 2
+    assert [decompress().decompress(b) for b in blocks] == \
+        [b'test 1', b'test 2']
+    assert stream.read() == b''
+
+
+def test_parallel_resultstream_close(searchobj, serializerobj, fetcher):
+    """Test closing a parallel result stream before reading it all."""
+    stream = ParallelGzipResultStream(
+        searchobj, fetcher, serializerobj, block_size=1, workers=2)
+    assert stream.read()
+    pool = stream._pool
+    stream.close()
+    assert stream._pool is None
+    # The pool is not running anymore
+    with pytest.raises((AssertionError, ValueError)):
+        pool.apply_async(len, (b'', ))
+    assert stream.read() == b''
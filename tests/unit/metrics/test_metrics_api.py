@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test Zenodo metrics API."""
+
+from datetime import datetime, timedelta
+
+from zenodo.modules.metrics.api import ZenodoMetric, update_daily_aggregates
+from zenodo.modules.metrics.hll import HyperLogLog
+from zenodo.modules.metrics.models import DailyAggregate
+
+
+def test_hyperloglog():
+    a, b = HyperLogLog(), HyperLogLog()
+    assert a.count() == 0
+    for i in range(3000):
+        a.add(u'visitor-{}'.format(i))
+        a.add(u'visitor-{}'.format(i))
+    for i in range(2000, 6000):
+        b.add(u'visitor-{}'.format(i))
+    assert abs(a.count() - 3000) < 3000 * 0.05
+    assert abs(b.count() - 4000) < 4000 * 0.05
+
+    a.update(b)
+    assert abs(a.count() - 6000) < 6000 * 0.05
+    assert HyperLogLog.from_bytes(a.to_bytes()).count() == a.count()
+
+
+def test_daily_aggregates(app, db, es):
+    today = datetime.utcnow().date()
+    start_date = today - timedelta(days=5)
+    old_start_date = app.config['ZENODO_METRICS_START_DATE']
+    app.config['ZENODO_METRICS_START_DATE'] = datetime.combine(
+        start_date, datetime.min.time())
+
+    assert ZenodoMetric.get_visitors() == 0
+
+    update_daily_aggregates()
+    aggregates = DailyAggregate.query.order_by(DailyAggregate.date).all()
+    assert [a.date for a in aggregates] == \
+        [start_date + timedelta(days=d) for d in range(3)]
+
+    # Only new days are aggregated
+    update_daily_aggregates(until=today)
+    assert DailyAggregate.last_date() == today - timedelta(days=1)
+
+    sketch = HyperLogLog()
+    for visitor in ('a', 'b', 'c'):
+        sketch.add(visitor)
+    aggregate = DailyAggregate.query.get(start_date)
+    aggregate.download_volume = 100
+    aggregate.upload_volume = 20
+    aggregate.visitors = sketch.to_bytes()
+    db.session.commit()
+
+    assert ZenodoMetric.get_data_transfer() == 120
+    assert ZenodoMetric.get_visitors() == 3
+
+    # Days before the start date are ignored
+    app.config['ZENODO_METRICS_START_DATE'] = datetime.combine(
+        start_date + timedelta(days=1), datetime.min.time())
+    assert ZenodoMetric.get_data_transfer() == 0
+    assert ZenodoMetric.get_visitors() == 0
+
+    app.config['ZENODO_METRICS_START_DATE'] = old_start_date
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test Zenodo runtime instrumentation."""
+
+from elasticsearch.connection import RequestsHttpConnection, \
+    Urllib3HttpConnection
+
+from zenodo.modules.metrics.instrumentation import Counter, Histogram, \
+    InstrumentedConnectionMixin, Registry, instrumented_connection_class
+
+
+def test_histogram():
+    registry = Registry()
+    histogram = Histogram('test_duration_seconds', 'Test durations.',
+                          ('format', ), buckets=(0.1, 1), registry=registry)
+    child = histogram.labels('json')
+    assert histogram.labels('json') is child
+
+    child.observe(0.1)
+    child.observe(0.5)
+    child.observe(5)
+    with child.time():
+        pass
+    assert child.timed(lambda x: x * 2)(21) == 42
+
+    assert registry.render(registry.snapshot()).splitlines()[:7] == [
+        '# HELP test_duration_seconds Test durations.',
+        '# TYPE test_duration_seconds histogram',
+        'test_duration_seconds_bucket{format="json",le="0.1"} 3',
+        'test_duration_seconds_bucket{format="json",le="1.0"} 4',
+        'test_duration_seconds_bucket{format="json",le="+Inf"} 5',
+        'test_duration_seconds_sum{format="json"} ' + repr(
+            child.values()[-1]),
+        'test_duration_seconds_count{format="json"} 5',
+    ]
+
+
+def test_counter():
+    registry = Registry()
+    counter = Counter('test_total', 'Test counter.', ('task', ),
+                      registry=registry)
+    counter.labels('a"b').inc()
+    counter.labels('a"b').inc(2)
+    assert registry.render(registry.snapshot()) == (
+        '# HELP test_total Test counter.\n'
+        '# TYPE test_total counter\n'
+        'test_total{task="a\\"b"} 3.0\n'
+    )
+
+
+def test_instrumented_connection_class():
+    default = instrumented_connection_class()
+    assert issubclass(default, Urllib3HttpConnection)
+    assert issubclass(default, InstrumentedConnectionMixin)
+    assert instrumented_connection_class(default) is default
+
+    configured = instrumented_connection_class(
+        'elasticsearch.connection:RequestsHttpConnection')
+    assert issubclass(configured, RequestsHttpConnection)
+    assert not issubclass(configured, Urllib3HttpConnection)
+
+
+def test_runtime_metrics_view(app, db, es):
+    with app.test_client() as client:
+        res = client.get('/api/metrics/runtime')
+        assert res.status_code == 200
+        res = client.get('/api/metrics/runtime')
+        data = res.get_data(as_text=True)
+        assert '# TYPE zenodo_serializer_duration_seconds histogram' in data
+        assert 'zenodo_request_db_queries_count' \
+            '{endpoint="zenodo_metrics.runtime_metrics"}' in data
@@ -23,7 +23,13 @@
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 
 """Test Zenodo metrics utils."""
-from zenodo.modules.metrics.utils import calculate_metrics, formatted_response
+from flask import current_app
+from invenio_cache import current_cache
+from mock import patch
+
+from zenodo.modules.metrics.utils import cache_key, calculate_metrics, \
+    formatted_durations, formatted_response, get_metrics, lock_key, \
+    refresh_metrics
 
 
 def test_calculate_metrics(app, db, es, cache, use_metrics_config):
@@ -79,3 +85,49 @@ def test_formatted_response(app, use_metrics_config):
     calculated_response = formatted_response(metrics)
 
     assert calculated_response == expected_response
+
+
+def test_metrics_stale_while_revalidate(app, db, es, cache,
+                                        use_metrics_config):
+    metric_id = 'openaire-nexus'
+    entry = get_metrics(metric_id)
+    assert [m['value'] for m in entry['metrics']] == [0, 0, 0, 0]
+    assert [n for n, _ in entry['durations']] == \
+        [m['name'] for m in entry['metrics']]
+
+    # A stale entry is served and recomputed (eagerly, in tests)
+    entry['updated'] -= current_app.config['ZENODO_METRICS_CACHE_TIMEOUT'] + 1
+    entry['metrics'][0]['value'] = 42
+    current_cache.set(cache_key(metric_id), entry, timeout=-1)
+    assert get_metrics(metric_id)['metrics'][0]['value'] == 42
+    assert get_metrics(metric_id)['metrics'][0]['value'] == 0
+
+    # No recomputation while someone else holds the lock
+    current_cache.set(lock_key(metric_id), True, timeout=-1)
+    assert refresh_metrics(metric_id) is None
+    current_cache.delete(cache_key(metric_id))
+    assert get_metrics(metric_id) is None
+    assert calculate_metrics(metric_id) == []
+    current_cache.delete(lock_key(metric_id))
+    assert refresh_metrics(metric_id) is not None
+    assert current_cache.get(lock_key(metric_id)) is None
+
+    # A lock which expired and was acquired by someone else is kept
+    def _compute_metrics(metric_id):
+        current_cache.set(lock_key(metric_id), 'other', timeout=-1)
+
+    with patch('zenodo.modules.metrics.utils.compute_metrics',
+               side_effect=_compute_metrics):
+        refresh_metrics(metric_id)
+    assert current_cache.get(lock_key(metric_id)) == 'other'
+    current_cache.delete(lock_key(metric_id))
+
+
+def test_formatted_durations(app):
+    assert formatted_durations([('zenodo_files', 0.5)]) == (
+        '# HELP zenodo_metrics_compute_duration_seconds Time spent '
+        'computing each metric.\n'
+        '# TYPE zenodo_metrics_compute_duration_seconds gauge\n'
+        'zenodo_metrics_compute_duration_seconds{metric="zenodo_files"} '
+        '0.500000\n'
+    )
@@ -47,7 +47,20 @@ def test_metrics(app, db, es, use_metrics_config):
     with app.test_client() as client:
         res = client.get("/api/metrics/openaire-nexus")
         assert res.status_code == 200
-        assert res.get_data() == expected_data
+        data = res.get_data()
+        assert data.startswith(expected_data)
+        durations = data[len(expected_data):].splitlines()
+        assert durations[:2] == [
+            '# HELP zenodo_metrics_compute_duration_seconds Time spent '
+            'computing each metric.',
+            '# TYPE zenodo_metrics_compute_duration_seconds gauge',
+        ]
+        assert [l.split(' ')[0] for l in durations[2:]] == [
+            'zenodo_metrics_compute_duration_seconds{metric="%s"}' % name
+            for name in ('zenodo_unique_visitors_web_total',
+                         'zenodo_researchers_total', 'zenodo_files_total',
+                         'zenodo_communities_total')
+        ]
 
 
 def test_metrics_invalid_key(app):
@@ -26,8 +26,11 @@
 
 from __future__ import absolute_import, print_function
 
+from copy import deepcopy
 from datetime import datetime, timedelta
 
+import pytest
+
 from invenio_indexer.api import RecordIndexer
 from invenio_records.api import Record
 from invenio_search import current_search
@@ -140,3 +143,39 @@ def test_object_type():
         _assert_obj(ObjectType.get(t))
 
     assert ObjectType.get('invalid') is None
+
+
+def test_object_type_resolved():
+    """Test the precomputed resolved object types."""
+    book = ObjectType.get('publication-book')
+    assert book is ObjectType.get_by_dict(
+        {'type': 'publication', 'subtype': 'book'})
+    assert book['parent'] is ObjectType.get('publication')
+    assert book in book['parent']['children']
+    assert deepcopy(book) is book
+
+    with pytest.raises(TypeError):
+        book['title'] = {'en': 'Not a book'}
+    with pytest.raises(TypeError):
+        book['title'].update({'en': 'Not a book'})
+
+    assert ObjectType.get_cff_type('invalid') is None
+
+
+def test_object_type_lookups():
+    """Test the lookups of every object type and subtype."""
+    for type_ in ObjectType.get_types():
+        obj = ObjectType.get(type_)
+        assert obj['internal_id'] == type_
+        assert ObjectType.get_by_dict({'type': type_}) is obj
+        for subtype in ObjectType.subtypes.get(type_, ()):
+            internal_id = '{0}-{1}'.format(type_, subtype)
+            child = ObjectType.get_by_dict({'type': type_, 'subtype': subtype})
+            assert child is ObjectType.get(internal_id)
+            assert child['internal_id'] == internal_id
+            assert child['parent'] is obj
+            assert child in obj['children']
+
+    assert ObjectType.get_by_dict(
+        {'type': 'publication', 'subtype': 'invalid'}) is None
+    assert ObjectType.get_by_dict({}) is None
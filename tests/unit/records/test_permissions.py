@@ -34,8 +34,14 @@ from flask import url_for
 from flask_principal import ActionNeed
 from invenio_access.models import ActionUsers
 from invenio_accounts.models import User
+from invenio_cache import current_cache
+from invenio_db import db as db_
+from sqlalchemy import event
 
 from zenodo.modules.records.models import AccessRight
+from zenodo.modules.records.permissions import files_permission_factory
+from zenodo.modules.records.utils import _bucket_record_cache_key, \
+    get_bucket_record
 
 
 @pytest.mark.parametrize('user,access_right,expected', [
@@ -139,3 +145,58 @@ def test_rat_token(app, db, rat_generate_token, closed_access_record):
         assert res.status_code == 404
         res = client.get(file_url, query_string={'token': rat_token})
         assert res.status_code == 404
+
+
+def test_bucket_record_cache(app, db, record_with_files_creation):
+    """Test the resolution of the record of a bucket."""
+    pid, record, record_url = record_with_files_creation
+    bucket_id = record['_buckets']['record']
+    current_cache.delete(_bucket_record_cache_key(bucket_id))
+    bucket = record.files.bucket
+
+    queries = []
+
+    def count(*args, **kwargs):
+        queries.append(args)
+
+    event.listen(db_.engine, 'before_cursor_execute', count)
+    try:
+        with app.test_request_context():
+            # Object read, bucket read and statistics event
+            for _ in range(3):
+                files_permission_factory(bucket, 'bucket-read')
+                resolved = get_bucket_record(bucket_id)
+            assert len(queries) == 1
+            assert resolved.id == record.id
+            assert resolved.revision_id == record.revision_id
+            assert resolved['recid'] == record['recid']
+
+        # Other requests use the shared cache
+        with app.test_request_context():
+            assert get_bucket_record(bucket_id) == resolved
+        assert len(queries) == 1
+    finally:
+        event.remove(db_.engine, 'before_cursor_execute', count)
+
+    # Updating the record drops the cached resolution
+    record['title'] = 'New title'
+    record.commit()
+    db.session.commit()
+    with app.test_request_context():
+        assert get_bucket_record(bucket_id)['title'] == 'New title'
+        assert files_permission_factory(bucket, 'bucket-read').can()
+
+    # A concurrent request caching the old state before the commit does not
+    # outlive the commit
+    record['access_right'] = AccessRight.CLOSED
+    record.commit()
+    current_cache.set(_bucket_record_cache_key(bucket_id), dict(
+        id=str(record.id), json=dict(record, access_right=AccessRight.OPEN),
+        version_id=record.revision_id))
+    db.session.commit()
+    with app.test_request_context():
+        assert get_bucket_record(bucket_id)['access_right'] == \
+            AccessRight.CLOSED
+        assert not files_permission_factory(bucket, 'bucket-read').can()
+
+    assert get_bucket_record('00000000-0000-0000-0000-000000000000') is None
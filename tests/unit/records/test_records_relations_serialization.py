@@ -22,6 +22,7 @@
 from __future__ import absolute_import, print_function
 
 from helpers import publish_and_expunge
+from invenio_cache import current_cache
 from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidrelations.serializers.utils import serialize_relations
 from invenio_pidstore.models import PersistentIdentifier
@@ -30,7 +31,8 @@ from six import BytesIO, b
 from zenodo.modules.deposit.api import ZenodoDeposit
 from zenodo.modules.deposit.resolvers import deposit_resolver
 from zenodo.modules.records.serializers.pidrelations import \
-    serialize_related_identifiers
+    _version_dois_key, serialize_related_identifiers, \
+    serialize_version_relations
 
 
 def test_relations_serialization(app, db, deposit, deposit_file):
@@ -208,3 +210,64 @@ def test_related_identifiers_serialization(app, db, deposit, deposit_file):
         }
     ]
     assert rids == expected_parent
+
+
+def test_version_relations_bulk_serialization(app, db, deposit, deposit_file):
+    """Serialize the version relations of many PIDs at once."""
+    deposit_v1 = publish_and_expunge(db, deposit)
+    recid_v1, record_v1 = deposit_v1.fetch_published()
+    deposit_v1.newversion()
+    pv = PIDVersioning(child=recid_v1)
+    deposit_v2 = ZenodoDeposit.get_record(
+        pv.draft_child_deposit.get_assigned_object())
+    deposit_v2.files['file.txt'] = BytesIO(b('file1'))
+    deposit_v2 = publish_and_expunge(db, deposit_v2)
+    recid_v2, record_v2 = deposit_v2.fetch_published()
+    recid_v1 = PersistentIdentifier.get('recid', recid_v1.pid_value)
+
+    assert serialize_version_relations([recid_v1, recid_v2]) == {
+        recid_v1.id: serialize_relations(recid_v1),
+        recid_v2.id: serialize_relations(recid_v2),
+    }
+
+    # With a draft version
+    deposit_v2.newversion()
+    assert serialize_version_relations([recid_v1, recid_v2]) == {
+        recid_v1.id: serialize_relations(recid_v1),
+        recid_v2.id: serialize_relations(recid_v2),
+    }
+
+    parent_pid = PersistentIdentifier.get('recid', '1')
+    assert serialize_version_relations([parent_pid]) == {}
+
+
+def test_version_dois_cache(app, db, deposit, deposit_file):
+    """Cached version DOIs are invalidated when publishing a new version."""
+    deposit_v1 = publish_and_expunge(db, deposit)
+    recid_v1, record_v1 = deposit_v1.fetch_published()
+    parent_pid = PersistentIdentifier.get('recid', record_v1['conceptrecid'])
+    assert serialize_related_identifiers(parent_pid) == [{
+        'relation': 'hasVersion',
+        'scheme': 'doi',
+        'identifier': record_v1['doi'],
+    }]
+
+    deposit_v1.newversion()
+    pv = PIDVersioning(child=recid_v1)
+    deposit_v2 = ZenodoDeposit.get_record(
+        pv.draft_child_deposit.get_assigned_object())
+    deposit_v2.files['file.txt'] = BytesIO(b('file1'))
+    deposit_v2.publish()
+    dep_uuid = deposit_v2.id
+    # A concurrent request caching the DOIs before the commit does not
+    # outlive the commit
+    current_cache.set(_version_dois_key(parent_pid.pid_value),
+                      [record_v1['doi']])
+    db.session.commit()
+    db.session.expunge_all()
+    deposit_v2 = ZenodoDeposit.get_record(dep_uuid)
+    recid_v2, record_v2 = deposit_v2.fetch_published()
+
+    assert [r['identifier'] for r in
+            serialize_related_identifiers(parent_pid)] == \
+        [record_v1['doi'], record_v2['doi']]
@@ -26,8 +26,11 @@
 
 from __future__ import absolute_import, print_function
 
+from lxml import etree
+
+from zenodo.modules.records.serializers import datacite_v41
 from zenodo.modules.records.utils import build_record_custom_fields, \
-    is_valid_openaire_type
+    is_valid_openaire_type, validate_xml, xsd41, xsd_validator
 
 
 def test_openaire_type_validation(app):
@@ -96,3 +99,19 @@ def test_build_record_custom_fields(app, full_record, custom_metadata):
             (v['key'], tuple(v['subject']), tuple(v['object']))
             for v in result['custom_relationships']},
     }
+
+
+def test_xsd_validator(db, minimal_record_model, recid_pid):
+    """Test the compiled XML schema validators."""
+    validator = xsd41()
+    assert validator is xsd_validator('datacite-v4.1')
+
+    doc = datacite_v41.serialize(recid_pid, minimal_record_model)
+    validator.assertValid(etree.XML(doc.encode('utf8')))
+
+    errors = validate_xml([
+        doc,
+        '<resource xmlns="http://datacite.org/schema/kernel-4"/>',
+    ])
+    assert errors[0] is None
+    assert errors[1]
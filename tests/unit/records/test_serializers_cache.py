@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the cache of serialized records."""
+
+from __future__ import absolute_import, print_function
+
+from invenio_cache import current_cache
+
+from zenodo.modules.records.serializers import datacite_v41
+from zenodo.modules.records.serializers.cache import CachedSerializer, \
+    cache_metrics
+
+
+def test_serialization_cache(app, db, minimal_record_model, recid_pid):
+    """Test caching of serialized records by revision."""
+    serializer = CachedSerializer(datacite_v41, 'datacite_v41')
+    expected = datacite_v41.serialize(recid_pid, minimal_record_model)
+
+    # Disabled by default
+    assert serializer.serialize(recid_pid, minimal_record_model) == expected
+    assert current_cache.get(
+        serializer.key(minimal_record_model, 'serialize:None')) is None
+
+    app.config['ZENODO_RECORDS_SERIALIZATION_CACHE'] = True
+    try:
+        metrics = cache_metrics(['datacite_v41'])['datacite_v41']
+        for _ in range(2):
+            assert serializer.serialize(
+                recid_pid, minimal_record_model) == expected
+        key = serializer.key(minimal_record_model, 'serialize:None')
+        assert str(minimal_record_model.revision_id) in key
+        assert current_cache.get(key) == expected
+
+        new_metrics = cache_metrics(['datacite_v41'])['datacite_v41']
+        assert new_metrics['misses'] == metrics['misses'] + 1
+        assert new_metrics['hits'] == metrics['hits'] + 1
+
+        # Oversized outputs are not cached
+        app.config['ZENODO_RECORDS_SERIALIZATION_CACHE_MAX_SIZE'] = 10
+        current_cache.delete(key)
+        assert serializer.serialize(
+            recid_pid, minimal_record_model) == expected
+        assert current_cache.get(key) is None
+        assert cache_metrics(['datacite_v41'])['datacite_v41'][
+            'oversized'] == metrics['oversized'] + 1
+    finally:
+        app.config['ZENODO_RECORDS_SERIALIZATION_CACHE'] = False
+        app.config['ZENODO_RECORDS_SERIALIZATION_CACHE_MAX_SIZE'] = \
+            256 * 1024
@@ -33,6 +33,7 @@ from datetime import datetime, timedelta
 import pytest
 from flask import current_app, render_template, render_template_string, url_for
 from helpers import login_user_via_session
+from invenio_cache import current_cache
 from invenio_indexer.api import RecordIndexer
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_records.api import Record
@@ -40,6 +41,7 @@ from invenio_search import current_search
 from mock import Mock, patch
 from six.moves.urllib.parse import urlencode
 
+from zenodo.modules.records.serializers import citeproc_v1
 from zenodo.modules.records.serializers.schemas.common import api_link_for
 from zenodo.modules.records.views import get_reana_badge, zenodo_related_links
 
@@ -234,6 +236,52 @@ def test_citation_formatter_citeproc_get(api, api_client, es, db, full_record,
     assert '(2014).' in res.get_data(as_text=True)
 
 
+def test_citation_batch_get(api, api_client, db, full_record):
+    """Test rendering citations of several records at once."""
+    pids = []
+    for recid in ('12345', '12346'):
+        full_record['recid'] = int(recid)
+        r = Record.create(full_record)
+        pids.append(PersistentIdentifier.create(
+            'recid', recid, object_type='rec', object_uuid=r.id,
+            status=PIDStatus.REGISTERED))
+    db.session.commit()
+
+    with api.test_request_context():
+        citations_url = url_for('zenodo_records_rest.citations')
+
+    res = api_client.get(citations_url, query_string=[
+        ('recid', '12345'), ('recid', '12346'), ('recid', '99999'),
+        ('style', 'apa')])
+    assert res.status_code == 200
+    data = json.loads(res.get_data(as_text=True))
+    assert set(data) == {'12345', '12346'}
+    assert all('Doe, J.' in c for c in data.values())
+
+    # Citations are cached by record revision
+    with api.test_request_context():
+        key = citeproc_v1.citation_key(
+            Record.get_record(pids[0].object_uuid), style='apa')
+    assert current_cache.get(key) == data['12345']
+
+    assert api_client.get(citations_url).status_code == 400
+
+    # Records failing to render are omitted, without failing the batch
+    serialize = citeproc_v1.serialize
+
+    def _serialize(pid, record, **kwargs):
+        if pid.pid_value == '12346':
+            raise ValueError('broken record')
+        return serialize(pid, record, **kwargs)
+
+    with patch.object(citeproc_v1, 'serialize', side_effect=_serialize):
+        res = api_client.get(citations_url, query_string=[
+            ('recid', '12345'), ('recid', '12346'), ('style', 'apa')])
+    assert res.status_code == 200
+    data = json.loads(res.get_data(as_text=True))
+    assert set(data) == {'12345'}
+
+
 @pytest.mark.parametrize(('stats', 'expected_result'), [
     (None, {
         'version_views': '0', 'views': '0',
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Pytest configuration."""
+
+from __future__ import absolute_import, print_function
+
+import threading
+
+import pytest
+from sciencedata_helpers import StandInHandler, StandInServer
+
+
+@pytest.yield_fixture
+def sciencedata_server(app):
+    """Run a ScienceData stand-in server."""
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.clients = []
+    server.paths = []
+    server.cookies = []
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    old_url = app.config['SCIENCEDATA_PRIVATE_URL']
+    app.config['SCIENCEDATA_PRIVATE_URL'] = 'http://{0}:{1}/'.format(
+        *server.server_address)
+    yield server
+    app.config['SCIENCEDATA_PRIVATE_URL'] = old_url
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Helpers for the ScienceData tests."""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import json
+
+from six.moves import BaseHTTPServer, socketserver
+
+PAGE = b''.join(
+    b'<li><a href="/files/doc-%d">doc</a><img src="/icon.png"/></li>' % i
+    for i in range(5000)
+)
+"""Directory listing served by the stand-in server."""
+
+BLOB = b''.join(b'%08d' % i for i in range(100000))
+"""File served by the stand-in server."""
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Minimal ScienceData stand-in."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_body(self, body, content_type, headers=None, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for i in range(0, len(body), 1000):
+            self.wfile.write(body[i:i + 1000])
+
+    def do_GET(self):
+        self.server.clients.append(self.client_address)
+        self.server.paths.append(self.path)
+        self.server.cookies.append(self.headers.get('Cookie'))
+        if self.path.startswith('/login'):
+            self.send_body(b'', 'text/plain', {
+                'Set-Cookie': 'session={0}; Path=/'.format(
+                    self.headers.get('Authorization'))})
+        elif self.path.startswith('/files/'):
+            # Redirect to the home server of the user
+            self.send_response(307)
+            self.send_header('Location', 'http://{0}:{1}/home{2}'.format(
+                self.server.server_address[0],
+                self.server.server_address[1],
+                self.path))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif '/get_user_from_orcid.php' in self.path:
+            if self.path.endswith('orcid=0000-0000-0000-0000'):
+                self.send_body(b'Internal error', 'text/plain', status=500)
+            elif self.path.endswith('orcid=0000-0000-0000-0001'):
+                self.send_body(b'"bob"', 'application/json')
+            else:
+                self.send_body(b'"alice"', 'application/json')
+        elif '/getUserGroups.php' in self.path and \
+                self.path.endswith('userid=bob'):
+            self.send_body(b'Unavailable', 'text/plain', status=503)
+        elif '/getUserGroups.php' in self.path:
+            self.send_body(json.dumps([{'gid': 'g1'}, {'gid': 'g2'}]).encode(
+                'utf-8'), 'application/json')
+        elif '/get_public_url.php' in self.path:
+            self.send_body(b'"https://sciencedata.dk/public/abc"',
+                           'application/json')
+        elif self.path.startswith(('/blob/', '/corrupt/')):
+            digest = hashlib.sha1(BLOB).hexdigest()
+            if self.path.startswith('/corrupt/'):
+                digest = digest[::-1]
+            self.send_body(BLOB, 'application/octet-stream',
+                           {'OC-Checksum': 'SHA1:{0}'.format(digest)})
+        elif self.path.endswith('.bin'):
+            self.send_body(b'href="raw', 'application/octet-stream')
+        else:
+            self.send_body(PAGE, 'text/html; charset=utf-8')
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Threaded stand-in server."""
+
+    daemon_threads = True
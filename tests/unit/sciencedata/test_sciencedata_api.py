@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the ScienceData API lookups."""
+
+from __future__ import absolute_import, print_function
+
+from flask import g
+from flask_security import login_user
+from invenio_accounts.models import User
+from invenio_cache import current_cache
+from invenio_oauthclient.models import RemoteAccount
+
+from zenodo.modules.sciencedata.api import ScienceDataAPI
+from zenodo.modules.sciencedata.proxies import current_sciencedata_api
+
+
+def test_cached_lookups(app, db, users, sciencedata_server):
+    """Test that repeated lookups are served from the cache."""
+    user_id = users[0]['id']
+    RemoteAccount.create(
+        user_id, app.config['ORCID_APP_CREDENTIALS']['consumer_key'],
+        {'orcid': '0000-0002-1825-0097'})
+    db.session.commit()
+    sciencedata = ScienceDataAPI(user_id=user_id)
+    current_cache.delete(sciencedata.cache_key)
+    current_cache.delete(sciencedata.public_url_cache_key('/a', ''))
+
+    assert sciencedata.orcid == '0000-0002-1825-0097'
+    assert sciencedata.scienceDataUser == 'alice'
+    assert sciencedata.getGroups == ['g1', 'g2']
+    assert sciencedata.scienceDataPrivateHomeURL == \
+        'http://{0}:{1}/home/'.format(*sciencedata_server.server_address)
+    assert sciencedata.getScienceDataPublicURL('/a', '') == \
+        'https://sciencedata.dk/public/abc'
+    # User, groups, home server and public URL
+    assert len(sciencedata_server.paths) == 4
+
+    # Another request of the same user costs no upstream call
+    sciencedata = ScienceDataAPI(user_id=user_id)
+    assert sciencedata.scienceDataUser == 'alice'
+    assert sciencedata.getGroups == ['g1', 'g2']
+    assert sciencedata.getScienceDataPublicURL('/a', '') == \
+        'https://sciencedata.dk/public/abc'
+    assert len(sciencedata_server.paths) == 4
+
+    # Users without ORCID do not reach ScienceData
+    sciencedata = ScienceDataAPI(user_id=users[1]['id'])
+    current_cache.delete(sciencedata.cache_key)
+    assert sciencedata.scienceDataUser == ''
+    assert sciencedata.getGroups == []
+    assert len(sciencedata_server.paths) == 4
+
+    current_cache.delete(sciencedata.cache_key)
+    sciencedata = ScienceDataAPI(user_id=user_id)
+    current_cache.delete(sciencedata.cache_key)
+    current_cache.delete(sciencedata.public_url_cache_key('/a', ''))
+
+
+def test_failed_lookups(app, db, users, sciencedata_server):
+    """Test that failed lookups are not cached."""
+    user_id = users[0]['id']
+    account = RemoteAccount.create(
+        user_id, app.config['ORCID_APP_CREDENTIALS']['consumer_key'],
+        {'orcid': '0000-0000-0000-0000'})
+    db.session.commit()
+    sciencedata = ScienceDataAPI(user_id=user_id)
+    current_cache.delete(sciencedata.cache_key)
+
+    # The error page is not taken for a user name
+    assert sciencedata.scienceDataUser == ''
+    assert current_cache.get(sciencedata.cache_key) is None
+    assert ScienceDataAPI(user_id=user_id).scienceDataUser == ''
+    assert len(sciencedata_server.paths) == 2
+
+    # Nor are the lookups of a user whose groups could not be fetched
+    account.extra_data = {'orcid': '0000-0000-0000-0001'}
+    db.session.commit()
+    sciencedata = ScienceDataAPI(user_id=user_id)
+    assert sciencedata.scienceDataUser == 'bob'
+    assert sciencedata.getGroups == []
+    assert current_cache.get(sciencedata.cache_key) is None
+
+
+def test_current_sciencedata_api(app, users):
+    """Test that the API object is scoped to the request and the user."""
+    with app.test_request_context():
+        login_user(User.query.get(users[0]['id']))
+        api = current_sciencedata_api._get_current_object()
+        assert api.user_id == users[0]['id']
+        assert current_sciencedata_api._get_current_object() is api
+        assert g.sciencedata_api is api
+
+        login_user(User.query.get(users[1]['id']))
+        assert current_sciencedata_api.user_id == users[1]['id']
+
+    with app.test_request_context():
+        login_user(User.query.get(users[0]['id']))
+        assert current_sciencedata_api._get_current_object() is not api
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the ingestion of ScienceData releases."""
+
+from __future__ import absolute_import, print_function
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from helpers import login_user_via_session
+from invenio_files_rest.errors import FileSizeError
+from invenio_files_rest.models import Bucket, FileInstance, ObjectVersion
+from mock import patch
+from sciencedata_helpers import BLOB
+
+from zenodo.modules.sciencedata.api import ScienceDataAPI, \
+    ScienceDataRelease, attach_files
+from zenodo.modules.sciencedata.errors import ChecksumMismatchError
+from zenodo.modules.sciencedata.models import Release, ReleaseStatus, \
+    ScienceDataObject
+from zenodo.modules.sciencedata.tasks import cleanup_failed_releases
+from zenodo.modules.sciencedata.utils import announced_checksum, \
+    remote_version
+
+
+def test_announced_checksum():
+    """Test parsing the checksum headers of ScienceData."""
+    assert announced_checksum({'OC-Checksum': 'SHA1:ABCD'}) == \
+        ('sha1', 'abcd')
+    assert announced_checksum(
+        {'OC-Checksum': 'ADLER32:01 MD5:abcd'}) == ('md5', 'abcd')
+    assert announced_checksum({'Content-MD5': 'q80='}) == ('md5', 'abcd')
+    assert announced_checksum({}) is None
+    assert remote_version({'OC-Checksum': 'SHA1:ABCD', 'ETag': '"1"'}) == \
+        'sha1:abcd'
+    assert remote_version({'ETag': '"1"'}) == '"1"'
+    assert remote_version({}) is None
+
+
+def test_resumable_ingest(app, db, users, locations, sciencedata_server):
+    """Test downloading release files and resuming a failed release."""
+    user_id = users[0]['id']
+    sd_object = ScienceDataObject.create(
+        user_id, path=u'/data', name=u'data', kind=u'dir', group=u'')
+    release = Release.create(sd_object, '1')
+    db.session.commit()
+
+    def sciencedata_release(files):
+        sd_release = ScienceDataRelease(sd_object, release)
+        sd_release.sd = ScienceDataAPI(user_id=user_id)
+        sd_release.sd.lookups = dict(user='alice')
+        sd_release.files = [
+            (key, app.config['SCIENCEDATA_PRIVATE_URL'] + path, remote)
+            for key, path, remote in files]
+        return sd_release
+
+    sd_release = sciencedata_release([
+        ('a.bin', 'blob/a', 'v1'), ('b.bin', 'blob/b', 'v1'),
+        ('c.bin', 'corrupt/c', 'v1'), ('d.bin', 'blob/d', 'v1')])
+    with pytest.raises(ChecksumMismatchError):
+        sd_release.ingest()
+
+    progress = Release.query.get(release.id).files
+    assert progress['a.bin']['status'] == 'done'
+    assert progress['b.bin']['status'] == 'done'
+    assert progress['c.bin']['status'] == 'failed'
+    assert progress['d.bin']['status'] == 'done'
+    for key in ('a.bin', 'b.bin'):
+        fileinstance = FileInstance.query.get(progress[key]['file_id'])
+        assert fileinstance.readable
+        assert fileinstance.size == len(BLOB)
+        assert fileinstance.checksum == \
+            'md5:' + hashlib.md5(BLOB).hexdigest()
+        assert progress[key]['checksum'] == fileinstance.checksum
+
+    superseded = [progress[key]['file_id'] for key in ('b.bin', 'd.bin')]
+    paths = [FileInstance.query.get(file_id).uri for file_id in superseded]
+    assert all(os.path.exists(path) for path in paths)
+
+    # Publishing again only downloads the files that failed or changed,
+    # either moved or with a new content at the same location
+    sciencedata_server.paths[:] = []
+    files = [('a.bin', 'blob/a', 'v1'), ('b.bin', 'blob/b2', 'v1'),
+             ('c.bin', 'blob/c', 'v1'), ('d.bin', 'blob/d', 'v2')]
+    progress = sciencedata_release(files).ingest()
+    assert sorted(sciencedata_server.paths) == \
+        ['/blob/b2', '/blob/c', '/blob/d']
+    assert all(entry['status'] == 'done' for entry in progress.values())
+    assert Release.query.get(release.id).status == ReleaseStatus.PROCESSING
+
+    # The superseded downloads are removed
+    assert all(FileInstance.query.get(file_id) is None
+               for file_id in superseded)
+    assert not any(os.path.exists(path) for path in paths)
+
+    # Nothing left to download
+    sciencedata_server.paths[:] = []
+    assert sciencedata_release(files).ingest() == progress
+    assert sciencedata_server.paths == []
+
+    # Files without a known version are always downloaded again
+    files[0] = ('a.bin', 'blob/a', None)
+    progress = sciencedata_release(files[:1]).ingest()
+    assert sciencedata_server.paths == ['/blob/a']
+    # Files which are no longer part of the release are dropped
+    assert list(progress) == ['a.bin']
+
+    # The files of abandoned failed releases are removed
+    paths = [FileInstance.query.get(entry['file_id']).uri
+             for entry in progress.values()]
+    release = Release.query.get(release.id)
+    release.status = ReleaseStatus.FAILED
+    db.session.commit()
+    cleanup_failed_releases()
+    assert Release.query.get(release.id).files is not None
+    Release.query.filter_by(id=release.id).update(
+        {Release.updated: datetime.utcnow() - timedelta(days=30)})
+    db.session.commit()
+    cleanup_failed_releases()
+    assert Release.query.get(release.id).files is None
+    assert not any(os.path.exists(path) for path in paths)
+
+
+def test_resume_processing_release(app, db, users, locations,
+                                   sciencedata_server):
+    """Test resuming a release left processing by a killed worker."""
+    user_id = users[0]['id']
+    sd_object = ScienceDataObject.create(
+        user_id, path=u'/data', name=u'data', kind=u'dir', group=u'')
+    release = Release.create(sd_object, '1')
+    db.session.commit()
+    release_id = release.id
+
+    def sciencedata_release(files):
+        sd_release = ScienceDataRelease(
+            sd_object, Release.query.get(release_id))
+        sd_release.sd = ScienceDataAPI(user_id=user_id)
+        sd_release.sd.lookups = dict(user='alice')
+        sd_release.files = [
+            (key, app.config['SCIENCEDATA_PRIVATE_URL'] + path, 'v1')
+            for key, path in files]
+        return sd_release
+
+    # The worker dies before the release is marked as failed
+    with pytest.raises(ChecksumMismatchError):
+        sciencedata_release(
+            [('a.bin', 'blob/a'), ('b.bin', 'corrupt/b')]).ingest()
+    release = Release.query.get(release_id)
+    assert release.status == ReleaseStatus.PROCESSING
+    assert not release.resumable
+
+    def age(seconds):
+        Release.query.filter_by(id=release_id).update({
+            Release.updated: datetime.utcnow() - timedelta(seconds=seconds)})
+        db.session.commit()
+
+    age(app.config['SCIENCEDATA_RELEASE_PROCESSING_TIMEOUT'] + 60)
+    assert Release.query.get(release_id).resumable
+
+    # Creating a version resumes the release instead of creating another
+    with app.test_client() as client, \
+            patch('zenodo.modules.sciencedata.views.sciencedata.'
+                  'publish_release') as publish_release:
+        login_user_via_session(client, email=users[0]['email'])
+        res = client.get('/account/settings/sciencedata/create_version',
+                         query_string={'path': '/data', 'group': ''})
+        assert res.status_code == 202
+        publish_release.delay.assert_called_once_with(str(release_id))
+        assert sd_object.releases.count() == 1
+        assert Release.query.get(release_id).status == \
+            ReleaseStatus.RECEIVED
+
+        # A release being processed is not started twice
+        res = client.get('/account/settings/sciencedata/create_version',
+                         query_string={'path': '/data', 'group': ''})
+        assert res.status_code == 202
+        assert publish_release.delay.call_count == 1
+
+    # Only the missing file is downloaded again
+    sciencedata_server.paths[:] = []
+    progress = sciencedata_release(
+        [('a.bin', 'blob/a'), ('b.bin', 'blob/b')]).ingest()
+    assert sciencedata_server.paths == ['/blob/b']
+    assert all(entry['status'] == 'done' for entry in progress.values())
+
+    # The files of releases abandoned for good are removed
+    paths = [FileInstance.query.get(entry['file_id']).uri
+             for entry in progress.values()]
+    age(app.config['SCIENCEDATA_FAILED_RELEASE_RETENTION'] + 60)
+    cleanup_failed_releases()
+    release = Release.query.get(release_id)
+    assert release.status == ReleaseStatus.FAILED
+    assert release.files is None
+    assert not any(os.path.exists(path) for path in paths)
+
+
+def test_attach_files(app, db, locations):
+    """Test attaching downloaded files within the quota of the bucket."""
+    files = {}
+    for key in ('a.bin', 'b.bin'):
+        fileinstance = FileInstance.create()
+        fileinstance.set_uri('/tmp/{0}'.format(key), 10, 'md5:abc')
+        files[key] = dict(file_id=str(fileinstance.id), size=10)
+    bucket = Bucket.create(quota_size=15)
+    db.session.commit()
+
+    with pytest.raises(FileSizeError):
+        attach_files(bucket, files)
+    db.session.rollback()
+
+    bucket = Bucket.create(quota_size=20)
+    attach_files(bucket, files)
+    db.session.commit()
+    assert bucket.size == 20
+    assert sorted(o.key for o in ObjectVersion.get_by_bucket(bucket)) == \
+        ['a.bin', 'b.bin']
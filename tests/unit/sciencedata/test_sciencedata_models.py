@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test ScienceData models."""
+
+from __future__ import absolute_import, print_function
+
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from invenio_db import db
+from sqlalchemy import event
+from sqlalchemy.orm.exc import NoResultFound
+
+from zenodo.modules.sciencedata.models import Release, ReleaseStatus, \
+    ScienceDataObject
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed in the block."""
+    queries = []
+
+    def _count(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _count)
+    try:
+        yield queries
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _count)
+
+
+def _insert_objects(user_id, count, start=None):
+    """Bulk insert synthetic objects, one second apart, oldest first."""
+    start = start or datetime(2022, 1, 1)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(seconds=i)
+        rows.append(dict(
+            id=uuid.uuid4(), created=created, updated=created,
+            path=u'/obj-{0}'.format(i), name=u'obj-{0}'.format(i),
+            kind=u'file', group=u'', user_id=user_id,
+        ))
+    db.session.execute(ScienceDataObject.__table__.insert(), rows)
+    return [r['id'] for r in reversed(rows)]
+
+
+def _insert_releases(object_ids, versions=3):
+    """Bulk insert releases for each of the given objects."""
+    start = datetime(2022, 6, 1)
+    rows = []
+    for object_id in object_ids:
+        for v in range(1, versions + 1):
+            created = start + timedelta(days=v)
+            rows.append(dict(
+                id=uuid.uuid4(), created=created, updated=created,
+                version=str(v), sciencedata_object_id=object_id,
+                status=ReleaseStatus.PUBLISHED if v < versions
+                else ReleaseStatus.FAILED,
+            ))
+    db.session.execute(Release.__table__.insert(), rows)
+
+
+def test_get_user_objects(app, db, users):
+    """Test keyset pagination of the objects of a user."""
+    owner, other = users[0]['id'], users[1]['id']
+    ids = _insert_objects(owner, 25)
+    _insert_objects(other, 5)
+    db.session.commit()
+
+    assert len(ScienceDataObject.get_user_objects(owner)) == 25
+    assert len(ScienceDataObject.get_user_objects(other)) == 5
+
+    seen, after = [], None
+    while True:
+        page = ScienceDataObject.get_user_objects(
+            owner, after=after, limit=10)
+        if not page:
+            break
+        assert all(o.user_id == owner for o in page)
+        seen.extend(o.id for o in page)
+        after = page[-1].id
+    # Newest first, no gaps and no duplicates
+    assert seen == ids
+
+    # The cursor must belong to the user
+    with pytest.raises(NoResultFound):
+        ScienceDataObject.get_user_objects(other, after=ids[0])
+
+
+def test_get_latest_releases(app, db, users):
+    """Test fetching the latest release of several objects."""
+    ids = _insert_objects(users[0]['id'], 3)
+    _insert_releases(ids[:2])
+    db.session.commit()
+
+    with count_queries() as queries:
+        latest = Release.get_latest(ids)
+    assert len(queries) == 1
+    assert set(latest) == set(ids[:2])
+    assert all(r.version == '3' for r in latest.values())
+
+    published = Release.get_latest(ids, status=ReleaseStatus.PUBLISHED)
+    assert all(r.version == '2' for r in published.values())
+
+    for object_id in ids:
+        sd_object = ScienceDataObject.query.get(object_id)
+        assert latest.get(object_id) == sd_object.latest_release()
+
+    assert Release.get_latest([]) == {}
+
+
+def test_preserved_objects_pages(app, db, users):
+    """Test that listing a page costs the same queries at any depth."""
+    owner = users[0]['id']
+    ids = _insert_objects(owner, 500)
+    _insert_objects(users[1]['id'], 100)
+    # Give every tenth object a release history
+    _insert_releases(ids[::10])
+    db.session.commit()
+
+    for after in (None, ids[400]):
+        db.session.expire_all()
+        with count_queries() as queries:
+            page = ScienceDataObject.get_user_objects(
+                owner, after=after, limit=50)
+            latest = Release.get_latest([o.id for o in page])
+        # Constant number of queries, regardless of the page size
+        assert len(queries) == (2 if after is None else 3)
+        assert len(page) == 50
+        assert len(latest) == 5
+        assert all(o.user_id == owner for o in page)
+
+    assert [o.id for o in page] == ids[401:451]
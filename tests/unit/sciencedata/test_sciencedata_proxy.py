@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Test the ScienceData proxy against a local stand-in server."""
+
+from __future__ import absolute_import, print_function
+
+from flask import current_app
+from helpers import login_user_via_session
+from invenio_cache import current_cache
+from invenio_oauthclient.models import RemoteAccount
+from sciencedata_helpers import PAGE
+
+from zenodo.modules.sciencedata.api import ScienceDataAPI
+from zenodo.modules.sciencedata.utils import rewrite_links
+
+
+def test_rewrite_links():
+    """Test rewriting links split across chunks."""
+    prefix = b'/proxy'
+    expected = PAGE.replace(b'href="', b'href="/proxy').replace(
+        b'src="', b'src="/proxy')
+    for size in (1, 3, 7, 64, 1000, len(PAGE)):
+        chunks = (PAGE[i:i + size] for i in range(0, len(PAGE), size))
+        assert b''.join(rewrite_links(chunks, prefix)) == expected
+    assert list(rewrite_links([], prefix)) == []
+
+
+def test_pooled_session(app, users, sciencedata_server):
+    """Test that requests to ScienceData reuse connections."""
+    with app.test_request_context():
+        sciencedata = ScienceDataAPI(user_id=users[0]['id'])
+        url = current_app.config['SCIENCEDATA_PRIVATE_URL'] + 'page'
+        for _ in range(3):
+            r = sciencedata.request('GET', url)
+            assert r.content == PAGE
+    assert len(set(sciencedata_server.clients)) == 1
+
+
+def test_pooled_session_cookies(app, users, sciencedata_server):
+    """Test that cookies set for a user are not sent for another user."""
+    with app.test_request_context():
+        url = current_app.config['SCIENCEDATA_PRIVATE_URL']
+        r = ScienceDataAPI(user_id=users[0]['id']).request(
+            'GET', url + 'login', auth=('alice', ''))
+        assert r.headers['Set-Cookie'].startswith('session=')
+        ScienceDataAPI(user_id=users[1]['id']).request(
+            'GET', url + 'page', auth=('bob', ''))
+    assert sciencedata_server.paths == ['/login', '/page']
+    assert sciencedata_server.cookies == [None, None]
+
+
+def test_sciencedata_proxy(app, db, users, sciencedata_server):
+    """Test streaming through the ScienceData proxy."""
+    RemoteAccount.create(
+        users[0]['id'], app.config['ORCID_APP_CREDENTIALS']['consumer_key'],
+        {'orcid': '0000-0002-1825-0097'})
+    db.session.commit()
+    current_cache.delete(ScienceDataAPI(users[0]['id']).cache_key)
+    with app.test_client() as client:
+        login_user_via_session(client, email=users[0]['email'])
+        res = client.get('/account/settings/sciencedata/'
+                         'sciencedata_proxy/files/page')
+        assert res.status_code == 200
+        assert res.is_streamed
+        assert res.get_data() == PAGE.replace(
+            b'href="', b'href="/account/settings/sciencedata/'
+            b'sciencedata_proxy').replace(
+            b'src="', b'src="/account/settings/sciencedata/'
+            b'sciencedata_proxy')
+
+        # Non HTML content is passed through untouched
+        res = client.get('/account/settings/sciencedata/'
+                         'sciencedata_proxy/files/data.bin')
+        assert res.get_data() == b'href="raw'
+        assert res.content_type == 'application/octet-stream'
+    # The lookups and the proxied requests went over kept-alive connections
+    proxied = [p for p in sciencedata_server.paths
+               if p.endswith(('page', '.bin'))]
+    assert len(proxied) == 4
+    assert len(set(sciencedata_server.clients)) < \
+        len(sciencedata_server.clients)
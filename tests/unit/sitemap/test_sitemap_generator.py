@@ -30,9 +30,13 @@ import datetime
 import re
 
 from flask import current_app, render_template
+from invenio_db import db
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.api import Record
 
-from zenodo.modules.sitemap.generators import _sitemapdtformat
-from zenodo.modules.sitemap.tasks import update_sitemap_cache
+from zenodo.modules.sitemap.generators import _sitemapdtformat, \
+    records_generator
+from zenodo.modules.sitemap.tasks import update_sitemap, update_sitemap_cache
 
 
 def test_sitemap_cache_update_simple(mocker, app):
@@ -112,3 +116,73 @@ def test_sitemap_date_generator():
     assert _sitemapdtformat(dt) == '2018-01-02T03:04:05Z'
     dt = datetime.datetime(2018, 11, 12, 13, 14, 15)
     assert _sitemapdtformat(dt) == '2018-11-12T13:14:15Z'
+
+
+def test_sitemap_incremental_update(mocker, app, record_with_bucket,
+                                    communities):
+    """Test the incremental sitemap update."""
+    pid, record = record_with_bucket
+    sitemap = current_app.extensions['zenodo-sitemap']
+    app.config['ZENODO_SITEMAP_MAX_URL_COUNT'] = 10000
+
+    update_sitemap()
+    # Record 12345 is in the page of recids 10000-19999
+    assert 'https://localhost/record/12345' in \
+        sitemap.get_page('records', 1)
+    assert sitemap.get_page('communities', 0)
+    with app.test_request_context():
+        with app.test_client() as client:
+            res = client.get('/sitemap.xml')
+            assert res.status_code == 200
+            assert b'/sitemap-records-1.xml' in res.data
+            assert b'/sitemap-communities-0.xml' in res.data
+            res = client.get('/sitemap-records-1.xml')
+            assert res.status_code == 200
+
+    # Nothing changed, nothing is rendered again
+    set_page = mocker.spy(sitemap, 'set_page')
+    update_sitemap()
+    assert set_page.call_count == 0
+
+    # Only the page of the modified record is rendered again
+    record['title'] = 'New title'
+    record.commit()
+    db.session.commit()
+    update_sitemap()
+    assert set_page.call_count == 1
+    assert set_page.call_args[0][:2] == ('records', 1)
+
+    # Pages are compressed if enabled
+    app.config['ZENODO_SITEMAP_GZIP'] = True
+    try:
+        update_sitemap()
+        assert sitemap.get_page('records', 1, compressed=True)
+        assert '/record/12345' in sitemap.get_page('records', 1)
+    finally:
+        app.config['ZENODO_SITEMAP_GZIP'] = False
+
+
+def test_records_keyset_generator(app, db, minimal_record):
+    """Test the keyset paginated records generator."""
+    for recid in (3, 20, 100, 1000):
+        record = Record.create(dict(minimal_record, recid=recid))
+        PersistentIdentifier.create(
+            'recid', str(recid), object_type='rec', object_uuid=record.id,
+            status=PIDStatus.REGISTERED)
+        # PIDs of other types have non-numeric values
+        PersistentIdentifier.create(
+            'doi', '10.5072/zenodo.{0}'.format(recid), object_type='rec',
+            object_uuid=record.id, status=PIDStatus.REGISTERED)
+    db.session.commit()
+
+    def _recids(**kwargs):
+        with app.test_request_context():
+            return [url['loc'].split('/')[-1]
+                    for url in records_generator(**kwargs)]
+
+    # Ordered by numeric recid, whatever the batch size
+    assert _recids() == ['3', '20', '100', '1000']
+    assert _recids(batch_size=1) == ['3', '20', '100', '1000']
+    assert _recids(start_recid=20, batch_size=2) == ['20', '100', '1000']
+    assert _recids(start_recid=4, end_recid=1000, batch_size=1) == \
+        ['20', '100']
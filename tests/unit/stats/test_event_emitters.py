@@ -29,6 +29,10 @@ from invenio_records.api import Record
 from invenio_search import current_search
 from invenio_stats.tasks import process_events
 
+from zenodo.modules.stats.event_builders import add_record_metadata
+from zenodo.modules.stats.utils import bucket_event_payload, \
+    record_event_payload
+
 
 def test_record_page(app, db, es, event_queues, full_record):
     """Test record page views."""
@@ -92,3 +96,24 @@ def test_file_download(app, db, es, event_queues, record_with_files_creation):
     assert doc['access_right'] == 'open'
     assert doc['communities'] == ['zenodo']
     assert doc['owners'] == [1]
+
+
+def test_record_event_payload(app, db, es, record_with_files_creation):
+    """Test the event payload of records, cached per revision."""
+    recid, record, _ = record_with_files_creation
+    obj = record.files['Test.pdf'].obj
+
+    # Without a record in the context, it is found from the bucket
+    event = add_record_metadata({}, app, obj=obj)
+    assert event['record_id'] == str(record.id)
+    assert event['recid'] == str(record['recid'])
+    payload = bucket_event_payload(obj.bucket_id)
+    assert record_event_payload(record) is payload
+
+    record['conceptrecid'] = 'foo.concept'
+    record.commit()
+    db.session.commit()
+    new_payload = record_event_payload(record)
+    assert new_payload is not payload
+    assert new_payload['conceptrecid'] == 'foo.concept'
+    assert bucket_event_payload(obj.bucket_id) is new_payload
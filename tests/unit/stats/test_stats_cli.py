@@ -70,3 +70,90 @@ def test_record_view_import(app, db, es, event_queues, full_record,
         'user_agent': 'foo',
         'user_id': None,
     }
+
+
+def test_record_view_import_skips_unknown(app, db, es, event_queues,
+                                          full_record, script_info, tmpdir):
+    """Test that rows of unknown records or other sites are skipped."""
+    r = Record.create(full_record)
+    PersistentIdentifier.create(
+        'recid', '12345', object_type='rec', object_uuid=r.id,
+        status=PIDStatus.REGISTERED)
+    db.session.commit()
+
+    csv_file = tmpdir.join('record-views.csv')
+    csv_file.write(
+        ',userAgent,ipAddress,url,serverTimePretty,timestamp,referrer\n'
+        ',foo,137.138.36.206,https://zenodo.org/record/12345,,1367928000,\n'
+        ',foo,137.138.36.206,https://zenodo.org/record/999,,1367928000,\n'
+        ',foo,137.138.36.206,https://example.org/record/1,,1367928000,\n'
+        ',foo,137.138.36.206,https://zenodo.org/record/12345,,1367928001,\n')
+
+    runner = CliRunner()
+    res = runner.invoke(
+        import_events, ['record-view', csv_file.dirname, '-s', '3'],
+        obj=script_info)
+    assert res.exit_code == 0
+    events = list(event_queues['stats-record-view'].consume())
+    assert [e['timestamp'] for e in events] == \
+        ['2013-05-07T12:00:00', '2013-05-07T12:00:01']
+    assert all(e['record_id'] == str(r.id) for e in events)
+
+
+def test_file_download_import(app, db, es, event_queues,
+                              record_with_files_creation, script_info,
+                              tmpdir):
+    """Test file download event import, skipping unknown files."""
+    pid, record, _ = record_with_files_creation
+    obj = record.files['Test.pdf'].obj
+
+    csv_file = tmpdir.join('file-downloads.csv')
+    csv_file.write_binary(
+        b',userAgent,ipAddress,url,serverTimePretty,timestamp,referrer\n'
+        b',foo,137.138.36.206,https://zenodo.org/record/12345/files/Test.pdf,'
+        b',1367928000,\n'
+        b',foo,137.138.36.206,https://zenodo.org/record/12345/files/Foo.pdf,'
+        b',1367928000,\n'
+        b',foo,137.138.36.206,https://zenodo.org/record/12345/files/'
+        b'Donn\xc3\xa9es.pdf,,1367928000,\n'
+        b',foo,137.138.36.206,https://zenodo.org/record/12345,,1367928000,\n')
+
+    runner = CliRunner()
+    res = runner.invoke(
+        import_events, ['file-download', csv_file.dirname], obj=script_info)
+    assert res.exit_code == 0
+    events = list(event_queues['stats-file-download'].consume())
+    assert len(events) == 1
+    assert events[0]['recid'] == str(pid.pid_value)
+    assert events[0]['bucket_id'] == str(obj.bucket_id)
+    assert events[0]['file_id'] == str(obj.file_id)
+    assert events[0]['file_key'] == 'Test.pdf'
+    assert events[0]['size'] == 2
+
+
+def test_import_workers(app, db, es, event_queues, full_record, script_info,
+                        tmpdir):
+    """Test importing the CSV files of a directory with several workers."""
+    r = Record.create(full_record)
+    PersistentIdentifier.create(
+        'recid', '12345', object_type='rec', object_uuid=r.id,
+        status=PIDStatus.REGISTERED)
+    db.session.commit()
+
+    for i in range(2):
+        tmpdir.join('record-views-{0}.csv'.format(i)).write(
+            ',userAgent,ipAddress,url,serverTimePretty,timestamp,referrer\n'
+            ',foo,137.138.36.206,https://zenodo.org/record/12345,,{0},\n'
+            ',foo,137.138.36.206,https://zenodo.org/record/999,,{0},\n'
+            .format(1367928000 + i))
+
+    runner = CliRunner()
+    res = runner.invoke(
+        import_events, ['record-view', str(tmpdir), '-w', '2'],
+        obj=script_info)
+    assert res.exit_code == 0
+    assert '2 events imported.' in res.output
+    events = list(event_queues['stats-record-view'].consume())
+    assert sorted(e['timestamp'] for e in events) == \
+        ['2013-05-07T12:00:00', '2013-05-07T12:00:01']
+    assert all(e['record_id'] == str(r.id) for e in events)
@@ -56,7 +56,7 @@ def mocked_requests_fail(*args, **kwargs):
     return MockResponse({}, 500)
 
 
-@mock.patch('zenodo.modules.stats.exporters.requests.post',
+@mock.patch('zenodo.modules.stats.exporters.requests.Session.post',
             side_effect=mocked_requests_success)
 def test_piwik_exporter(app, db, es, locations, event_queues, full_record):
     records = create_stats_fixtures(
@@ -86,7 +86,7 @@ def test_piwik_exporter(app, db, es, locations, event_queues, full_record):
     assert bookmark == u'2018-01-01T14:30:00'
 
 
-@mock.patch('zenodo.modules.stats.exporters.requests.post',
+@mock.patch('zenodo.modules.stats.exporters.requests.Session.post',
             side_effect=mocked_requests_invalid)
 def test_piwik_exporter_invalid_request(app, db, es, locations, event_queues,
                                         full_record):
@@ -111,7 +111,7 @@ def test_piwik_exporter_invalid_request(app, db, es, locations, event_queues,
     assert bookmark is None
 
 
-@mock.patch('zenodo.modules.stats.exporters.requests.post',
+@mock.patch('zenodo.modules.stats.exporters.requests.Session.post',
             side_effect=mocked_requests_fail)
 def test_piwik_exporter_request_fail(app, db, es, locations, event_queues,
                                      full_record):
@@ -152,8 +152,56 @@ def test_piwik_exporter_no_bookmark(app, db, es, locations, event_queues,
     bookmark = current_cache.get('piwik_export:bookmark')
     assert bookmark is None
 
-    with mock.patch('zenodo.modules.stats.exporters.requests.post') as mocked:
+    with mock.patch(
+            'zenodo.modules.stats.exporters.requests.Session.post') as mocked:
         PiwikExporter().run()
         mocked.assert_not_called()
     bookmark = current_cache.get('piwik_export:bookmark')
     assert bookmark is None
+
+
+def mocked_requests_fail_after_13_30(url, json=None, **kwargs):
+    if any('T14%3A' in qs for qs in json['requests']):
+        return MockResponse({}, 500)
+    return mocked_requests_success()
+
+
+@mock.patch('zenodo.modules.stats.exporters.requests.Session.post',
+            side_effect=mocked_requests_fail_after_13_30)
+def test_piwik_exporter_concurrent_chunks(app, db, es, locations,
+                                          event_queues, full_record):
+    records = create_stats_fixtures(
+        metadata=full_record, n_records=1, n_versions=1, n_files=1,
+        event_data={'user_id': '1', 'country': 'CH'},
+        # 4 event timestamps
+        start_date=datetime(2018, 1, 1, 13),
+        end_date=datetime(2018, 1, 1, 15),
+        interval=timedelta(minutes=30),
+        do_process_events=True)
+
+    current_cache.delete('piwik_export:bookmark')
+    config = app.config['ZENODO_STATS_PIWIK_EXPORTER']
+    old_config = dict(config)
+    config.update({'chunk_size': 1, 'concurrency': 3})
+
+    try:
+        # Chunks are acknowledged in order, so the bookmark stops right before
+        # the first failed chunk, even if later ones were submitted.
+        start_date = datetime(2018, 1, 1, 12)
+        with pytest.raises(PiwikExportRequestError):
+            PiwikExporter().run(start_date=start_date)
+        bookmark = current_cache.get('piwik_export:bookmark')
+        assert bookmark == u'2018-01-01T13:30:00'
+
+        # Runs behind the bookmark bail out
+        stats = PiwikExporter().run(start_date=start_date)
+        assert stats['events'] == 0
+
+        current_cache.delete('piwik_export:bookmark')
+        end_date = datetime(2018, 1, 1, 13, 30)
+        stats = PiwikExporter().run(start_date=start_date, end_date=end_date)
+        assert stats['events'] == stats['chunks'] > 0
+        assert current_cache.get('piwik_export:bookmark') == bookmark
+    finally:
+        config.clear()
+        config.update(old_config)
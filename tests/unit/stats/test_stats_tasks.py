@@ -22,16 +22,22 @@
 
 """Unit tests for statistics tasks."""
 
+import uuid
 from datetime import datetime, timedelta
 
 from flask import url_for
 from invenio_indexer.api import RecordIndexer
-from invenio_search import current_search
+from invenio_search import current_search, current_search_client
+from invenio_search.utils import build_alias_name
 from invenio_stats.tasks import aggregate_events, process_events
+from mock import patch
 from stats_helpers import create_stats_fixtures
 
+from zenodo.modules.records.indexer import ZenodoRecordIndexer
 from zenodo.modules.stats.tasks import update_record_statistics
-from zenodo.modules.stats.utils import get_record_stats
+from zenodo.modules.stats.utils import build_record_stats, \
+    build_records_stats, changed_concepts, get_record_stats, \
+    get_records_stats
 
 
 def test_update_record_statistics(app, db, es, locations, event_queues,
@@ -67,6 +73,8 @@ def test_update_record_statistics(app, db, es, locations, event_queues,
 
     # Perform a view and all-files download today on the first version
     recid_v1, record_v1, file_objects_v1 = records[0]
+    doc_v1 = current_search_client.get(
+        index=build_alias_name('records'), id=str(recid_v1.object_uuid))
     with app.test_client() as client:
         for f in file_objects_v1:
             file_url = url_for('invenio_records_ui.recid_files',
@@ -101,6 +109,13 @@ def test_update_record_statistics(app, db, es, locations, event_queues,
         'version_volume': 630.0,
     }
 
+    # Only the stats of the indexed document were updated
+    new_doc_v1 = current_search_client.get(
+        index=build_alias_name('records'), id=str(recid_v1.object_uuid))
+    assert new_doc_v1['_version'] == doc_v1['_version']
+    del doc_v1['_source']['_stats'], new_doc_v1['_source']['_stats']
+    assert new_doc_v1['_source'] == doc_v1['_source']
+
     # Other versions will have only their `version_*` statistics updated
     expected_stats['version_views'] += 1
     expected_stats['version_unique_views'] += 1
@@ -110,3 +125,85 @@ def test_update_record_statistics(app, db, es, locations, event_queues,
     for recid, _, _ in records[1:]:
         stats = get_record_stats(recid.object_uuid)
         assert stats == expected_stats
+
+
+def test_build_records_stats(app, db, es, locations, event_queues,
+                             minimal_record):
+    """Test building the stats of many records at once."""
+    records = create_stats_fixtures(
+        metadata=minimal_record, n_records=2, n_versions=3, n_files=2,
+        event_data={'user_id': '1'},
+        start_date=datetime(2018, 1, 1, 13),
+        end_date=datetime(2018, 1, 1, 15),
+        interval=timedelta(minutes=30),
+        do_update_record_statistics=False)
+
+    ids = [(r['recid'], r['conceptrecid']) for _, r, _ in records]
+    stats = build_records_stats(ids + [(12345, None)])
+    for recid, conceptrecid in ids:
+        assert stats[recid] == build_record_stats(recid, conceptrecid)
+    assert stats[12345] == {
+        'views': 0.0,
+        'unique_views': 0.0,
+        'downloads': 0.0,
+        'unique_downloads': 0.0,
+        'volume': 0.0,
+    }
+
+    # The batched indexer gives the same stats
+    ZenodoRecordIndexer().bulk_index([str(r.id) for _, r, _ in records])
+    ZenodoRecordIndexer().process_bulk_queue()
+    current_search.flush_and_refresh(index='records')
+    for recid, record, _ in records:
+        assert get_record_stats(recid.object_uuid) == \
+            stats[record['recid']]
+
+
+def test_changed_concepts(app, db, es, locations, event_queues,
+                          minimal_record):
+    """Test finding the concepts changed since the stats search."""
+    records = create_stats_fixtures(
+        metadata=minimal_record, n_records=2, n_versions=2, n_files=1,
+        event_data={'user_id': '1'},
+        start_date=datetime(2018, 1, 1, 13),
+        end_date=datetime(2018, 1, 1, 15),
+        interval=timedelta(minutes=30),
+        do_update_record_statistics=False)
+    conceptrecids = set(r['conceptrecid'] for _, r, _ in records)
+    assert changed_concepts(conceptrecids, datetime(2018, 1, 1)) == \
+        conceptrecids
+
+    since = datetime.utcnow()
+    assert changed_concepts(conceptrecids, since) == set()
+    _, record, _ = records[0]
+    record['title'] = 'New title'
+    record.commit()
+    db.session.commit()
+    assert changed_concepts(conceptrecids, since) == \
+        {record['conceptrecid']}
+    assert changed_concepts(set(), since) == set()
+
+
+def test_get_records_stats(app, db, es, locations, event_queues,
+                           minimal_record):
+    """Test fetching the stats of many records through the cache."""
+    records = create_stats_fixtures(
+        metadata=minimal_record, n_records=1, n_versions=2, n_files=1,
+        event_data={'user_id': '1'},
+        start_date=datetime(2018, 1, 1, 13),
+        end_date=datetime(2018, 1, 1, 15),
+        interval=timedelta(minutes=30))
+    ids = [str(r.id) for _, r, _ in records]
+    unknown = str(uuid.uuid4())
+
+    stats = get_records_stats(ids + [unknown])
+    assert stats[unknown] is None
+    for _, record, _ in records:
+        assert stats[str(record.id)]['views'] == 4.0
+
+    # Cached stats do not hit Elasticsearch
+    with patch('zenodo.modules.stats.utils.current_search_client') as client:
+        assert get_records_stats(ids) == \
+            dict((i, stats[i]) for i in ids)
+        assert get_record_stats(ids[0]) == stats[ids[0]]
+        assert not client.mget.called
@@ -218,6 +218,7 @@ CELERY_TASK_ROUTES = {
     # Indexer
     #'invenio_indexer.tasks.process_bulk_queue': {'queue': 'celery-indexer'},
     'invenio_indexer.tasks.process_bulk_queue': {'queue': 'indexer'},
+    'zenodo.modules.records.tasks.process_bulk_queue': {'queue': 'indexer'},
 }
 #INDEXER_MQ_EXCHANGE = Exchange('celery-indexer', type='direct')
 #INDEXER_MQ_QUEUE = Queue(
@@ -229,7 +230,7 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(minute=2, hour=0),
     },
     'indexer': {
-        'task': 'invenio_indexer.tasks.process_bulk_queue',
+        'task': 'zenodo.modules.records.tasks.process_bulk_queue',
         'schedule': timedelta(minutes=5),
         'kwargs': {
             'es_bulk_kwargs': {'raise_on_error': False},
@@ -278,9 +279,17 @@ CELERY_BEAT_SCHEDULE = {
         },
     },
     'sitemap-updater': {
-        'task': 'zenodo.modules.sitemap.tasks.update_sitemap_cache',
+        'task': 'zenodo.modules.sitemap.tasks.update_sitemap',
         'schedule': timedelta(hours=24)
     },
+    'metrics-updater': {
+        'task': 'zenodo.modules.metrics.tasks.update_metrics',
+        'schedule': timedelta(minutes=30),
+    },
+    'metrics-daily-aggregates': {
+        'task': 'zenodo.modules.metrics.tasks.update_daily_aggregates',
+        'schedule': crontab(minute=30, hour=0),
+    },
     'file-integrity-report': {
         'task': 'zenodo.modules.utils.tasks.file_integrity_report',
         'schedule': crontab(minute=0, hour=7),  # Every day at 07:00 UTC
@@ -293,6 +302,11 @@ CELERY_BEAT_SCHEDULE = {
             'max_count': DATACITE_UPDATING_RATE_PER_HOUR,
         }
     },
+    'sciencedata-failed-releases-cleaner': {
+        'task': (
+            'zenodo.modules.sciencedata.tasks.cleanup_failed_releases'),
+        'schedule': timedelta(hours=24),
+    },
     'export': {
         'task': 'zenodo.modules.exporter.tasks.export_job',
         'schedule': crontab(minute=0, hour=4, day_of_month=1),
@@ -300,6 +314,13 @@ CELERY_BEAT_SCHEDULE = {
             'job_id': 'records',
         }
     },
+    'export-delta': {
+        'task': 'zenodo.modules.exporter.tasks.export_job',
+        'schedule': crontab(minute=0, hour=5),
+        'kwargs': {
+            'job_id': 'records-delta',
+        }
+    },
     # Stats
     'stats-process-events': {
         'task': 'invenio_stats.tasks.process_events',
@@ -51,10 +51,13 @@ from invenio_communities.errors import InclusionRequestObsoleteError
 
 from zenodo.modules.communities.api import ZenodoCommunity
 from zenodo.modules.communities.signals import record_accepted
+from zenodo.modules.metrics.instrumentation import PUBLISH_DURATION
 from zenodo.modules.records.api import ZenodoFileObject, ZenodoFilesIterator, \
     ZenodoFilesMixin, ZenodoRecord
 from zenodo.modules.records.minters import doi_generator, is_local_doi, \
     zenodo_concept_doi_minter, zenodo_doi_updater
+from zenodo.modules.records.serializers.pidrelations import \
+    invalidate_version_dois
 from zenodo.modules.records.utils import is_doi_locally_managed, \
     is_valid_openaire_type
 from zenodo.modules.spam.utils import check_and_handle_spam
@@ -80,6 +83,12 @@ PRESERVE_FIELDS = (
 )
 """Fields which will not be overwritten on edit."""
 
+_validate_duration = PUBLISH_DURATION.labels('validate')
+_spam_check_duration = PUBLISH_DURATION.labels('spam_check')
+_sync_communities_duration = PUBLISH_DURATION.labels('sync_communities')
+_publish_duration = PUBLISH_DURATION.labels('publish')
+_sipstore_duration = PUBLISH_DURATION.labels('sipstore')
+
 
 def sync_buckets(src_bucket, dest_bucket, delete_extras=False):
     """Sync source bucket ObjectVersions to the destination bucket.
@@ -356,6 +365,7 @@ class ZenodoDeposit(Deposit, ZenodoFilesMixin):
 
         return new_dep_comms, new_rec_comms, new_ir_comms
 
+    @_sync_communities_duration.timed
     def _sync_communities(self, dep_comms, rec_comms, record):
         new_dep_comms, new_rec_comms, new_ir_comms = \
             self._get_new_communities(dep_comms, rec_comms, record)
@@ -439,6 +449,7 @@ class ZenodoDeposit(Deposit, ZenodoFilesMixin):
 
         # Update the concept recid redirection
         pv.update_redirect()
+        invalidate_version_dois(conceptrecid.pid_value)
         RecordDraft.unlink(record.pid, self.pid)
         index_siblings(record.pid, neighbors_eager=True, with_deposits=True)
 
@@ -522,13 +533,24 @@ class ZenodoDeposit(Deposit, ZenodoFilesMixin):
                 spam_check=True):
         """Publish the Zenodo deposit."""
         self['owners'] = self['_deposit']['owners']
-        self.validate_publish()
+        with _validate_duration.time():
+            self.validate_publish()
         if spam_check:
-            check_and_handle_spam(deposit=self)
+            with _spam_check_duration.time():
+                check_and_handle_spam(deposit=self)
 
         is_first_publishing = not self.is_published()
 
-        deposit = super(ZenodoDeposit, self).publish(pid, id_)
+        with _publish_duration.time():
+            deposit = super(ZenodoDeposit, self).publish(pid, id_)
+        with _sipstore_duration.time():
+            self._create_sip(deposit, is_first_publishing, user_id=user_id,
+                             sip_agent=sip_agent)
+        return deposit
+
+    def _create_sip(self, deposit, is_first_publishing, user_id=None,
+                    sip_agent=None):
+        """Create the SIP of a published deposit and its BagIt metadata."""
         recid, record = deposit.fetch_published()
 
         pv = PIDVersioning(child=recid)
@@ -560,7 +582,6 @@ class ZenodoDeposit(Deposit, ZenodoFilesMixin):
             recordsip.sip, include_all_previous=(not is_first_publishing),
             patch_of=sip_patch_of)
         archiver.save_bagit_metadata()
-        return deposit
 
     @staticmethod
     def _get_bucket_settings():
@@ -32,7 +32,8 @@ from invenio_indexer.signals import before_record_index
 from . import config
 from .indexer import index_versioned_record_siblings, indexer_receiver
 from .receivers import datacite_register_after_publish, \
-    openaire_direct_index_after_publish, sipstore_write_files_after_publish
+    openaire_direct_index_after_publish, prewarm_citations_after_publish, \
+    sipstore_write_files_after_publish
 
 
 class ZenodoDeposit(object):
@@ -68,6 +69,8 @@ class ZenodoDeposit(object):
                             weak=False)
         post_action.connect(sipstore_write_files_after_publish, sender=app,
                             weak=False)
+        post_action.connect(prewarm_citations_after_publish, sender=app,
+                            weak=False)
 
     @staticmethod
     def init_config(app):
@@ -34,11 +34,17 @@ from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidrelations.serializers.utils import serialize_relations
 from invenio_pidstore.models import PersistentIdentifier
 
+from zenodo.modules.metrics.instrumentation import \
+    INDEXER_RECEIVER_DURATION
 from zenodo.modules.records.utils import build_record_custom_fields
 
 from .api import ZenodoDeposit
 
 
+_deposit_receiver_duration = INDEXER_RECEIVER_DURATION.labels('deposit')
+
+
+@_deposit_receiver_duration.timed
 def indexer_receiver(sender, json=None, record=None, index=None,
                      **dummy_kwargs):
     """Connect to before_record_index signal to transform record for ES.
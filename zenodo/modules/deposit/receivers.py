@@ -31,6 +31,7 @@ from invenio_sipstore.models import RecordSIP
 
 from zenodo.modules.deposit.tasks import datacite_register
 from zenodo.modules.openaire.tasks import openaire_direct_index
+from zenodo.modules.records.tasks import prewarm_citations
 from zenodo.modules.sipstore.tasks import archive_sip
 
 
@@ -65,3 +66,12 @@ def sipstore_write_files_after_publish(sender, action=None, pid=None,
             .first().sip
         )
         archive_sip.delay(str(sip.id))
+
+
+def prewarm_citations_after_publish(sender, action=None, pid=None,
+                                    deposit=None):
+    """Render the citations of the published record in the background."""
+    if action == 'publish' and \
+            current_app.config['ZENODO_RECORDS_CITATION_PREWARM_STYLES']:
+        _, record = deposit.fetch_published()
+        prewarm_citations.delay(str(record.id))
@@ -52,6 +52,8 @@ from zenodo.modules.openaire.helpers import openaire_datasource_id, \
 from zenodo.modules.openaire.tasks import openaire_delete
 from zenodo.modules.records.api import ZenodoRecord
 from zenodo.modules.records.minters import is_local_doi
+from zenodo.modules.records.serializers.pidrelations import \
+    invalidate_version_dois
 from zenodo.modules.spam.proxies import current_domain_forbiddenlist
 
 
@@ -138,6 +140,7 @@ def delete_record(record_uuid, reason, user):
     pv.remove_child(recid)
     pv.update_redirect()
     recid.delete()
+    invalidate_version_dois(record['conceptrecid'])
 
     # Remove the record from index
     try:
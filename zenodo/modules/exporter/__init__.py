@@ -27,5 +27,7 @@
 from __future__ import absolute_import, print_function
 
 from .api import Exporter
-from .streams import BZip2ResultStream, ResultStream
+from .streams import BZip2ResultStream, ParallelBZip2ResultStream, \
+    ParallelCompressedResultStream, ParallelGzipResultStream, \
+    ParallelZstdResultStream, ResultStream
 from .writers import BucketWriter, filename_factory
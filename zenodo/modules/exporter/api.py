@@ -26,9 +26,12 @@
 
 from __future__ import absolute_import, print_function
 
+import json
+
 from elasticsearch_dsl import Q
 from flask import current_app
 from invenio_search.api import RecordsSearch
+from six import BytesIO
 
 from .errors import FailedExportJobError
 from .streams import ResultStream
@@ -39,11 +42,24 @@ class Exporter(object):
 
     Takes as input an index, a query, a serializer and an output writer and
     executes the export job.
+
+    If ``shards`` is greater than one, the index is split into that many
+    slices (using an Elasticsearch sliced scroll) which are exported
+    independently (see :py:meth:`run_shard`) to parts of the output. Each part
+    is a complete output of the result stream, so e.g. BZip2 compressed parts
+    can simply be concatenated. A manifest lists the parts of the dump (see
+    :py:meth:`write_manifest`).
+
+    If ``since`` is set, only the records updated since then are exported
+    (i.e. a delta of a previous dump), and ``removed_fetcher`` provides the
+    ids of the records removed since then (see :py:meth:`write_removed`).
+    ``delta_of`` is the id of the job producing the full dumps.
     """
 
     def __init__(self, index='records', pid_fetcher=None, query=None,
                  resultstream_cls=ResultStream, search_cls=RecordsSearch,
-                 serializer=None, writer=None, ):
+                 serializer=None, writer=None, shards=None, delta_of=None,
+                 removed_fetcher=None, since=None):
         """Initialize exporter."""
         self._index = index
         self._pid_fetcher = pid_fetcher
@@ -52,22 +68,122 @@ class Exporter(object):
         self._search_cls = search_cls
         self._serializer = serializer
         self._writer = writer
+        self._shards = shards
+        self._delta_of = delta_of
+        self._removed_fetcher = removed_fetcher
+        self._since = since
 
     @property
     def search(self):
         """Get Elasticsearch search instance."""
-        s = self._search_cls(index=self._index)
+        s = self._search_cls(index=self._index).extra(version=True)
         if self._query:
             s = s.query(Q('query_string', query=self._query))
+        if self._since:
+            s = s.filter('range', _updated={'gte': self._since.isoformat()})
         return s
 
-    def run(self, progress_updater=None):
-        """Run export job."""
-        fp = self._writer.open()
+    @property
+    def delta_of(self):
+        """Get the id of the full export job, for incremental jobs."""
+        return self._delta_of
+
+    @property
+    def shards(self):
+        """Get the number of shards of a sharded export job."""
+        return self._shards if self._shards and self._shards > 1 else None
+
+    def shard_search(self, shard_id):
+        """Get Elasticsearch search instance for a slice of the index."""
+        return self.search.extra(slice={'id': shard_id, 'max': self.shards})
+
+    def output_key(self):
+        """Get the key of the dump."""
+        return self._writer.resolve_key()
+
+    @staticmethod
+    def part_key(key, shard_id):
+        """Get the key of the part of a dump for a shard."""
+        return '{0}.part-{1:04d}'.format(key, shard_id)
+
+    @staticmethod
+    def removed_key(key):
+        """Get the key of the list of removed records of a delta dump."""
+        return '{0}.removed.json'.format(key)
+
+    @staticmethod
+    def manifest_key(key):
+        """Get the key of the manifest of a sharded dump."""
+        return '{0}.manifest.json'.format(key)
+
+    def _export(self, search, writer):
+        """Write the result stream of a search.
+
+        :returns: ``True`` if all records were serialized.
+        """
+        fp = writer.open()
+        stream = self._resultstream_cls(
+            search, self._pid_fetcher, self._serializer)
         try:
-            fp.write(self._resultstream_cls(
-                self.search, self._pid_fetcher, self._serializer))
+            fp.write(stream)
+            return True
         except FailedExportJobError as e:
             current_app.logger.exception(e.message)
+            return False
         finally:
+            stream.close()
             fp.close()
+
+    def _write_json(self, key, data):
+        """Write a JSON document next to the dump."""
+        fp = self._writer.part(key).open()
+        try:
+            fp.write(BytesIO(json.dumps(data, indent=2).encode('utf8')))
+        finally:
+            fp.close()
+
+    def run(self, progress_updater=None):
+        """Run export job.
+
+        :returns: ``True`` if all records were exported.
+        """
+        key = self.output_key()
+        success = self._export(self.search, self._writer.part(key))
+        if success and self._delta_of:
+            self.write_removed(key)
+        return success
+
+    def run_shard(self, shard_id, key):
+        """Export a single shard of a sharded export job.
+
+        :param shard_id: Id of the index slice to export.
+        :param key: Key of the dump the shard belongs to.
+        :returns: Description of the written part, or ``None`` if the
+            serialization of some records failed.
+        """
+        writer = self._writer.part(self.part_key(key, shard_id))
+        if self._export(self.shard_search(shard_id), writer):
+            return writer.describe()
+
+    def write_manifest(self, key, parts):
+        """Write the manifest of a sharded dump.
+
+        :param key: Key of the dump.
+        :param parts: Descriptions of the written parts, indexed by shard id.
+        """
+        self._write_json(self.manifest_key(key), dict(
+            key=key,
+            parts=[parts[shard_id] for shard_id in sorted(parts)],
+        ))
+
+    def write_removed(self, key):
+        """Write the ids of the records removed since the delta's watermark.
+
+        :param key: Key of the delta dump.
+        """
+        removed = self._removed_fetcher(self._since) \
+            if self._removed_fetcher else []
+        self._write_json(self.removed_key(key), dict(
+            since=self._since.isoformat() if self._since else None,
+            removed=sorted(removed),
+        ))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Checkpoints for resumable and incremental export jobs."""
+
+from __future__ import absolute_import, print_function
+
+from dateutil.parser import parse as dateutil_parse
+from invenio_cache import current_cache
+
+
+class ExportCheckpoint(object):
+    """Progress of a sharded export job.
+
+    The checkpoint stores the key of the dump being produced and the number of
+    shards it is split into. Each finished shard is recorded under its own
+    cache key, so that shard tasks running concurrently never overwrite each
+    other's progress. An export job which finds an existing checkpoint resumes
+    it and only exports the shards which have not finished yet.
+    """
+
+    def __init__(self, job_id):
+        """Initialize the checkpoint of an export job."""
+        self.job_id = job_id
+        self.prefix = 'exporter:checkpoint:{}'.format(job_id)
+
+    def _shard_key(self, shard_id):
+        return '{0}:shard:{1}'.format(self.prefix, shard_id)
+
+    def get(self):
+        """Get the state of the run in progress (if any)."""
+        return current_cache.get(self.prefix)
+
+    def start(self, key, shards, started=None, since=None):
+        """Start a new run.
+
+        :param key: Key of the dump.
+        :param shards: Number of shards.
+        :param started: Start time of the run (ISO formatted).
+        :param since: Watermark of an incremental run (ISO formatted).
+        """
+        state = dict(key=key, shards=shards, started=started, since=since)
+        current_cache.set(self.prefix, state, timeout=-1)
+        return state
+
+    def mark_done(self, shard_id, part):
+        """Record a finished shard and the part it was written to."""
+        current_cache.set(self._shard_key(shard_id), part, timeout=-1)
+
+    def parts(self):
+        """Get the parts of the finished shards, indexed by shard id."""
+        shards = self.get()['shards']
+        parts = current_cache.get_many(
+            *[self._shard_key(i) for i in range(shards)])
+        return {i: p for i, p in enumerate(parts) if p is not None}
+
+    def pending(self):
+        """Get the ids of the shards which have not finished yet."""
+        done = self.parts()
+        return [i for i in range(self.get()['shards']) if i not in done]
+
+    def acquire_finalize(self):
+        """Make sure that only one shard task finalizes the run."""
+        return current_cache.add(
+            '{}:finalize'.format(self.prefix), True, timeout=60 * 60 * 24)
+
+    def clear(self):
+        """Remove the checkpoint once the run has been finalized."""
+        state = self.get()
+        keys = [self.prefix, '{}:finalize'.format(self.prefix)]
+        if state:
+            keys += [self._shard_key(i) for i in range(state['shards'])]
+        current_cache.delete_many(*keys)
+
+
+class ExportWatermark(object):
+    """Start time of the last successful run of an export job.
+
+    Incremental export jobs only export the records updated since the latest
+    watermark of the job or of the job it is a delta of.
+    """
+
+    def __init__(self, job_id):
+        """Initialize the watermark of an export job."""
+        self.key = 'exporter:watermark:{}'.format(job_id)
+
+    def get(self):
+        """Get the watermark."""
+        value = current_cache.get(self.key)
+        return dateutil_parse(value) if value else None
+
+    def set(self, value):
+        """Advance the watermark."""
+        current_cache.set(self.key, value.isoformat(), timeout=-1)
@@ -28,8 +28,10 @@ from __future__ import absolute_import, print_function
 
 from zenodo.modules.records.fetchers import zenodo_record_fetcher
 from zenodo.modules.records.serializers import json_v1
+from zenodo.modules.records.serializers.cache import CachedSerializer
 
 from .streams import BZip2ResultStream
+from .utils import removed_recids
 from .writers import BucketWriter, filename_factory
 
 EXPORTER_BUCKET_UUID = '00000000-0000-0000-0000-000000000001'
@@ -37,7 +39,7 @@ EXPORTER_BUCKET_UUID = '00000000-0000-0000-0000-000000000001'
 EXPORTER_JOBS = {
     'records': {
         'index': 'records',
-        'serializer': json_v1,
+        'serializer': CachedSerializer(json_v1, 'json_v1'),
         'writer': BucketWriter(
             bucket_id=EXPORTER_BUCKET_UUID,
             key=filename_factory(name='records', format='json.bz2'),
@@ -45,6 +47,33 @@ EXPORTER_JOBS = {
         'resultstream_cls': BZip2ResultStream,
         'pid_fetcher': zenodo_record_fetcher,
         'query': "+_exists_:recid +_missing_:removal_reason"
-    }
+    },
+    'records-delta': {
+        'index': 'records',
+        'serializer': CachedSerializer(json_v1, 'json_v1'),
+        'writer': BucketWriter(
+            bucket_id=EXPORTER_BUCKET_UUID,
+            key=filename_factory(name='records-delta', format='json.bz2'),
+        ),
+        'resultstream_cls': BZip2ResultStream,
+        'pid_fetcher': zenodo_record_fetcher,
+        'query': "+_exists_:recid +_missing_:removal_reason",
+        'delta_of': 'records',
+        'removed_fetcher': removed_recids,
+    },
 }
-"""Export jobs definitions."""
+"""Export jobs definitions.
+
+Setting ``shards`` to a number greater than one for a job exports the index
+in that many slices in parallel tasks, writing one part per slice and a
+manifest listing the parts once all of them are done.
+
+The ``resultstream_cls`` of a job selects the output format, e.g.
+``ParallelBZip2ResultStream`` compresses blocks of records on a pool of
+threads instead of the single compressor of ``BZip2ResultStream``.
+
+Setting ``delta_of`` to the id of another job makes a job incremental: it only
+exports the records updated since the last successful run of either job, and
+writes the recids of the records removed in the meantime (as returned by
+``removed_fetcher``) next to the delta dump.
+"""
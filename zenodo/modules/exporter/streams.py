@@ -27,9 +27,18 @@
 from __future__ import absolute_import, print_function
 
 import bz2
+import zlib
+from collections import deque
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 from .errors import FailedExportJobError
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 class ResultStream(object):
     """Stream of serialized records for a search.
@@ -68,7 +77,8 @@ class ResultStream(object):
         try:
             result = self.serializer.serialize_exporter(
                 self.pid_fetcher(hit.meta.id, hit),
-                dict(_source=hit._d_, _version=0),
+                dict(_id=hit.meta.id, _source=hit._d_,
+                     _version=getattr(hit.meta, 'version', 0)),
             )
         except Exception as e:
             self.failed_record_ids.append(hit.meta.id)
@@ -97,6 +107,9 @@ class ResultStream(object):
                 raise FailedExportJobError(record_ids=self.failed_record_ids)
             return b''
 
+    def close(self):
+        """Release the resources of the stream."""
+
 
 class BZip2ResultStream(ResultStream):
     """BZip2 compressed stream of serialized records for a search.
@@ -126,3 +139,127 @@ class BZip2ResultStream(ResultStream):
                 return self.compressor.flush()
             except ValueError:
                 raise StopIteration
+
+
+class ParallelCompressedResultStream(ResultStream):
+    """Compressed stream of serialized records, compressed in parallel.
+
+    Works like :py:data:`BZip2ResultStream`, except that the serialized
+    records are gathered in blocks which are compressed independently on a
+    pool of threads (the compression libraries release the GIL), while the
+    records keep being serialized on the calling thread. Compressed blocks are
+    returned in the order of the records, and their concatenation is a valid
+    multi-stream file (like the ones produced by ``pbzip2`` or ``pigz``).
+
+    Subclasses define the compression format by implementing
+    :py:meth:`compress`.
+
+    :param block_size: Size in bytes of the uncompressed blocks.
+    :param workers: Number of compression threads (defaults to the number of
+        CPUs).
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize result stream."""
+        self.block_size = kwargs.pop('block_size', 900 * 1024)
+        self.workers = kwargs.pop('workers', None) or cpu_count()
+        super(ParallelCompressedResultStream, self).__init__(*args, **kwargs)
+        self._pool = None
+        self._pending = deque()
+        self._exhausted = False
+
+    @staticmethod
+    def compress(data):
+        """Compress a block of serialized records."""
+        raise NotImplementedError()
+
+    def _next_block(self):
+        """Serialize records until a block is full."""
+        chunks, size = [], 0
+        while size < self.block_size:
+            try:
+                data = super(ParallelCompressedResultStream, self).__next__()
+            except StopIteration:
+                self._exhausted = True
+                break
+            if data:
+                chunks.append(data)
+                size += len(data)
+        return b''.join(chunks)
+
+    def __next__(self):
+        """Fetch next compressed block of records."""
+        if self._exhausted and not self._pending:
+            self.close()
+            raise StopIteration
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        try:
+            # Keep all workers busy, while bounding the number of blocks held
+            # in memory.
+            while not self._exhausted and \
+                    len(self._pending) < 2 * self.workers:
+                block = self._next_block()
+                if block:
+                    self._pending.append(
+                        self._pool.apply_async(self.compress, (block, )))
+            if not self._pending:
+                self.close()
+                raise StopIteration
+            return self._pending.popleft().get()
+        except StopIteration:
+            raise
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """Stop the compression threads, discarding pending blocks."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending.clear()
+        self._exhausted = True
+
+
+class ParallelBZip2ResultStream(ParallelCompressedResultStream):
+    """BZip2 compressed stream of serialized records, compressed in parallel.
+
+    The default block size matches the BZip2 block size at the highest
+    compression level.
+    """
+
+    @staticmethod
+    def compress(data):
+        """Compress a block to a BZip2 stream."""
+        return bz2.compress(data)
+
+
+class ParallelGzipResultStream(ParallelCompressedResultStream):
+    """Gzip compressed stream of serialized records, compressed in parallel."""
+
+    @staticmethod
+    def compress(data):
+        """Compress a block to a gzip member."""
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+
+class ParallelZstdResultStream(ParallelCompressedResultStream):
+    """Zstandard compressed stream of serialized records.
+
+    Requires the ``zstandard`` package (``zenodo[zstd]``).
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize result stream."""
+        if zstandard is None:
+            raise RuntimeError('zstandard is required for Zstd exports.')
+        kwargs.setdefault('block_size', 4 * 1024 * 1024)
+        super(ParallelZstdResultStream, self).__init__(*args, **kwargs)
+
+    @staticmethod
+    def compress(data):
+        """Compress a block to a Zstandard frame."""
+        return zstandard.ZstdCompressor(level=10).compress(data)
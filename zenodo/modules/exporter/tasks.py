@@ -26,14 +26,109 @@
 
 from __future__ import absolute_import, print_function
 
+from datetime import datetime
+
 from celery import shared_task
+from dateutil.parser import parse as dateutil_parse
 from flask import current_app
 
 from .api import Exporter
+from .checkpoints import ExportCheckpoint, ExportWatermark
+
+
+def _exporter(job_id, **kwargs):
+    """Get the exporter of a job."""
+    job_definition = current_app.extensions['invenio-exporter'].job(job_id)
+    return Exporter(**dict(job_definition, **kwargs))
+
+
+def _watermark(job_id, delta_of):
+    """Get the watermark for an incremental export job."""
+    watermarks = [
+        w for w in (ExportWatermark(job_id).get(),
+                    ExportWatermark(delta_of).get())
+        if w is not None
+    ]
+    return max(watermarks) if watermarks else None
+
+
+def _state_exporter(job_id, state):
+    """Get the exporter of a job for the run of a checkpoint."""
+    return _exporter(
+        job_id,
+        shards=state['shards'],
+        since=dateutil_parse(state['since']) if state['since'] else None,
+    )
 
 
 @shared_task
 def export_job(job_id=None):
-    """Export job."""
-    job_definition = current_app.extensions['invenio-exporter'].job(job_id)
-    Exporter(**job_definition).run()
+    """Export job.
+
+    Incremental export jobs only export the records updated since the last
+    successful run of the job (or of the job they are a delta of), together
+    with the list of records removed in the meantime.
+
+    Sharded export jobs are split into one task per shard. An unfinished run
+    of the job is resumed, i.e. only its pending shards are exported.
+    """
+    started = datetime.utcnow()
+    exporter = _exporter(job_id)
+    since = _watermark(job_id, exporter.delta_of) \
+        if exporter.delta_of else None
+
+    if not exporter.shards:
+        if _exporter(job_id, since=since).run():
+            ExportWatermark(job_id).set(started)
+        return
+
+    checkpoint = ExportCheckpoint(job_id)
+    if checkpoint.get() is None:
+        checkpoint.start(
+            exporter.output_key(), exporter.shards,
+            started=started.isoformat(),
+            since=since.isoformat() if since else None,
+        )
+    pending = checkpoint.pending()
+    for shard_id in pending:
+        export_shard_job.delay(job_id, shard_id)
+    if not pending and checkpoint.acquire_finalize():
+        finalize_export_job.delay(job_id)
+
+
+@shared_task
+def export_shard_job(job_id, shard_id):
+    """Export a shard of a sharded export job."""
+    checkpoint = ExportCheckpoint(job_id)
+    state = checkpoint.get()
+    if state is None or shard_id not in checkpoint.pending():
+        return
+
+    part = _state_exporter(job_id, state).run_shard(shard_id, state['key'])
+    if part is None:
+        # Leave the shard pending, so that it's retried on resume.
+        return
+    checkpoint.mark_done(shard_id, part)
+    if not checkpoint.pending() and checkpoint.acquire_finalize():
+        finalize_export_job.delay(job_id)
+
+
+@shared_task
+def finalize_export_job(job_id):
+    """Finalize a sharded export job.
+
+    Writes the manifest (and the list of removed records for incremental
+    jobs), advances the watermark and clears the checkpoint of the job.
+    """
+    checkpoint = ExportCheckpoint(job_id)
+    state = checkpoint.get()
+    if state is None:
+        return
+
+    exporter = _state_exporter(job_id, state)
+    exporter.write_manifest(state['key'], checkpoint.parts())
+    if exporter.delta_of:
+        exporter.write_removed(state['key'])
+    if state['started']:
+        ExportWatermark(job_id).set(dateutil_parse(state['started']))
+    checkpoint.clear()
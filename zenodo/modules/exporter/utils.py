@@ -31,6 +31,8 @@ from flask import current_app
 from invenio_db import db
 from invenio_files_rest.errors import FilesException
 from invenio_files_rest.models import Bucket, Location
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
 
 
 def initialize_exporter_bucket():
@@ -51,3 +53,22 @@ def initialize_exporter_bucket():
                         default_storage_class=storage_class)
         db.session.add(bucket)
         db.session.commit()
+
+
+def removed_recids(since=None):
+    """Get the recids of the records removed since a given time.
+
+    :param since: Only consider records removed after this time.
+    """
+    query = db.session.query(
+        PersistentIdentifier.pid_value, RecordMetadata.json
+    ).join(
+        RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid
+    ).filter(
+        PersistentIdentifier.pid_type == 'recid',
+        PersistentIdentifier.status == PIDStatus.DELETED,
+    )
+    if since:
+        query = query.filter(RecordMetadata.updated >= since)
+    return [int(recid) for recid, data in query
+            if data and data.get('removal_reason')]
@@ -41,12 +41,17 @@ class BucketWriter(object):
         self.key = key
         self.obj = None
 
+    def resolve_key(self):
+        """Get the key of the object to write."""
+        return self.key() if callable(self.key) else self.key
+
+    def part(self, key):
+        """Get a writer for a part of the output (e.g. a shard)."""
+        return self.__class__(bucket_id=self.bucket_id, key=key)
+
     def open(self):
         """Open the bucket for writing."""
-        self.obj = ObjectVersion.create(
-            self.bucket_id,
-            self.key() if callable(self.key) else self.key
-        )
+        self.obj = ObjectVersion.create(self.bucket_id, self.resolve_key())
         db.session.commit()
         return self
 
@@ -58,6 +63,14 @@ class BucketWriter(object):
         """Close bucket file."""
         db.session.commit()
 
+    def describe(self):
+        """Describe the written object."""
+        return dict(
+            key=self.obj.key,
+            size=self.obj.file.size,
+            checksum=self.obj.file.checksum,
+        )
+
 
 class NullWriter(object):
     """Export writer that does not write anywhere."""
@@ -65,6 +78,13 @@ class NullWriter(object):
     def __init__(self, **kwargs):
         """Initialize writer."""
 
+    def resolve_key(self):
+        """Dummy key."""
+
+    def part(self, key):
+        """Dummy part writer."""
+        return self
+
     def open(self):
         """Dummy open."""
         return self
@@ -75,6 +95,10 @@ class NullWriter(object):
     def close(self):
         """Dummy close."""
 
+    def describe(self):
+        """Dummy description."""
+        return {}
+
 
 def filename_factory(**kwargs):
     """Get a function which generates a filename with a timestamp."""
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Create metrics daily aggregates table."""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9e8d47'
+down_revision = None
+branch_labels = (u'zenodo_metrics',)
+depends_on = 'dbdbc1b19cf2'  # invenio_db: create alembic_version table
+
+
+def upgrade():
+    """Upgrade database."""
+    op.create_table(
+        'metrics_daily_aggregates',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('download_volume', sa.BigInteger(), nullable=False),
+        sa.Column('upload_volume', sa.BigInteger(), nullable=False),
+        sa.Column('visitors', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('date'),
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_table('metrics_daily_aggregates')
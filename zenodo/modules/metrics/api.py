@@ -34,62 +34,159 @@ from elasticsearch_dsl import Search
 from flask import current_app
 from invenio_accounts.models import User
 from invenio_communities.models import Community
+from invenio_db import db
 from invenio_files_rest.models import FileInstance
 from invenio_search import current_search_client
 from invenio_search.utils import build_alias_name
 
+from .hll import HyperLogLog
+from .models import DailyAggregate
 from .proxies import current_metrics
 
 
+def _time_range(start, end=None):
+    """Build a range filter from a day (and until a day, excluded)."""
+    time_range = {'gte': start.isoformat()}
+    if end:
+        time_range['lt'] = end.isoformat()
+    return time_range
+
+
+def _download_volume(time_range):
+    """Get the bytes of files downloaded in a time range."""
+    search = Search(
+        using=current_search_client,
+        index=build_alias_name('stats-file-download-*')
+    ).filter(
+        'range', timestamp=time_range,
+    ).filter(
+        'term', is_parent=False,
+    )
+    search.aggs.metric('download_volume', 'sum', field='volume')
+    result = search[:0].execute().aggregations.to_dict()
+    return int(result.get('download_volume', {}).get('value') or 0)
+
+
+def _upload_volume(time_range):
+    """Get the bytes of files of the records created in a time range."""
+    search = Search(
+        using=current_search_client,
+        index=build_alias_name('records')
+    ).filter('range', created=time_range)
+    search.aggs.metric('upload_volume', 'sum', field='size')
+    result = search[:0].execute().aggregations.to_dict()
+    return int(result.get('upload_volume', {}).get('value') or 0)
+
+
+def _visitors_sketch(time_range):
+    """Get a sketch of the visitors in a time range."""
+    sketch = HyperLogLog()
+    size = current_app.config['ZENODO_METRICS_VISITORS_PAGE_SIZE']
+    after = None
+    while True:
+        search = Search(
+            using=current_search_client,
+            index=build_alias_name('events-stats-*')
+        ).filter('range', timestamp=time_range)[:0]
+        composite = {
+            'sources': [{'visitor_id': {'terms': {'field': 'visitor_id'}}}],
+            'size': size,
+        }
+        if after:
+            composite['after'] = after
+        search.aggs.bucket('visitors', 'composite', **composite)
+        result = search.execute()
+
+        if 'visitors' not in result.aggregations:
+            break
+        buckets = result.aggregations.visitors.buckets
+        for bucket in buckets:
+            sketch.add(bucket.key.visitor_id)
+        if len(buckets) < size:
+            break
+        after = result.aggregations.visitors.after_key.to_dict()
+    return sketch
+
+
+def update_daily_aggregates(until=None):
+    """Persist the daily partial aggregates of the long-range metrics.
+
+    Only the days after the last aggregated one are computed. Recent days
+    are left out until ``ZENODO_METRICS_DAILY_AGGREGATES_LAG`` days have
+    passed, so that late processed statistics events are accounted for.
+
+    :param until: Aggregate the days before this one (excluded).
+    """
+    lag = current_app.config['ZENODO_METRICS_DAILY_AGGREGATES_LAG']
+    until = until or \
+        datetime.utcnow().date() - timedelta(days=lag)
+    last_date = DailyAggregate.last_date()
+    day = last_date + timedelta(days=1) if last_date else \
+        current_metrics.metrics_start_date.date()
+
+    while day < until:
+        next_day = day + timedelta(days=1)
+        time_range = _time_range(day, next_day)
+        db.session.add(DailyAggregate(
+            date=day,
+            download_volume=_download_volume(time_range),
+            upload_volume=_upload_volume(time_range),
+            visitors=_visitors_sketch(time_range).to_bytes(),
+        ))
+        db.session.commit()
+        day = next_day
+
+
+def _live_start_date():
+    """Get the first day not covered by the daily aggregates."""
+    last_date = DailyAggregate.last_date()
+    if last_date:
+        return last_date + timedelta(days=1)
+
+
 class ZenodoMetric(object):
     """API class for Zenodo Metrics."""
 
     @staticmethod
     def get_data_transfer():
         """Get file transfer volume in TB."""
-        time_range = {'gte': current_metrics.metrics_start_date.isoformat()}
+        start_date = current_metrics.metrics_start_date.date()
+        live_start_date = _live_start_date() or start_date
 
-        search = Search(
-            using=current_search_client,
-            index=build_alias_name('stats-file-download-*')
-        ).filter(
-            'range', timestamp=time_range,
-        ).filter(
-            'term', is_parent=False,
-        )
-        search.aggs.metric('download_volume', 'sum', field='volume')
-        result = search[:0].execute().aggregations.to_dict()
-        download_volume = result.get('download_volume', {}).get('value', 0)
-
-        search = Search(
-            using=current_search_client,
-            index=build_alias_name('records')
-        ).filter('range', created=time_range)
-        search.aggs.metric('upload_volume', 'sum', field='size')
-        result = search[:0].execute().aggregations.to_dict()
-        upload_volume = result.get('upload_volume', {}).get('value', 0)
+        download_volume, upload_volume = DailyAggregate.volumes(start_date)
+        time_range = _time_range(live_start_date)
+        download_volume += _download_volume(time_range)
+        upload_volume += _upload_volume(time_range)
 
         return int(download_volume + upload_volume)
 
     @staticmethod
     def get_visitors():
         """Get number of unique zenodo users."""
-        time_range = {'gte': current_metrics.metrics_start_date.isoformat()}
-
-        search = Search(
-            using=current_search_client,
-            index=build_alias_name('events-stats-*')
-        ).filter('range', timestamp=time_range)
-
-        search.aggs.metric(
-            'visitors_count', 'cardinality', field='visitor_id'
-        )
-        result = search[:0].execute()
-
-        if 'visitors_count' not in result.aggregations:
-            return 0
-
-        return int(result.aggregations.visitors_count.value)
+        start_date = current_metrics.metrics_start_date.date()
+        live_start_date = _live_start_date()
+
+        if live_start_date is None:
+            # Nothing aggregated yet, count the visitors in a single go.
+            search = Search(
+                using=current_search_client,
+                index=build_alias_name('events-stats-*')
+            ).filter('range', timestamp=_time_range(start_date))
+
+            search.aggs.metric(
+                'visitors_count', 'cardinality', field='visitor_id'
+            )
+            result = search[:0].execute()
+
+            if 'visitors_count' not in result.aggregations:
+                return 0
+
+            return int(result.aggregations.visitors_count.value)
+
+        sketch = _visitors_sketch(_time_range(live_start_date))
+        for data in DailyAggregate.visitors_sketches(start_date):
+            sketch.update(HyperLogLog.from_bytes(data))
+        return sketch.count()
 
     @staticmethod
     def get_uptime():
@@ -32,6 +32,25 @@ from .api import ZenodoMetric
 
 ZENODO_METRICS_START_DATE = datetime.datetime(2021, 1, 1)
 ZENODO_METRICS_CACHE_TIMEOUT = 3600
+"""Age in seconds after which cached metrics are recomputed in background."""
+
+ZENODO_METRICS_CACHE_MAX_AGE = 24 * 3600
+"""Age in seconds after which cached metrics are no longer served."""
+
+ZENODO_METRICS_LOCK_TIMEOUT = 600
+"""Seconds after which a stuck metrics recomputation lock expires."""
+
+ZENODO_METRICS_DAILY_AGGREGATES_LAG = 2
+"""Days to wait before aggregating a day, for late statistics events."""
+
+ZENODO_METRICS_VISITORS_PAGE_SIZE = 10000
+"""Number of visitors fetched per search request when building sketches."""
+
+ZENODO_METRICS_RUNTIME_FLUSH_INTERVAL = 15
+"""Seconds between publications of the runtime metrics of a process."""
+
+ZENODO_METRICS_RUNTIME_PROCESS_TIMEOUT = 3600
+"""Seconds after which the runtime metrics of a silent process are dropped."""
 
 ZENODO_METRICS_UPTIME_ROBOT_METRIC_IDS = {}
 ZENODO_METRICS_UPTIME_ROBOT_URL = 'https://api.uptimerobot.com/v2/getMonitors'
@@ -28,7 +28,7 @@ from __future__ import absolute_import, print_function
 
 from flask import current_app
 
-from . import config
+from . import config, instrumentation
 
 
 class ZenodoMetrics(object):
@@ -49,6 +49,7 @@ class ZenodoMetrics(object):
     def init_app(self, app):
         """Flask application initialization."""
         self.init_config(app)
+        instrumentation.init_app(app)
         app.extensions['zenodo-metrics'] = self
 
     @property
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""HyperLogLog sketches for counting distinct values."""
+
+from __future__ import absolute_import, division
+
+import hashlib
+import math
+
+import six
+
+
+class HyperLogLog(object):
+    """HyperLogLog sketch estimating the number of distinct values added.
+
+    Sketches of the same precision can be merged, which gives the sketch of
+    the union of their values. With the default precision a sketch takes
+    4KiB and has a standard error of about 1.6%.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        """Initialize an empty sketch, or one from existing registers."""
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers or self.size)
+        assert len(self.registers) == self.size
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load a sketch dumped with ``to_bytes``."""
+        return cls(precision=int(math.log(len(data), 2)), registers=data)
+
+    def to_bytes(self):
+        """Dump the sketch's registers."""
+        return bytes(self.registers)
+
+    def add(self, value):
+        """Add a value to the sketch."""
+        if isinstance(value, six.text_type):
+            value = value.encode('utf-8')
+        x = int(hashlib.sha1(value).hexdigest()[:16], 16)
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, other):
+        """Merge another sketch into this one."""
+        assert other.precision == self.precision
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """Estimate the number of distinct values added."""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
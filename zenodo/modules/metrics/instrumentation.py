@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Runtime instrumentation of the application hot paths.
+
+Metrics are kept in memory by each process, with the children of every
+label combination created once and reused, so that observing a value only
+takes a bisection and a few increments. Each process periodically publishes
+a snapshot of its metrics in the cache, and the runtime metrics endpoint
+sums up the snapshots of all the processes (web and Celery workers).
+"""
+
+from __future__ import absolute_import, print_function
+
+import json
+import os
+import socket
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from time import time
+from timeit import default_timer
+
+from celery import signals as celery_signals
+from elasticsearch.connection import Urllib3HttpConnection
+from flask import current_app, g, has_app_context, has_request_context, \
+    request
+from invenio_cache import current_cache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from zenodo.modules.utils import obj_or_import_string
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+"""Default histogram buckets, in seconds."""
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+"""Buckets of the number of queries made during a request."""
+
+SNAPSHOTS_KEY = 'zenodo:metrics:runtime'
+"""Redis hash holding the snapshot of each process."""
+
+
+def _escape(value):
+    return u'{}'.format(value).replace('\\', r'\\').replace(
+        '\n', r'\n').replace('"', r'\"')
+
+
+def _format_float(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Timer(object):
+    """Context manager observing the time spent in its block."""
+
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(default_timer() - self.start)
+
+
+class _CounterChild(object):
+    """Counter of a single label combination."""
+
+    __slots__ = ('lock', 'value')
+
+    def __init__(self, family):
+        self.lock = Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Increment the counter."""
+        with self.lock:
+            self.value += amount
+
+    def values(self):
+        """Get the values to snapshot."""
+        with self.lock:
+            return [self.value]
+
+
+class _HistogramChild(object):
+    """Histogram of a single label combination."""
+
+    __slots__ = ('lock', 'bounds', 'counts', 'sum')
+
+    def __init__(self, family):
+        self.lock = Lock()
+        self.bounds = family.buckets
+        self.counts = [0] * (len(family.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Observe a value."""
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the time spent in its block."""
+        return _Timer(self)
+
+    def timed(self, f):
+        """Decorator observing the time spent in a function."""
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            start = default_timer()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.observe(default_timer() - start)
+        return wrapper
+
+    def values(self):
+        """Get the values to snapshot."""
+        with self.lock:
+            return self.counts + [self.sum]
+
+
+class _Family(object):
+    """Metric with all its label combinations."""
+
+    child_class = None
+    type = None
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        """Initialize and register the metric."""
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """Get the child of a label combination.
+
+        Children are meant to be fetched once and kept around (e.g. at import
+        time), as this builds the label key.
+        """
+        assert len(values) == len(self.labelnames)
+        labels = u','.join(
+            u'{0}="{1}"'.format(n, _escape(v))
+            for n, v in zip(self.labelnames, values))
+        child = self.children.get(labels)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(
+                    labels, self.child_class(self))
+        return child
+
+    def snapshot(self):
+        """Get the values of all the children by label key."""
+        return dict(
+            (labels, child.values())
+            for labels, child in list(self.children.items()))
+
+
+class Counter(_Family):
+    """Prometheus counter."""
+
+    child_class = _CounterChild
+    type = 'counter'
+
+    def render(self, values):
+        """Render the values of a snapshot in Prometheus format."""
+        for labels, (value, ) in sorted(values.items()):
+            yield u'{0}{1} {2}\n'.format(
+                self.name, u'{{{0}}}'.format(labels) if labels else u'',
+                _format_float(value))
+
+
+class Histogram(_Family):
+    """Prometheus histogram."""
+
+    child_class = _HistogramChild
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry=None):
+        """Initialize and register the metric."""
+        self.buckets = tuple(float(b) for b in buckets)
+        super(Histogram, self).__init__(
+            name, help, labelnames=labelnames, registry=registry)
+
+    def render(self, values):
+        """Render the values of a snapshot in Prometheus format."""
+        bounds = [_format_float(b) for b in self.buckets] + ['+Inf']
+        for labels, counts in sorted(values.items()):
+            # Bucket counts, followed by the sum of the observed values
+            prefix = labels + u',' if labels else u''
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                yield u'{0}_bucket{{{1}le="{2}"}} {3}\n'.format(
+                    self.name, prefix, bound, total)
+            labels = u'{{{0}}}'.format(labels) if labels else u''
+            yield u'{0}_sum{1} {2}\n'.format(
+                self.name, labels, _format_float(counts[-1]))
+            yield u'{0}_count{1} {2}\n'.format(self.name, labels, total)
+
+
+class Registry(object):
+    """Collection of metrics."""
+
+    def __init__(self):
+        """Initialize the registry."""
+        self.metrics = []
+        self.last_flush = 0
+        self.flush_interval = 15
+
+    def register(self, metric):
+        """Register a metric."""
+        self.metrics.append(metric)
+
+    def snapshot(self):
+        """Get the values of all the metrics by name."""
+        return dict((m.name, m.snapshot()) for m in self.metrics)
+
+    def render(self, snapshot):
+        """Render a snapshot in Prometheus format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(u'# HELP {0} {1}\n# TYPE {0} {2}\n'.format(
+                metric.name, metric.help, metric.type))
+            lines.extend(metric.render(snapshot.get(metric.name, {})))
+        return u''.join(lines)
+
+
+REGISTRY = Registry()
+"""Registry of the runtime metrics of this process."""
+
+SERIALIZER_DURATION = Histogram(
+    'zenodo_serializer_duration_seconds',
+    'Time spent serializing records.',
+    ('format', 'method'),
+)
+INDEXER_RECEIVER_DURATION = Histogram(
+    'zenodo_indexer_receiver_duration_seconds',
+    'Time spent enhancing the indexed records and deposits.',
+    ('receiver', ),
+)
+FILES_PERMISSION_DURATION = Histogram(
+    'zenodo_files_permission_factory_duration_seconds',
+    'Time spent building the permissions of files.',
+)
+PUBLISH_DURATION = Histogram(
+    'zenodo_deposit_publish_duration_seconds',
+    'Time spent in each phase of the publishing of deposits.',
+    ('phase', ),
+)
+SCIENCEDATA_INGEST_DURATION = Histogram(
+    'zenodo_sciencedata_ingest_duration_seconds',
+    'Time spent downloading the files of ScienceData releases.',
+    buckets=DEFAULT_BUCKETS + (30, 60, 300, 900, 3600),
+)
+SCIENCEDATA_INGEST_BYTES = Counter(
+    'zenodo_sciencedata_ingest_bytes_total',
+    'Number of bytes downloaded for ScienceData releases.',
+)
+CELERY_TASK_DURATION = Histogram(
+    'zenodo_celery_task_duration_seconds',
+    'Time spent running Celery tasks.',
+    ('task', ),
+    buckets=DEFAULT_BUCKETS + (30, 60, 300, 900, 3600),
+)
+CELERY_TASK_FAILURES = Counter(
+    'zenodo_celery_task_failures_total',
+    'Number of failed Celery tasks.',
+    ('task', ),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'zenodo_request_db_queries',
+    'Number of database queries made per request.',
+    ('endpoint', ),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_ES_QUERIES = Histogram(
+    'zenodo_request_es_queries',
+    'Number of Elasticsearch queries made per request.',
+    ('endpoint', ),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+
+
+def _process_id():
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+
+def _snapshots_client():
+    if current_app.config.get('CACHE_TYPE') == 'redis':
+        return current_cache.cache._write_client
+
+
+def flush_due():
+    """Check if the snapshot of this process should be published."""
+    return time() - REGISTRY.last_flush >= REGISTRY.flush_interval
+
+
+def flush(force=False):
+    """Publish the snapshot of this process in the cache.
+
+    Snapshots are published at most every
+    ``ZENODO_METRICS_RUNTIME_FLUSH_INTERVAL`` seconds unless forced.
+    """
+    if not force and not flush_due():
+        return
+    now = REGISTRY.last_flush = time()
+    client = _snapshots_client()
+    if client is None:
+        return
+    try:
+        client.hset(SNAPSHOTS_KEY, _process_id(), json.dumps(
+            {'updated': now, 'metrics': REGISTRY.snapshot()}))
+    except Exception:
+        current_app.logger.warning(
+            u'Failed to publish the runtime metrics.', exc_info=True)
+
+
+def collect():
+    """Sum up the snapshots of all the processes.
+
+    Snapshots of processes that did not publish anything for more than
+    ``ZENODO_METRICS_RUNTIME_PROCESS_TIMEOUT`` seconds are discarded.
+    """
+    flush(force=True)
+    client = _snapshots_client()
+    if client is None:
+        return REGISTRY.snapshot()
+
+    timeout = current_app.config['ZENODO_METRICS_RUNTIME_PROCESS_TIMEOUT']
+    now = time()
+    result = {}
+    for process, data in client.hgetall(SNAPSHOTS_KEY).items():
+        data = json.loads(data)
+        if now - data['updated'] > timeout:
+            client.hdel(SNAPSHOTS_KEY, process)
+            continue
+        for name, children in data['metrics'].items():
+            metric = result.setdefault(name, {})
+            for labels, values in children.items():
+                total = metric.get(labels)
+                metric[labels] = values if total is None else \
+                    [a + b for a, b in zip(total, values)]
+    return result
+
+
+def render():
+    """Render the runtime metrics of all the processes."""
+    return REGISTRY.render(collect())
+
+
+class InstrumentedConnectionMixin(object):
+    """Elasticsearch connection mixin counting the queries of requests."""
+
+    def perform_request(self, *args, **kwargs):
+        """Count and perform a request."""
+        counts = g.get('runtime_query_counts') if has_app_context() \
+            else None
+        if counts is not None:
+            counts[1] += 1
+        return super(InstrumentedConnectionMixin, self).perform_request(
+            *args, **kwargs)
+
+
+def instrumented_connection_class(connection_class=None):
+    """Get a subclass of a connection class counting the queries.
+
+    The transport of the connection (pooling, timeouts, retries) is left
+    unchanged.
+
+    :param connection_class: Connection class, or its import path. Defaults
+        to the default class of the Elasticsearch client.
+    """
+    connection_class = obj_or_import_string(
+        connection_class, default=Urllib3HttpConnection)
+    if issubclass(connection_class, InstrumentedConnectionMixin):
+        return connection_class
+    return type(
+        str('Instrumented{0}'.format(connection_class.__name__)),
+        (InstrumentedConnectionMixin, connection_class), {})
+
+
+def _count_db_query(*args, **kwargs):
+    counts = g.get('runtime_query_counts') if has_app_context() else None
+    if counts is not None:
+        counts[0] += 1
+
+
+def _start_request():
+    g.runtime_query_counts = [0, 0]
+
+
+_request_children = {}
+
+
+def _request_query_children(endpoint):
+    """Get the query count histograms of an endpoint, bound once."""
+    children = _request_children.get(endpoint)
+    if children is None:
+        children = _request_children.setdefault(endpoint, (
+            REQUEST_DB_QUERIES.labels(endpoint),
+            REQUEST_ES_QUERIES.labels(endpoint),
+        ))
+    return children
+
+
+def _end_request(exception=None):
+    counts = g.pop('runtime_query_counts', None)
+    if counts is None or not has_request_context():
+        return
+    db_queries, es_queries = _request_query_children(
+        request.endpoint or 'none')
+    db_queries.observe(counts[0])
+    es_queries.observe(counts[1])
+    if flush_due():
+        flush()
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    # Kept on the request of the task, which is discarded with it
+    task.request.metrics_start = default_timer()
+
+
+def _task_postrun(task_id=None, task=None, **kwargs):
+    start = getattr(task.request, 'metrics_start', None)
+    if start is not None:
+        CELERY_TASK_DURATION.labels(task.name).observe(
+            default_timer() - start)
+    if not flush_due():
+        return
+    if has_app_context():
+        flush()
+    else:
+        # Tasks run in an application context which is already gone
+        flask_app = getattr(task.app, 'flask_app', None)
+        if flask_app is not None:
+            with flask_app.app_context():
+                flush()
+
+
+def _task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(sender.name).inc()
+
+
+_setup_lock = Lock()
+_setup_done = []
+
+
+def init_app(app):
+    """Instrument an application.
+
+    Process wide hooks (database, Celery) are installed only once.
+    """
+    REGISTRY.flush_interval = app.config[
+        'ZENODO_METRICS_RUNTIME_FLUSH_INTERVAL']
+    app.before_request(_start_request)
+    app.teardown_request(_end_request)
+
+    client_config = dict(app.config.get('SEARCH_CLIENT_CONFIG') or {})
+    client_config['connection_class'] = instrumented_connection_class(
+        client_config.get('connection_class'))
+    app.config['SEARCH_CLIENT_CONFIG'] = client_config
+
+    with _setup_lock:
+        if _setup_done:
+            return
+        event.listen(Engine, 'before_cursor_execute', _count_db_query)
+        celery_signals.task_prerun.connect(_task_prerun, weak=False)
+        celery_signals.task_postrun.connect(_task_postrun, weak=False)
+        celery_signals.task_failure.connect(_task_failure, weak=False)
+        _setup_done.append(True)
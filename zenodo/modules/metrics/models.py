@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Metrics models."""
+
+from invenio_db import db
+from sqlalchemy import func
+
+
+class DailyAggregate(db.Model):
+    """Partial aggregates of the long-range metrics for a single day."""
+
+    __tablename__ = "metrics_daily_aggregates"
+    __versioned__ = {"versioning": False}
+
+    date = db.Column(db.Date, primary_key=True)
+    """The aggregated day (UTC)."""
+
+    download_volume = db.Column(db.BigInteger, nullable=False, default=0)
+    """Bytes of files downloaded during the day."""
+
+    upload_volume = db.Column(db.BigInteger, nullable=False, default=0)
+    """Bytes of files of the records created during the day."""
+
+    visitors = db.Column(db.LargeBinary, nullable=False)
+    """HyperLogLog sketch of the visitors of the day."""
+
+    @classmethod
+    def last_date(cls):
+        """Get the last aggregated day."""
+        return db.session.query(func.max(cls.date)).scalar()
+
+    @classmethod
+    def volumes(cls, start_date):
+        """Get the total download and upload volumes since a day."""
+        download, upload = db.session.query(
+            func.sum(cls.download_volume), func.sum(cls.upload_volume),
+        ).filter(cls.date >= start_date).one()
+        return int(download or 0), int(upload or 0)
+
+    @classmethod
+    def visitors_sketches(cls, start_date):
+        """Iterate over the visitors sketches since a day."""
+        query = db.session.query(cls.visitors).filter(cls.date >= start_date)
+        for (sketch, ) in query.yield_per(500):
+            yield sketch
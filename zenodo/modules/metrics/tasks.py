@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Zenodo metrics tasks."""
+
+from __future__ import absolute_import
+
+from celery import shared_task
+from flask import current_app
+
+from .api import update_daily_aggregates as _update_daily_aggregates
+from .utils import refresh_metrics
+
+
+@shared_task(ignore_result=True)
+def update_metrics(metric_id=None):
+    """Precompute metrics into the cache.
+
+    :param metric_id: Metric to compute. Computes all of them if ``None``.
+    """
+    metric_ids = [metric_id] if metric_id else \
+        list(current_app.config['ZENODO_METRICS_DATA'])
+    for metric_id in metric_ids:
+        try:
+            refresh_metrics(metric_id)
+        except Exception:
+            current_app.logger.exception(
+                u'Failed to compute metric {}.'.format(metric_id))
+
+
+@shared_task(ignore_result=True)
+def update_daily_aggregates():
+    """Persist the daily partial aggregates of the long-range metrics."""
+    _update_daily_aggregates()
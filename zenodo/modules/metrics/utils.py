@@ -23,31 +23,91 @@
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 
 """Utilities for metrics module."""
+import uuid
 from copy import deepcopy
+from time import time
+from timeit import default_timer
 
 from flask import current_app
 from invenio_cache import current_cache
 
 
-def calculate_metrics(metric_id, cache=True):
-    """Calculate a metric's result."""
-    if cache:
-        cached_data = current_cache.get(
-            'ZENODO_METRICS_CACHE::{}'.format(metric_id))
-        if cached_data is not None:
-            return cached_data
+def cache_key(metric_id):
+    """Get the cache key of a metric's precomputed result."""
+    return 'ZENODO_METRICS_CACHE::{}'.format(metric_id)
+
+
+def lock_key(metric_id):
+    """Get the cache key of a metric's recomputation lock."""
+    return 'ZENODO_METRICS_LOCK::{}'.format(metric_id)
+
 
+def compute_metrics(metric_id):
+    """Compute a metric's result and store it in the cache.
+
+    The cached entry keeps the computed metrics, how long each one of them
+    took to compute and when the computation finished, so that stale
+    entries can still be served while they are being recomputed.
+    """
     result = deepcopy(
         current_app.config['ZENODO_METRICS_DATA'][metric_id])
 
+    durations = []
     for metric in result:
+        start = default_timer()
         metric['value'] = metric['value']()
+        durations.append((metric['name'], default_timer() - start))
+
+    entry = {'metrics': result, 'durations': durations, 'updated': time()}
+    current_cache.set(cache_key(metric_id), entry, timeout=current_app.config[
+        'ZENODO_METRICS_CACHE_MAX_AGE'])
+    return entry
+
+
+def refresh_metrics(metric_id):
+    """Recompute a metric's result, unless someone else already does.
+
+    :returns: The new cached entry, or ``None`` if the lock was held.
+    """
+    key = lock_key(metric_id)
+    token = uuid.uuid4().hex
+    if not current_cache.add(key, token, timeout=current_app.config[
+            'ZENODO_METRICS_LOCK_TIMEOUT']):
+        return None
+    try:
+        return compute_metrics(metric_id)
+    finally:
+        # The lock may have expired and been acquired by someone else
+        if current_cache.get(key) == token:
+            current_cache.delete(key)
 
-    current_cache.set('ZENODO_METRICS_CACHE::{}'.format(metric_id), result,
-                      timeout=current_app.config[
-                          'ZENODO_METRICS_CACHE_TIMEOUT'])
 
-    return result
+def get_metrics(metric_id):
+    """Get a metric's cached entry, serving it even if stale.
+
+    Stale entries trigger a background recomputation. Only when nothing is
+    cached at all the metric is computed in place, by a single caller.
+    """
+    from .tasks import update_metrics
+
+    entry = current_cache.get(cache_key(metric_id))
+    if entry is None:
+        return refresh_metrics(metric_id)
+
+    age = time() - entry['updated']
+    if age > current_app.config['ZENODO_METRICS_CACHE_TIMEOUT'] and \
+            current_cache.get(lock_key(metric_id)) is None:
+        update_metrics.delay(metric_id)
+    return entry
+
+
+def calculate_metrics(metric_id, cache=True):
+    """Calculate a metric's result."""
+    if cache:
+        entry = get_metrics(metric_id)
+    else:
+        entry = compute_metrics(metric_id)
+    return entry['metrics'] if entry else []
 
 
 def formatted_response(metrics):
@@ -58,3 +118,14 @@ def formatted_response(metrics):
                     "{value}\n".format(**metric)
 
     return response
+
+
+def formatted_durations(durations):
+    """Format the metrics' compute durations into Prometheus format."""
+    name = 'zenodo_metrics_compute_duration_seconds'
+    response = '# HELP {name} Time spent computing each metric.\n' \
+               '# TYPE {name} gauge\n'.format(name=name)
+    for metric, duration in durations:
+        response += '{name}{{metric="{metric}"}} {duration:.6f}\n'.format(
+            name=name, metric=metric, duration=duration)
+    return response
@@ -26,7 +26,7 @@
 
 from flask import Blueprint, Response, current_app
 
-from . import utils
+from . import instrumentation, utils
 
 blueprint = Blueprint(
     'zenodo_metrics',
@@ -34,12 +34,23 @@ blueprint = Blueprint(
 )
 
 
+@blueprint.route('/metrics/runtime')
+def runtime_metrics():
+    """Runtime metrics endpoint."""
+    return Response(instrumentation.render(), mimetype='text/plain')
+
+
 @blueprint.route('/metrics/<string:metric_id>')
 def metrics(metric_id):
     """Metrics endpoint."""
     if metric_id not in current_app.config['ZENODO_METRICS_DATA']:
         return Response('Invalid key', status=404, mimetype='text/plain')
 
-    metrics = utils.calculate_metrics(metric_id)
-    response = utils.formatted_response(metrics)
+    entry = utils.get_metrics(metric_id)
+    if entry is None:
+        return Response('Metrics are being computed', status=503,
+                        mimetype='text/plain')
+
+    response = utils.formatted_response(entry['metrics']) + \
+        utils.formatted_durations(entry['durations'])
     return Response(response, mimetype='text/plain')
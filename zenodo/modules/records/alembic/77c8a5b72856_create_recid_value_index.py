@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Create index on the numeric value of recids."""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '77c8a5b72856'
+down_revision = None
+branch_labels = (u'zenodo_records',)
+depends_on = '999c62899c20'  # invenio_pidstore: create pidstore tables
+
+
+def upgrade():
+    """Upgrade database."""
+    # Used to iterate over the records in recid order (e.g. in the sitemap).
+    op.execute(
+        "CREATE INDEX idx_recid_value ON pidstore_pid "
+        "(CAST(pid_value AS BIGINT)) WHERE pid_type = 'recid'"
+    )
+
+
+def downgrade():
+    """Downgrade database."""
+    op.drop_index('idx_recid_value', table_name='pidstore_pid')
@@ -26,6 +26,8 @@
 
 from __future__ import absolute_import, print_function
 
+from os.path import dirname, join
+
 import six
 from flask_babelex import gettext
 from speaklater import make_lazy_gettext
@@ -111,6 +113,71 @@ ZENODO_RELATION_TYPES = [
 
 ZENODO_LOCAL_DOI_PREFIXES = []
 
+ZENODO_INDEXER_BATCH_SIZE = 500
+"""Number of records for which the indexer fetches related data at once."""
+
+ZENODO_VERSION_DOIS_CACHE_TIMEOUT = 60 * 60 * 24
+"""Timeout of the cached DOIs of the versions of concepts (in seconds)."""
+
+ZENODO_RECORDS_SERIALIZATION_CACHE = False
+"""Enable the cache of serialized records."""
+
+ZENODO_RECORDS_SERIALIZATION_CACHE_FORMATS = [
+    'bibtex_v1',
+    'datacite_v31',
+    'datacite_v41',
+    'dc_v1',
+    'dcat_v1',
+    'marcxml_v1',
+    'oai_datacite',
+    'oai_datacite_v41',
+    'schemaorg_jsonld_v1',
+]
+"""Serializers (by name) whose output is cached.
+
+The output is cached per record revision. Serializers which include data not
+stored in the record, such as the statistics and version relations of
+``json_v1``, are served stale until the entry expires.
+"""
+
+ZENODO_RECORDS_SERIALIZATION_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+"""Timeout of the cached serialized records (in seconds)."""
+
+ZENODO_RECORDS_SERIALIZATION_CACHE_MAX_SIZE = 256 * 1024
+"""Maximum size of a cached serialized record (in bytes)."""
+
+ZENODO_RECORDS_CITATION_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+"""Timeout of the cached citations of records (in seconds)."""
+
+ZENODO_RECORDS_BUCKET_CACHE_TIMEOUT = 60
+"""Timeout of the cached records of buckets (in seconds).
+
+Set to ``0`` to resolve the record of a bucket once per request only.
+"""
+
+ZENODO_RECORDS_CITATION_PREWARM_STYLES = ['science', 'apa']
+"""Citation styles rendered when a record is published."""
+
+ZENODO_RECORDS_CITATIONS_BATCH_SIZE = 100
+"""Maximum number of records of a batch citation request."""
+
+ZENODO_RECORDS_XSD_SCHEMAS = {
+    'datacite-v4.1': join(dirname(__file__), 'data', 'metadata41.xsd'),
+}
+"""Local XML schemas used to validate serialized records, by name.
+
+Other schemas (e.g. DataCite v3.1, Dublin Core or MARC21) can be registered
+with the path to a local copy of their XSD.
+"""
+
+ZENODO_RECORDS_XSD_LOCATIONS = {
+    'http://www.w3.org/2009/01/xml.xsd':
+        join(dirname(__file__), 'data', 'xml.xsd'),
+    'https://www.w3.org/2009/01/xml.xsd':
+        join(dirname(__file__), 'data', 'xml.xsd'),
+}
+"""Local copies of the remote schemas imported by the registered schemas."""
+
 
 ZENODO_DOIID4RECID = {
     7468: 7448,
@@ -29,6 +29,8 @@ from __future__ import absolute_import, print_function
 import collections
 
 from invenio_indexer.signals import before_record_index
+from invenio_records.signals import after_record_delete, \
+    after_record_update
 from invenio_pidrelations.contrib.versioning import versioning_blueprint
 from six import itervalues
 from werkzeug.utils import cached_property
@@ -39,7 +41,8 @@ from . import config
 from .custom_metadata import CustomMetadataAPI
 from .indexer import indexer_receiver
 from .proxies import current_zenodo_records
-from .utils import serialize_record, transform_record
+from .utils import invalidate_bucket_record, serialize_record, \
+    transform_record
 from .views import blueprint, record_jinja_context
 
 
@@ -97,6 +100,8 @@ class ZenodoRecords(object):
 
         app.logger.warn('connecting indexer_receiver to before_record_index, '+format(app))
         before_record_index.connect(indexer_receiver, sender=app)
+        after_record_update.connect(invalidate_bucket_record, sender=app)
+        after_record_delete.connect(invalidate_bucket_record, sender=app)
         app.extensions['zenodo-records'] = self
 
     @staticmethod
@@ -26,19 +26,160 @@
 
 from __future__ import absolute_import, print_function
 
+from contextlib import contextmanager
+
+from flask import current_app, g
+from invenio_indexer.api import RecordIndexer
 from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidrelations.proxies import current_pidrelations
 from invenio_pidrelations.serializers.utils import serialize_relations
 from invenio_pidstore.models import PersistentIdentifier
+from invenio_records.models import RecordMetadata
+from werkzeug.utils import cached_property
 
+from zenodo.modules.metrics.instrumentation import \
+    INDEXER_RECEIVER_DURATION
 from zenodo.modules.records.serializers.pidrelations import \
-    serialize_related_identifiers
+    serialize_related_identifiers, serialize_version_relations
 from zenodo.modules.records.utils import build_record_custom_fields
 from zenodo.modules.spam.models import SafelistEntry
-from zenodo.modules.stats.utils import build_record_stats
+from zenodo.modules.stats.utils import build_record_stats, \
+    build_records_stats, chunkify
+
+
+class IndexingBatch(object):
+    """Data of a batch of records being bulk indexed, fetched at once.
+
+    The :py:func:`indexer_receiver` uses the batch (if any) instead of
+    querying the data of each record separately.
+    """
+
+    def __init__(self, record_ids):
+        """Initialize the batch with the UUIDs of its records."""
+        self.record_ids = record_ids
+
+    @cached_property
+    def _recids(self):
+        """Recid and conceptrecid of each record of the batch."""
+        if not self.record_ids:
+            return {}
+        records = RecordMetadata.query.filter(
+            RecordMetadata.id.in_(self.record_ids))
+        return {
+            str(r.id): (r.json.get('recid'), r.json.get('conceptrecid'))
+            for r in records if r.json
+        }
+
+    @cached_property
+    def _stats(self):
+        """Stats of the records of the batch, indexed by recid."""
+        return build_records_stats(list(self._recids.values()))
+
+    def get_stats(self, record):
+        """Get the stats of a record, if it belongs to the batch."""
+        if str(record.id) in self._recids:
+            return self._stats.get(record['recid'])
+
+    @cached_property
+    def _pids(self):
+        """Recid PIDs of the records of the batch."""
+        if not self._recids:
+            return {}
+        pids = PersistentIdentifier.query.filter(
+            PersistentIdentifier.pid_type == 'recid',
+            PersistentIdentifier.object_uuid.in_(list(self._recids)),
+        )
+        return {(str(p.object_uuid), p.pid_value): p for p in pids}
+
+    @cached_property
+    def _relations(self):
+        """Version relations of the records of the batch."""
+        return serialize_version_relations(list(self._pids.values()))
+
+    def get_versioning(self, record):
+        """Get the relations and versioning related identifiers of a record.
+
+        :returns: ``None`` if the record does not belong to the batch, or a
+            tuple of relations and related identifiers (both ``None`` if the
+            record has no recid PID).
+        """
+        if str(record.id) not in self._recids:
+            return None
+        pid = self._pids.get((str(record.id), str(record['recid'])))
+        if pid is None:
+            return None, None
+        relations = self._relations.get(pid.id)
+        if relations is None:
+            return {'version': [{'is_last': True, 'index': 0}, ]}, []
+        related_identifiers = []
+        # External DOI records don't have Concept DOI
+        if 'conceptdoi' in record:
+            related_identifiers.append({
+                'scheme': 'doi',
+                'relation': 'isVersionOf',
+                'identifier': record['conceptdoi']
+            })
+        return relations, related_identifiers
+
+
+@contextmanager
+def indexing_batch(batch):
+    """Make a batch available to the indexer receiver."""
+    g.zenodo_indexing_batch = batch
+    try:
+        yield batch
+    finally:
+        g.pop('zenodo_indexing_batch', None)
+
+
+def current_indexing_batch():
+    """Get the batch of records being bulk indexed (if any)."""
+    return g.get('zenodo_indexing_batch')
+
+
+class ZenodoRecordIndexer(RecordIndexer):
+    """Record indexer which processes the bulk queue in batches.
 
-from flask import current_app
+    Messages are consumed in batches of ``ZENODO_INDEXER_BATCH_SIZE``, and the
+    data needed by :py:func:`indexer_receiver` is fetched at once for all the
+    records of a batch (see :py:class:`IndexingBatch`).
+    """
 
+    def _actionsiter(self, message_iterator):
+        """Iterate bulk actions, in batches."""
+        batch_size = current_app.config['ZENODO_INDEXER_BATCH_SIZE']
+        for messages in chunkify(message_iterator, batch_size):
+            record_ids = [
+                m.decode()['id'] for m in messages
+                if m.decode().get('op') != 'delete'
+            ]
+            with indexing_batch(IndexingBatch(record_ids)):
+                for action in super(ZenodoRecordIndexer, self)._actionsiter(
+                        iter(messages)):
+                    yield action
+
+
+def record_versioning(record):
+    """Get the relations and versioning related identifiers of a record."""
+    pid = PersistentIdentifier.query.filter(
+        PersistentIdentifier.pid_value == str(record['recid']),
+        PersistentIdentifier.pid_type == 'recid',
+        PersistentIdentifier.object_uuid == record.id,
+    ).one_or_none()
+    if not pid:
+        return None, None
+    pv = PIDVersioning(child=pid)
+    if pv.exists:
+        relations = serialize_relations(pid)
+    else:
+        relations = {'version': [{'is_last': True, 'index': 0}, ]}
+    return relations, serialize_related_identifiers(pid)
+
+
+_record_receiver_duration = INDEXER_RECEIVER_DURATION.labels('record')
+
+
+@_record_receiver_duration.timed
 def indexer_receiver(sender, json=None, record=None, index=None,
                      **dummy_kwargs):
     current_app.logger.warn('indexing '+format(index)+' : '+format(record.get('$schema'))+' : '+format(record))
@@ -56,23 +197,13 @@ def indexer_receiver(sender, json=None, record=None, index=None,
         json['filecount'] = len(files)
         json['size'] = sum([f.get('size', 0) for f in files])
 
-    pid = PersistentIdentifier.query.filter(
-        PersistentIdentifier.pid_value == str(record['recid']),
-        PersistentIdentifier.pid_type == 'recid',
-        PersistentIdentifier.object_uuid == record.id,
-    ).one_or_none()
-    if pid:
-        pv = PIDVersioning(child=pid)
-        if pv.exists:
-            relations = serialize_relations(pid)
-        else:
-            relations = {'version': [{'is_last': True, 'index': 0}, ]}
-        if relations:
-            json['relations'] = relations
-
-        rels = serialize_related_identifiers(pid)
-        if rels:
-            json.setdefault('related_identifiers', []).extend(rels)
+    batch = current_indexing_batch()
+    versioning = batch.get_versioning(record) if batch else None
+    relations, rels = versioning or record_versioning(record)
+    if relations:
+        json['relations'] = relations
+    if rels:
+        json.setdefault('related_identifiers', []).extend(rels)
 
     for loc in json.get('locations', []):
         if loc.get('lat') and loc.get('lon'):
@@ -82,9 +213,10 @@ def indexer_receiver(sender, json=None, record=None, index=None,
     if '_internal' in json:
         del json['_internal']
 
-    current_app.logger.warn('building record stats for '+format(record['recid']))
-    json['_stats'] = build_record_stats(record['recid'],
-                                        record.get('conceptrecid'))
+    stats = batch.get_stats(record) if batch else None
+    if stats is None:
+        stats = build_record_stats(record['recid'], record.get('conceptrecid'))
+    json['_stats'] = stats
 
     json['_safelisted'] = SafelistEntry.get_record_status(record)
 
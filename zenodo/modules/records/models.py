@@ -36,7 +36,6 @@ from flask import current_app
 from flask_babelex import format_date, gettext
 from invenio_search import current_search_client
 from invenio_search.api import RecordsSearch
-from jsonref import JsonRef
 from speaklater import make_lazy_gettext
 
 from .utils import is_valid_openaire_type
@@ -154,37 +153,105 @@ class AccessRight(object):
         return [hit.meta.id for hit in s.scan()]
 
 
+class FrozenDict(dict):
+    """Read-only dictionary.
+
+    Resolved object types are shared between all callers, so they must not
+    be modified in place.
+    """
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{0} is immutable.'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _immutable
+
+    def __copy__(self):
+        """Return the dictionary itself, as it cannot change."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Return the dictionary itself, as it cannot change."""
+        return self
+
+
 class ObjectType(object):
     """Class to load object types data."""
 
     index_id = None
     index_internal_id = None
+    index_resolved = None
+    index_cff = None
     types = None
     subtypes = None
 
     @classmethod
     def _load_data(cls):
-        """Load object types for JSON data."""
+        """Load object types for JSON data.
+
+        The indexes are built first and assigned to the class at once, with
+        ``index_id`` last, so that concurrent callers either load the data
+        themselves or see all of it.
+        """
         if cls.index_id is None:
             with open(join(dirname(__file__), "data", "objecttypes.json")) \
                     as fp:
                 data = json.load(fp)
 
-            cls.index_internal_id = {}
-            cls.index_id = {}
-            cls.types = set()
-            cls.subtypes = {}
+            index_internal_id = {}
+            index_id = {}
+            types = set()
+            subtypes = {}
             for objtype in data:
-                cls.index_internal_id[objtype['internal_id']] = objtype
-                cls.index_id[objtype['id'][:-1]] = objtype
+                index_internal_id[objtype['internal_id']] = objtype
+                index_id[objtype['id'][:-1]] = objtype
                 if '-' in objtype['internal_id']:
                     type_, subtype = objtype['internal_id'].split('-')
-                    cls.types.add(type_)
-                    if type_ not in cls.subtypes:
-                        cls.subtypes[type_] = set()
-                    cls.subtypes[type_].add(subtype)
+                    types.add(type_)
+                    if type_ not in subtypes:
+                        subtypes[type_] = set()
+                    subtypes[type_].add(subtype)
                 else:
-                    cls.types.add(objtype['internal_id'])
+                    types.add(objtype['internal_id'])
+
+            # Resolve the references between object types once. Parents and
+            # children point to each other, so the resolved dictionaries are
+            # created first and filled afterwards.
+            index_resolved = dict(
+                (internal_id, FrozenDict())
+                for internal_id in index_internal_id)
+            for internal_id, objtype in index_internal_id.items():
+                dict.update(
+                    index_resolved[internal_id],
+                    cls._resolve(objtype, index_id, index_resolved))
+
+            index_cff = {}
+            for objtype in data:
+                if objtype.get('cff'):
+                    index_cff.setdefault(
+                        objtype['cff'], objtype['internal_id'])
+
+            cls.index_internal_id = index_internal_id
+            cls.types = types
+            cls.subtypes = subtypes
+            cls.index_resolved = index_resolved
+            cls.index_cff = index_cff
+            cls.index_id = index_id
+
+    @classmethod
+    def _resolve(cls, value, index_id, index_resolved):
+        """Replace references to object types with the resolved types."""
+        if isinstance(value, dict):
+            if '$ref' in value:
+                ref = index_id[value['$ref'].split('#')[0]]
+                return index_resolved[ref['internal_id']]
+            return FrozenDict(
+                (k, cls._resolve(v, index_id, index_resolved))
+                for k, v in value.items())
+        elif isinstance(value, list):
+            return tuple(
+                cls._resolve(v, index_id, index_resolved) for v in value)
+        return value
 
     @classmethod
     def validate_internal_id(cls, id):
@@ -192,23 +259,11 @@ class ObjectType(object):
         cls._load_data()
         return id in cls.index_internal_id
 
-    @classmethod
-    def _jsonloader(cls, uri, **dummy_kwargs):
-        """Local JSON loader for JsonRef."""
-        cls._load_data()
-        return cls.index_id[uri]
-
     @classmethod
     def get(cls, value):
         """Get object type value."""
         cls._load_data()
-        try:
-            return JsonRef.replace_refs(
-                cls.index_internal_id[value],
-                jsonschema=True,
-                loader=cls._jsonloader)
-        except KeyError:
-            return None
+        return cls.index_resolved.get(value)
 
     @classmethod
     def get_types(cls):
@@ -227,6 +282,7 @@ class ObjectType(object):
         """Get object type dict with type and subtype key."""
         if not value:
             return None
+        cls._load_data()
         if 'subtype' in value:
             if isinstance(value, AttrDict):
                 value = value.to_dict()
@@ -236,7 +292,7 @@ class ObjectType(object):
             )
         else:
             internal_id = value['type']
-        return cls.get(internal_id)
+        return cls.index_resolved.get(internal_id)
 
     @classmethod
     def get_openaire_subtype(cls, value):
@@ -258,12 +314,8 @@ class ObjectType(object):
         if oa_type and is_valid_openaire_type(value['resource_type'], comms):
             return 'openaire:' + oa_type
 
-
     @classmethod
     def get_cff_type(cls, value):
         """Get resource type of a CFF type."""
-        resource_type_obj = cls.index_internal_id
-        for key in resource_type_obj:
-            if value == resource_type_obj[key].get('cff'):
-                return resource_type_obj[key]['internal_id']
-        return None
+        cls._load_data()
+        return cls.index_cff.get(value)
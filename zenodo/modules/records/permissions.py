@@ -33,19 +33,19 @@ from invenio_access import Permission
 from invenio_files_rest.models import Bucket, MultipartObject, ObjectVersion
 from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidstore.models import PersistentIdentifier
-from invenio_records.api import Record
 from invenio_records_files.api import FileObject
-from invenio_records_files.models import RecordsBuckets
 from invenio_rest.errors import RESTException
 from werkzeug.exceptions import HTTPException
 from zenodo_accessrequests.models import SecretLink
 
+from zenodo.modules.metrics.instrumentation import \
+    FILES_PERMISSION_DURATION
 from zenodo.modules.tokens import decode_rat
 from zenodo.modules.utils import obj_or_import_string
 
 from .api import ZenodoRecord
 from .models import AccessRight
-from .utils import is_deposit, is_record
+from .utils import get_bucket_record, is_deposit, is_record
 from ..tokens.errors import MissingTokenIDError
 
 
@@ -58,6 +58,10 @@ def get_public_bucket_uuids():
     return [current_app.config[k] for k in buckets]
 
 
+_files_permission_duration = FILES_PERMISSION_DURATION.labels()
+
+
+@_files_permission_duration.timed
 def files_permission_factory(obj, action=None):
     """Permission for files are always based on the type of bucket.
 
@@ -84,15 +88,13 @@ def files_permission_factory(obj, action=None):
             return PublicBucketPermission(action)
 
         # Record or deposit bucket
-        rbs = RecordsBuckets.query.filter_by(bucket_id=bucket_id).all()
-        if len(rbs) >= 2:  # Extra formats bucket or bad records-buckets state
+        record = get_bucket_record(bucket_id)
+        if record is False:  # Extra formats bucket or bad records-buckets
             # Only admins should access. Users use the ".../formats" endpoints
             return Permission(ActionNeed('admin-access'))
-        rb = next(iter(rbs), None)  # Use first bucket
-        if rb:
-            record = Record.get_record(rb.record_id)
+        if record:
             # "Cache" the file's record in the request context (e.g for stats)
-            if record and request:
+            if request:
                 setattr(request, 'current_file_record', record)
 
             # Bail if extra formats bucket
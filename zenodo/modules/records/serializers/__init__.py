@@ -27,7 +27,6 @@
 from __future__ import absolute_import, print_function
 
 from dojson.contrib.to_marc21 import to_marc21
-from invenio_records_rest.serializers.citeproc import CiteprocSerializer
 from invenio_records_rest.serializers.datacite import OAIDataCiteSerializer
 from invenio_records_rest.serializers.response import record_responsify, \
     search_responsify
@@ -39,6 +38,8 @@ from zenodo.modules.records.serializers.dc import ZenodoDublinCoreSerializer
 from zenodo.modules.records.serializers.marc21 import ZenodoMARCXMLSerializer
 
 from .bibtex import BibTeXSerializer
+from .cache import CachedSerializer
+from .citeproc import ZenodoCiteprocSerializer
 from .dcat import DCATSerializer
 from .extra_formats import ExtraFormatsSerializer
 from .files import files_responsify
@@ -97,7 +98,7 @@ dc_v1 = ZenodoDublinCoreSerializer(DublinCoreV1, replace_refs=True)
 #: CSL-JSON serializer
 csl_v1 = JSONSerializer(RecordSchemaCSLJSON, replace_refs=True)
 #: CSL Citation Formatter serializer
-citeproc_v1 = CiteprocSerializer(csl_v1)
+citeproc_v1 = ZenodoCiteprocSerializer(csl_v1)
 #: OpenAIRE JSON serializer
 openaire_json_v1 = JSONSerializer(RecordSchemaOpenAIREJSON, replace_refs=True)
 #: JSON-LD serializer
@@ -110,34 +111,44 @@ geojson_v1 = GeoJSONSerializer(replace_refs=False)
 # Records-REST serializers
 # ========================
 #: JSON record serializer for individual records.
-json_v1_response = record_responsify(json_v1, 'application/json')
+json_v1_response = record_responsify(
+    CachedSerializer(json_v1, 'json_v1'), 'application/json')
 #: JSON record legacy serializer for individual records.
-legacyjson_v1_response = record_responsify(legacyjson_v1, 'application/json')
+legacyjson_v1_response = record_responsify(
+    CachedSerializer(legacyjson_v1, 'legacyjson_v1'), 'application/json')
 #: MARCXML record serializer for individual records.
-marcxml_v1_response = record_responsify(marcxml_v1, 'application/marcxml+xml')
+marcxml_v1_response = record_responsify(
+    CachedSerializer(marcxml_v1, 'marcxml_v1'), 'application/marcxml+xml')
 #: BibTeX record serializer for individual records.
-bibtex_v1_response = record_responsify(bibtex_v1, 'application/x-bibtex')
+bibtex_v1_response = record_responsify(
+    CachedSerializer(bibtex_v1, 'bibtex_v1'), 'application/x-bibtex')
 #: DataCite v3.1 record serializer for individual records.
 datacite_v31_response = record_responsify(
-    datacite_v31, 'application/x-datacite+xml')
+    CachedSerializer(datacite_v31, 'datacite_v31'),
+    'application/x-datacite+xml')
 #: DataCite v4.1 record serializer for individual records.
 datacite_v41_response = record_responsify(
-    datacite_v41, 'application/x-datacite-v41+xml')
+    CachedSerializer(datacite_v41, 'datacite_v41'),
+    'application/x-datacite-v41+xml')
 #: DCAT v4.1 record serializer for individual records.
 dcat_response = record_responsify(
-    dcat_v1, 'application/rdf+xml')
+    CachedSerializer(dcat_v1, 'dcat_v1'), 'application/rdf+xml')
 #: DublinCore record serializer for individual records.
-dc_v1_response = record_responsify(dc_v1, 'application/x-dc+xml')
+dc_v1_response = record_responsify(
+    CachedSerializer(dc_v1, 'dc_v1'), 'application/x-dc+xml')
 #: CSL-JSON record serializer for individual records.
 csl_v1_response = record_responsify(
-    csl_v1, 'application/vnd.citationstyles.csl+json')
+    CachedSerializer(csl_v1, 'csl_v1'),
+    'application/vnd.citationstyles.csl+json')
 #: CSL Citation Formatter serializer for individual records.
 citeproc_v1_response = record_responsify(citeproc_v1, 'text/x-bibliography')
 #: OpenAIRE JSON serializer for individual records.
-openaire_json_v1_response = record_responsify(openaire_json_v1,
-                                              'application/x-openaire+json')
-schemaorg_jsonld_v1_response = record_responsify(schemaorg_jsonld_v1,
-                                                 'application/ld+json')
+openaire_json_v1_response = record_responsify(
+    CachedSerializer(openaire_json_v1, 'openaire_json_v1'),
+    'application/x-openaire+json')
+schemaorg_jsonld_v1_response = record_responsify(
+    CachedSerializer(schemaorg_jsonld_v1, 'schemaorg_jsonld_v1'),
+    'application/ld+json')
 
 
 #: JSON record serializer for search results.
@@ -156,7 +167,8 @@ dc_v1_search = search_responsify(dc_v1, 'application/x-dc+xml')
 schemaorg_jsonld_v1_search = record_responsify(
     schemaorg_jsonld_v1, 'application/ld+json')
 #: GeoJSON record serializer for search records.
-geojson_v1_response = record_responsify(geojson_v1, 'application/vnd.geo+json')
+geojson_v1_response = record_responsify(
+    CachedSerializer(geojson_v1, 'geojson_v1'), 'application/vnd.geo+json')
 
 # Deposit serializers
 # ===================
@@ -179,16 +191,23 @@ deposit_json_v1_search = search_responsify(
 # OAI-PMH record serializers.
 # ===========================
 #: OAI-PMH MARC21 record serializer.
-oaipmh_marc21_v1 = marcxml_v1.serialize_oaipmh
+oaipmh_marc21_v1 = CachedSerializer(
+    marcxml_v1, 'marcxml_v1').serialize_oaipmh
 #: OAI-PMH DataCite record serializer.
-oaipmh_datacite_v41 = datacite_v41.serialize_oaipmh
+oaipmh_datacite_v41 = CachedSerializer(
+    datacite_v41, 'datacite_v41').serialize_oaipmh
 #: OAI-PMH DataCite record serializer.
-oaipmh_datacite_v31 = datacite_v31.serialize_oaipmh
+oaipmh_datacite_v31 = CachedSerializer(
+    datacite_v31, 'datacite_v31').serialize_oaipmh
 #: OAI-PMH DCAT record serializer.
-oaipmh_dcat_v1 = dcat_v1.serialize_oaipmh
+oaipmh_dcat_v1 = CachedSerializer(
+    dcat_v1, 'dcat_v1').serialize_oaipmh
 #: OAI-PMH OAI DataCite record serializer.
-oaipmh_oai_datacite = oai_datacite.serialize_oaipmh
+oaipmh_oai_datacite = CachedSerializer(
+    oai_datacite, 'oai_datacite').serialize_oaipmh
 #: OAI-PMH OAI DataCite 4.1 record serializer.
-oaipmh_oai_datacite_v41 = oai_datacite_v41.serialize_oaipmh
+oaipmh_oai_datacite_v41 = CachedSerializer(
+    oai_datacite_v41, 'oai_datacite_v41').serialize_oaipmh
 #: OAI-PMH OAI Dublin Core record serializer.
-oaipmh_oai_dc = dc_v1.serialize_oaipmh
+oaipmh_oai_dc = CachedSerializer(
+    dc_v1, 'dc_v1').serialize_oaipmh
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Cache of serialized records.
+
+The output of a serializer for a record only changes when the record is
+modified, so it is cached by record revision. Old revisions are never read
+again and simply expire.
+"""
+
+from __future__ import absolute_import, print_function
+
+import json
+from functools import partial
+
+from flask import current_app, has_request_context
+from flask_security import current_user
+from invenio_cache import current_cache
+from invenio_records.api import Record
+from lxml import etree
+
+from zenodo.modules.metrics.instrumentation import SERIALIZER_DURATION
+
+from ..permissions import has_read_files_permission
+
+CACHE_PREFIX = 'records:serialization'
+
+METRICS = ('hits', 'misses', 'oversized')
+
+
+def record_revision(record):
+    """Get the UUID and revision of a record or of a search hit.
+
+    :returns: Tuple of the record UUID and revision, or ``(None, None)`` if
+        the revision is not known.
+    """
+    if isinstance(record, dict) and isinstance(record.get('_source'), Record):
+        record = record['_source']
+    if isinstance(record, Record):
+        return record.id, record.revision_id
+    if record.get('_id') and record.get('_version'):
+        return record['_id'], record['_version']
+    return None, None
+
+
+def access_context(record):
+    """Get the access context under which a record is serialized.
+
+    Files are included in some serializations only if the current user can
+    read them.
+    """
+    if isinstance(record, dict) and isinstance(record.get('_source'), Record):
+        record = record['_source']
+    if not isinstance(record, Record) or not has_request_context() or \
+            has_read_files_permission(current_user, record):
+        return 'files'
+    return 'public'
+
+
+def _metric_key(name, metric):
+    return '{0}:metrics:{1}:{2}'.format(CACHE_PREFIX, name, metric)
+
+
+def _inc(name, metric):
+    try:
+        current_cache.cache.inc(_metric_key(name, metric))
+    except Exception:
+        current_app.logger.warning(
+            u'Failed to update serialization cache metrics.', exc_info=True)
+
+
+def cache_metrics(names=None):
+    """Get the counters of the serialization cache.
+
+    :param names: Names of the serializers. Defaults to the serializers in
+        ``ZENODO_RECORDS_SERIALIZATION_CACHE_FORMATS``.
+    :returns: Dictionary with the hits, misses and oversized outputs of each
+        serializer, and the number of keys evicted by Redis (if available).
+    """
+    names = names or current_app.config[
+        'ZENODO_RECORDS_SERIALIZATION_CACHE_FORMATS']
+    values = current_cache.get_many(
+        *[_metric_key(n, m) for n in names for m in METRICS])
+    values = iter(values)
+    result = dict(
+        (n, dict((m, int(next(values) or 0)) for m in METRICS))
+        for n in names)
+
+    if current_app.config.get('CACHE_TYPE') == 'redis':
+        info = current_cache.cache._write_client.info('stats')
+        result['evicted_keys'] = info.get('evicted_keys', 0)
+    return result
+
+
+class CachedSerializer(object):
+    """Serializer proxy caching the serialized records by revision.
+
+    Caching is only done when ``ZENODO_RECORDS_SERIALIZATION_CACHE`` is
+    enabled and the serializer is listed in
+    ``ZENODO_RECORDS_SERIALIZATION_CACHE_FORMATS``. Otherwise all calls go
+    straight to the serializer.
+    """
+
+    def __init__(self, serializer, name):
+        """Initialize the proxy.
+
+        :param serializer: The serializer to proxy.
+        :param name: Name of the serializer, shared by all its proxies (e.g.
+            ``datacite_v41``).
+        """
+        self.serializer = serializer
+        self.name = name
+        self._durations = dict(
+            (method, SERIALIZER_DURATION.labels(name, method))
+            for method in ('serialize', 'transform_record',
+                           'serialize_oaipmh', 'serialize_exporter'))
+
+    def __getattr__(self, name):
+        """Proxy everything else to the serializer."""
+        return getattr(self.serializer, name)
+
+    @property
+    def enabled(self):
+        """Check if the output of the serializer is cached."""
+        return current_app.config['ZENODO_RECORDS_SERIALIZATION_CACHE'] and \
+            self.name in current_app.config[
+                'ZENODO_RECORDS_SERIALIZATION_CACHE_FORMATS']
+
+    def key(self, record, method):
+        """Get the cache key of a serialization, if it can be cached."""
+        record_id, revision = record_revision(record)
+        if record_id is None:
+            return None
+        return '{0}:{1}:{2}:{3}:{4}:{5}'.format(
+            CACHE_PREFIX, record_id, revision, self.name, method,
+            access_context(record))
+
+    def cached(self, record, method, func):
+        """Get a serialization from the cache or compute and store it."""
+        key = self.key(record, method) if self.enabled else None
+        if key is None:
+            return func()
+
+        data = current_cache.get(key)
+        if data is not None:
+            _inc(self.name, 'hits')
+            return data
+        _inc(self.name, 'misses')
+
+        data = func()
+        if len(data) > current_app.config[
+                'ZENODO_RECORDS_SERIALIZATION_CACHE_MAX_SIZE']:
+            _inc(self.name, 'oversized')
+        else:
+            current_cache.set(key, data, timeout=current_app.config[
+                'ZENODO_RECORDS_SERIALIZATION_CACHE_TIMEOUT'])
+        return data
+
+    def serialize(self, pid, record, links_factory=None, **kwargs):
+        """Serialize a single record."""
+        with self._durations['serialize'].time():
+            func = partial(self.serializer.serialize, pid, record,
+                           links_factory=links_factory, **kwargs)
+            if kwargs:
+                return func()
+            method = 'serialize:{0}'.format(
+                getattr(links_factory, '__name__', None))
+            return self.cached(record, method, func)
+
+    def transform_record(self, pid, record, links_factory=None, **kwargs):
+        """Transform a single record into its intermediate representation."""
+        with self._durations['transform_record'].time():
+            if kwargs or links_factory:
+                return self.serializer.transform_record(
+                    pid, record, links_factory=links_factory, **kwargs)
+            return json.loads(self.cached(
+                record, 'transform', lambda: json.dumps(
+                    self.serializer.transform_record(pid, record))))
+
+    def serialize_oaipmh(self, pid, record):
+        """Serialize a single record for OAI-PMH."""
+        with self._durations['serialize_oaipmh'].time():
+            return etree.fromstring(self.cached(
+                record, 'oaipmh', lambda: etree.tostring(
+                    self.serializer.serialize_oaipmh(pid, record))))
+
+    def serialize_exporter(self, pid, record):
+        """Serialize a single record for the exporter."""
+        with self._durations['serialize_exporter'].time():
+            return self.cached(record, 'exporter', partial(
+                self.serializer.serialize_exporter, pid, record))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""CSL citation formatter serializer for records."""
+
+from __future__ import absolute_import, print_function
+
+from os.path import basename, splitext
+
+from flask import current_app
+from invenio_cache import current_cache
+from invenio_records_rest.serializers.citeproc import CiteprocSerializer
+
+from .cache import record_revision
+
+
+class ZenodoCiteprocSerializer(CiteprocSerializer):
+    """CSL citation formatter serializer caching the citations.
+
+    Rendering a citation with citeproc-py is slow, so the citations are
+    cached by record revision, style and locale.
+    """
+
+    def citation_key(self, record, **kwargs):
+        """Get the cache key of the citation of a record, if it is known.
+
+        :param kwargs: Style and locale, as accepted by :meth:`serialize`.
+        """
+        record_id, revision = record_revision(record)
+        if record_id is None:
+            return None
+        args = self._get_args(**kwargs)
+        style = splitext(basename(args['style']))[0]
+        return 'records:citation:{0}:{1}:{2}:{3}'.format(
+            record_id, revision, style, args['locale'])
+
+    def serialize(self, pid, record, links_factory=None, **kwargs):
+        """Serialize a single record."""
+        key = self.citation_key(record, **kwargs)
+        citation = current_cache.get(key) if key else None
+        if citation is None:
+            citation = super(ZenodoCiteprocSerializer, self).serialize(
+                pid, record, links_factory=links_factory, **kwargs)
+            if key:
+                current_cache.set(key, citation, timeout=current_app.config[
+                    'ZENODO_RECORDS_CITATION_CACHE_TIMEOUT'])
+        return citation
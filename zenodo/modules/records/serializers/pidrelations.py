@@ -26,10 +26,149 @@
 
 from __future__ import absolute_import, print_function
 
+from collections import defaultdict
+
+from flask import current_app
+from invenio_cache import current_cache
+from invenio_db import db
 from invenio_pidrelations.contrib.versioning import PIDVersioning
-from invenio_pidstore.models import PersistentIdentifier
+from invenio_pidrelations.models import PIDRelation
+from invenio_pidrelations.utils import resolve_relation_type_config
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.models import RecordMetadata
 
 from zenodo.modules.records.api import ZenodoRecord
+from zenodo.modules.utils import delete_cache_after_commit
+
+
+def _dump_pid(pid):
+    """Dump a PID like the relations' PID schema."""
+    if pid is not None:
+        return {'pid_type': pid.pid_type, 'pid_value': pid.pid_value}
+
+
+def serialize_version_relations(pids):
+    """Serialize the version relations of many PIDs at once.
+
+    Gives the same result as ``serialize_relations`` for each of the PIDs,
+    but loads the relations, the versions and the draft deposits of all their
+    concepts with a fixed number of queries.
+
+    :param pids: Record PIDs (children of version relations).
+    :returns: Dictionary of PID id to serialized relations, for the PIDs which
+        are versioned.
+    """
+    if not pids:
+        return {}
+    version_type = resolve_relation_type_config('version').id
+    draft_type = resolve_relation_type_config('record_draft').id
+
+    relations = {r.child_id: r for r in PIDRelation.query.filter(
+        PIDRelation.child_id.in_([p.id for p in pids]),
+        PIDRelation.relation_type == version_type,
+    )}
+    if not relations:
+        return {}
+    parent_ids = {r.parent_id for r in relations.values()}
+    parents = {p.id: p for p in PersistentIdentifier.query.filter(
+        PersistentIdentifier.id.in_(parent_ids))}
+
+    # Versions of all the concepts, ordered by index
+    versions = defaultdict(list)
+    rows = db.session.query(
+        PIDRelation.parent_id, PIDRelation.index, PersistentIdentifier
+    ).join(
+        PersistentIdentifier, PIDRelation.child_id == PersistentIdentifier.id
+    ).filter(
+        PIDRelation.parent_id.in_(parent_ids),
+        PIDRelation.relation_type == version_type,
+    ).order_by(PIDRelation.index.asc())
+    for parent_id, index, pid in rows:
+        versions[parent_id].append((index, pid))
+
+    # Deposits of the draft (i.e. new, unpublished) versions
+    drafts = {}
+    for parent_id, children in versions.items():
+        reserved = [p for i, p in children
+                    if i is not None and p.status == PIDStatus.RESERVED]
+        if len(reserved) == 1:
+            drafts[parent_id] = reserved[0]
+    deposits = {}
+    if drafts:
+        deposits = dict(db.session.query(
+            PIDRelation.parent_id, PersistentIdentifier
+        ).join(
+            PersistentIdentifier,
+            PIDRelation.child_id == PersistentIdentifier.id
+        ).filter(
+            PIDRelation.parent_id.in_([d.id for d in drafts.values()]),
+            PIDRelation.relation_type == draft_type,
+        ))
+
+    result = {}
+    for pid in pids:
+        relation = relations.get(pid.id)
+        if relation is None:
+            continue
+        children = [(i, p) for i, p in versions[relation.parent_id]
+                    if p.status == PIDStatus.REGISTERED]
+        indexed = [p for i, p in children if i is not None]
+        last_child = indexed[-1] if indexed else None
+        draft = drafts.get(relation.parent_id)
+        if children:
+            is_last = children[-1][1].id == pid.id
+        elif draft is not None:
+            is_last = draft.id == pid.id
+        else:
+            is_last = True
+        result[pid.id] = {'version': [{
+            'parent': _dump_pid(parents[relation.parent_id]),
+            'is_last': is_last,
+            'index': relation.index,
+            'last_child': _dump_pid(last_child),
+            'count': len(children),
+            'draft_child_deposit': _dump_pid(
+                deposits.get(draft.id) if draft is not None else None),
+        }]}
+    return result
+
+
+def _version_dois_key(conceptrecid):
+    return 'pidrelations:version_dois:{}'.format(conceptrecid)
+
+
+def version_dois(parent):
+    """Get the DOIs of the versions of a concept, in order.
+
+    The DOIs of all versions are fetched with a single query, and cached per
+    concept (see :py:func:`invalidate_version_dois`).
+
+    :param parent: Concept recid PID.
+    """
+    key = _version_dois_key(parent.pid_value)
+    dois = current_cache.get(key)
+    if dois is None:
+        children = PIDVersioning(parent=parent).children.all()
+        records = dict(db.session.query(
+            RecordMetadata.id, RecordMetadata.json
+        ).filter(
+            RecordMetadata.id.in_([c.object_uuid for c in children])
+        )) if children else {}
+        dois = [records[c.object_uuid]['doi'] for c in children]
+        current_cache.set(
+            key, dois,
+            timeout=current_app.config['ZENODO_VERSION_DOIS_CACHE_TIMEOUT'])
+    return dois
+
+
+def invalidate_version_dois(conceptrecid):
+    """Invalidate the cached DOIs of the versions of a concept.
+
+    Has to be called whenever a version is published or removed. The cached
+    DOIs are dropped again once the transaction is committed, so that the
+    DOIs cached by concurrent requests in the meantime do not outlive it.
+    """
+    delete_cache_after_commit(_version_dois_key(conceptrecid))
 
 
 def serialize_related_identifiers(pid):
@@ -73,14 +212,13 @@ def serialize_related_identifiers(pid):
         #         'identifier': rec['doi']
         #     }
         #     related_identifiers.append(ri)
-    pv = PIDVersioning(parent=pid)
-    if pv.exists:
-        for p in pv.children:
-            rec = ZenodoRecord.get_record(p.get_assigned_object())
+    else:
+        # Versions are never concepts themselves
+        for doi in version_dois(pid):
             ri = {
                 'scheme': 'doi',
                 'relation': 'hasVersion',
-                'identifier': rec['doi']
+                'identifier': doi
             }
             related_identifiers.append(ri)
     return related_identifiers
@@ -32,14 +32,14 @@ from celery import shared_task
 from flask import current_app
 from invenio_cache import current_cache
 from invenio_db import db
-from invenio_indexer.api import RecordIndexer
-from invenio_pidstore.models import PIDStatus
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_pidstore.providers.datacite import DataCiteProvider
 from invenio_records import Record
 from lxml import etree
 
+from zenodo.modules.records.indexer import ZenodoRecordIndexer
 from zenodo.modules.records.models import AccessRight
-from zenodo.modules.records.serializers import datacite_v41
+from zenodo.modules.records.serializers import citeproc_v1, datacite_v41
 from zenodo.modules.records.utils import find_registered_doi_pids, xsd41
 
 
@@ -52,11 +52,23 @@ def update_expired_embargos():
         record.commit()
     db.session.commit()
 
-    indexer = RecordIndexer()
+    indexer = ZenodoRecordIndexer()
     indexer.bulk_index(record_ids)
     indexer.process_bulk_queue()
 
 
+@shared_task(ignore_result=True)
+def process_bulk_queue(version_type=None, es_bulk_kwargs=None):
+    """Process the bulk indexing queue, in batches of records.
+
+    :param str version_type: Elasticsearch version type.
+    :param dict es_bulk_kwargs: Passed to
+        :func:`elasticsearch:elasticsearch.helpers.bulk`.
+    """
+    ZenodoRecordIndexer(version_type=version_type).process_bulk_queue(
+        es_bulk_kwargs=es_bulk_kwargs)
+
+
 @shared_task(ignore_result=True, rate_limit='1000/h')
 def update_datacite_metadata(doi, object_uuid, job_id):
     """Update DataCite metadata of a single PersistentIdentifier.
@@ -82,8 +94,7 @@ def update_datacite_metadata(doi, object_uuid, job_id):
 
     doc = datacite_v41.serialize(dcp.pid, record)
 
-    for validator in xsd41():
-        validator.assertValid(etree.XML(doc.encode('utf8')))
+    xsd41().assertValid(etree.XML(doc.encode('utf8')))
 
     url = None
     if doi == record.get('doi'):
@@ -129,3 +140,22 @@ def schedule_update_datacite_metadata(max_count):
         update_datacite_metadata.delay(doi_pid.pid_value,
                                        str(doi_pid.object_uuid),
                                        task_details['job_id'])
+
+
+@shared_task(ignore_result=True)
+def prewarm_citations(record_uuid):
+    """Render and cache the citations of a newly published record.
+
+    :param record_uuid: Record Metadata UUID.
+    :type record_uuid: str
+    """
+    record = Record.get_record(record_uuid)
+    pid = PersistentIdentifier.get('recid', record['recid'])
+    locale = current_app.config.get('BABEL_DEFAULT_LOCALE', 'en')
+    for style in current_app.config['ZENODO_RECORDS_CITATION_PREWARM_STYLES']:
+        try:
+            citeproc_v1.serialize(pid, record, style=style, locale=locale)
+        except Exception:
+            current_app.logger.exception(
+                u'Citation formatting for record {0} failed.'.format(
+                    record_uuid))
@@ -27,20 +27,26 @@
 
 from __future__ import absolute_import, print_function
 
-from os.path import dirname, join
+import uuid
+from threading import Lock
 
-from flask import current_app
+from flask import current_app, has_request_context, request
+from invenio_cache import current_cache
 from invenio_db import db
 from invenio_indexer.utils import schema_to_index
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_records.api import Record
+from invenio_records.models import RecordMetadata
+from invenio_records_files.models import RecordsBuckets
 from invenio_search import current_search
 from lxml import etree
+from six import text_type
 from sqlalchemy import or_
 from werkzeug.utils import import_string
 
 from zenodo.modules.openaire import current_openaire
 from zenodo.modules.records import current_custom_metadata
+from zenodo.modules.utils import delete_cache_after_commit
 
 
 def schema_prefix(schema):
@@ -62,6 +68,86 @@ def is_deposit(record):
     return schema_prefix(record.get('$schema')) == 'deposits'
 
 
+def _bucket_record_cache_key(bucket_id):
+    """Get the cache key of the record of a bucket."""
+    return 'records:bucket_record:{0}'.format(bucket_id)
+
+
+def _request_bucket_records():
+    """Get the bucket resolutions memoized on the current request."""
+    if not has_request_context():
+        return None
+    memo = getattr(request, 'zenodo_bucket_records', None)
+    if memo is None:
+        memo = request.zenodo_bucket_records = {}
+    return memo
+
+
+def get_bucket_record(bucket_id):
+    """Get the record or deposit of a bucket.
+
+    The resolution is memoized on the current request, as it is needed
+    several times per file request (object, bucket, statistics event), and
+    shared between requests through the cache for
+    ``ZENODO_RECORDS_BUCKET_CACHE_TIMEOUT`` seconds. Cached resolutions are
+    dropped once an update or deletion of their record is committed.
+
+    :param bucket_id: Bucket identifier.
+    :returns: The record, ``False`` if the bucket belongs to several records
+        (e.g. extra formats buckets), or ``None`` if it belongs to none.
+    """
+    bucket_id = str(bucket_id)
+    memo = _request_bucket_records()
+    if memo is not None and bucket_id in memo:
+        return memo[bucket_id]
+
+    key = _bucket_record_cache_key(bucket_id)
+    timeout = current_app.config['ZENODO_RECORDS_BUCKET_CACHE_TIMEOUT']
+    entry = current_cache.get(key) if timeout else None
+    if entry is None:
+        models = RecordMetadata.query.join(
+            RecordsBuckets, RecordsBuckets.record_id == RecordMetadata.id
+        ).filter(RecordsBuckets.bucket_id == bucket_id).limit(2).all()
+        if len(models) >= 2:
+            entry = dict(multiple=True)
+        elif models and models[0].json is not None:
+            entry = dict(id=str(models[0].id), json=models[0].json,
+                         version_id=models[0].version_id)
+        if entry is not None and timeout:
+            current_cache.set(key, entry, timeout=timeout)
+
+    if entry is None:
+        record = None
+    elif entry.get('multiple'):
+        record = False
+    else:
+        # The model is only used for the identifier and revision
+        record = Record(entry['json'], model=RecordMetadata(
+            id=uuid.UUID(entry['id']), json=entry['json'],
+            version_id=entry['version_id']))
+    if memo is not None:
+        memo[bucket_id] = record
+    return record
+
+
+def invalidate_bucket_record(sender, record=None, **kwargs):
+    """Drop the cached resolutions of the buckets of a record."""
+    bucket_ids = set(
+        str(b) for b in (record.get('_buckets') or {}).values() if b)
+    if record.id is not None:
+        bucket_ids.update(
+            str(bucket_id) for bucket_id, in db.session.query(
+                RecordsBuckets.bucket_id).filter_by(record_id=record.id))
+    if not bucket_ids:
+        return
+    delete_cache_after_commit(
+        *[_bucket_record_cache_key(b) for b in bucket_ids])
+    memo = _request_bucket_records()
+    if memo:
+        for bucket_id in bucket_ids:
+            memo.pop(bucket_id, None)
+
+
 def transform_record(record, pid, serializer, module=None, throws=True,
                      **kwargs):
     """Transform a record using a serializer."""
@@ -137,25 +223,74 @@ def find_registered_doi_pids(from_date, until_date, prefixes):
     return query
 
 
-def xsd41():
-    """Load DataCite v4.1 full example as an etree."""
-    from zenodo.modules.records.httpretty_mock import httpretty
+class LocalSchemaResolver(etree.Resolver):
+    """Resolve schema imports and includes to local files.
 
-    # Ensure the schema validator doesn't make any http requests.
-    with open(join(dirname(__file__), 'data', 'xml.xsd')) as fp:
-        xmlxsd = fp.read()
+    Keeps the XML schema compilation from making any HTTP requests.
+    """
 
-    httpretty.enable()
-    httpretty.register_uri(
-        httpretty.GET,
-        'https://www.w3.org/2009/01/xml.xsd',
-        body=xmlxsd)
+    def __init__(self, locations):
+        """Initialize resolver with a mapping of URLs to local paths."""
+        super(LocalSchemaResolver, self).__init__()
+        self.locations = locations
 
-    yield etree.XMLSchema(
-        file='file://' + join(dirname(__file__), 'data', 'metadata41.xsd')
-    )
+    def resolve(self, url, pubid, context):
+        """Resolve a known URL to its local copy."""
+        path = self.locations.get(url)
+        if path is not None:
+            return self.resolve_filename(path, context)
 
-    httpretty.disable()
+
+_xsd_validators = {}
+_xsd_validators_lock = Lock()
+
+
+def xsd_validator(name):
+    """Get the compiled XML schema registered under a name.
+
+    Schemas are compiled on first use and kept for the lifetime of the
+    process.
+
+    :param name: Name of the schema in ``ZENODO_RECORDS_XSD_SCHEMAS``.
+    :returns: A :class:`lxml.etree.XMLSchema` instance.
+    """
+    path = current_app.config['ZENODO_RECORDS_XSD_SCHEMAS'][name]
+    validator = _xsd_validators.get(path)
+    if validator is None:
+        with _xsd_validators_lock:
+            validator = _xsd_validators.get(path)
+            if validator is None:
+                parser = etree.XMLParser(no_network=True)
+                parser.resolvers.add(LocalSchemaResolver(
+                    current_app.config['ZENODO_RECORDS_XSD_LOCATIONS']))
+                validator = etree.XMLSchema(etree.parse(path, parser))
+                _xsd_validators[path] = validator
+    return validator
+
+
+def xsd41():
+    """Get the DataCite v4.1 schema validator."""
+    return xsd_validator('datacite-v4.1')
+
+
+def validate_xml(documents, schema='datacite-v4.1'):
+    """Validate serialized XML documents against a registered schema.
+
+    :param documents: Iterable of serialized XML documents.
+    :param schema: Name of the schema in ``ZENODO_RECORDS_XSD_SCHEMAS``.
+    :returns: List with, for each document, ``None`` if it is valid or the
+        error log of the validation otherwise.
+    """
+    validator = xsd_validator(schema)
+    errors = []
+    for doc in documents:
+        if isinstance(doc, text_type):
+            doc = doc.encode('utf8')
+        if validator.validate(etree.XML(doc)):
+            errors.append(None)
+        else:
+            errors.append(validator.error_log)
+    return errors
 
 
 def build_record_custom_fields(record):
@@ -65,6 +65,7 @@ from .models import AccessRight, ObjectType
 from .permissions import RecordPermission
 from .proxies import current_custom_metadata
 from .serializers import citeproc_v1
+from .serializers.cache import CachedSerializer
 from .serializers.json import ZenodoJSONSerializer
 
 blueprint = Blueprint(
@@ -394,12 +395,14 @@ def records_ui_export(pid, record, template=None, **kwargs):
             'zenodo_records/records_export_unsupported.html'), 410
     else:
         serializer = import_string(formats[fmt]['serializer'])
+        cached_serializer = CachedSerializer(
+            serializer, formats[fmt]['serializer'].rsplit('.', 1)[-1])
         # Pretty print if JSON
         if isinstance(serializer, ZenodoJSONSerializer):
-            json_data = serializer.transform_record(pid, record)
+            json_data = cached_serializer.transform_record(pid, record)
             data = json.dumps(json_data, indent=2, separators=(', ', ': '))
         else:
-            data = serializer.serialize(pid, record)
+            data = cached_serializer.serialize(pid, record)
         if isinstance(data, six.binary_type):
             data = data.decode('utf8')
 
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Zenodo.
+# Copyright (C) 2022 CERN.
+#
+# Zenodo is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Zenodo is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zenodo; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Zenodo records REST API views."""
+
+from __future__ import absolute_import, print_function
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+
+from .api import ZenodoRecord
+from .serializers import citeproc_v1
+
+blueprint = Blueprint(
+    'zenodo_records_rest',
+    __name__,
+    url_prefix='',
+)
+
+
+@blueprint.route(
+    '/citations',
+    methods=['GET']
+)
+def citations():
+    """Render the citation of several records at once.
+
+    The records are given by recid (e.g. ``?recid=1&recid=2``). The style and
+    locale are passed like for the single record citations. Records which
+    do not exist or fail to render are omitted from the result.
+    """
+    recids = request.args.getlist('recid')
+    if not recids or len(recids) > \
+            current_app.config['ZENODO_RECORDS_CITATIONS_BATCH_SIZE']:
+        abort(400)
+
+    pids = PersistentIdentifier.query.filter(
+        PersistentIdentifier.pid_type == 'recid',
+        PersistentIdentifier.pid_value.in_(recids),
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        PersistentIdentifier.object_type == 'rec',
+    ).all()
+    records = dict(
+        (record.id, record) for record in
+        ZenodoRecord.get_records([pid.object_uuid for pid in pids]))
+
+    result = {}
+    for pid in pids:
+        record = records.get(pid.object_uuid)
+        if record is None:
+            continue
+        try:
+            result[pid.pid_value] = citeproc_v1.serialize(pid, record)
+        except Exception:
+            # Omit the record, like missing ones, instead of failing the batch
+            current_app.logger.exception(
+                'Failed to render the citation of record %s.', pid.pid_value)
+    return jsonify(result)
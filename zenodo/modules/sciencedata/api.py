@@ -5,16 +5,23 @@
 
 import json
 import datetime
+import hashlib
 import re
 import os
 import uuid
 import urllib
 
-from flask import current_app
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+from flask import current_app, has_request_context
 from flask_login import current_user
+from invenio_cache import current_cache
 
 from invenio_db import db
-from invenio_files_rest.models import ObjectVersion
+from invenio_files_rest.errors import FileSizeError
+from invenio_files_rest.limiters import FileSizeLimit
+from invenio_files_rest.models import FileInstance, Location, ObjectVersion
 from invenio_oauthclient.models import RemoteAccount
 from invenio_accounts.models import User
 from invenio_userprofiles.models import UserProfile
@@ -24,20 +31,92 @@ from invenio_indexer.api import RecordIndexer
 from invenio_pidrelations.contrib.versioning import PIDVersioning
 from invenio_pidstore.models import PersistentIdentifier
 
-import requests
 from six import string_types
+from six.moves.urllib.parse import urlparse
 from werkzeug.utils import cached_property, import_string
 
 from zenodo.modules.deposit.api import ZenodoDeposit
 from zenodo.modules.deposit.tasks import datacite_register
+from zenodo.modules.metrics.instrumentation import \
+    SCIENCEDATA_INGEST_BYTES, SCIENCEDATA_INGEST_DURATION
 from zenodo.modules.records.api import ZenodoRecord
 
+from .errors import ChecksumMismatchError
 from .models import Release
 from .models import ReleaseStatus
+from .proxies import current_sciencedata, current_sciencedata_api
+from .utils import ChecksumStream, announced_checksum, remote_version
 
 from ..deposit.loaders import legacyjson_v1_translator
+
 from ..jsonschemas.utils import current_jsonschemas
 
+_ingest_duration = SCIENCEDATA_INGEST_DURATION.labels()
+_ingest_bytes = SCIENCEDATA_INGEST_BYTES.labels()
+
+
+def remove_files(file_ids):
+    """Remove downloaded release files which are not attached to a record.
+
+    The file instances are deleted and the session committed before their
+    data is removed from the storage, so that a failure leaves at worst
+    unreferenced data behind.
+
+    :param file_ids: File instance identifiers.
+    """
+    storages = []
+    for file_id in file_ids:
+        fileinstance = FileInstance.query.get(file_id)
+        if fileinstance is None or ObjectVersion.query.filter_by(
+                file_id=fileinstance.id).count():
+            continue
+        if fileinstance.uri:
+            storages.append(fileinstance.storage())
+        fileinstance.delete()
+    db.session.commit()
+    for storage in storages:
+        try:
+            storage.delete()
+        except Exception:
+            current_app.logger.exception(
+                'could not delete {0}'.format(storage.fileurl))
+
+
+def attach_files(bucket, files):
+    """Attach downloaded release files to a bucket.
+
+    The files are already stored, so the quota of the bucket is checked and
+    its size updated here, as storing them through the bucket would do.
+
+    :param bucket: Bucket of the deposit.
+    :param files: Ingestion progress of the files, by file key.
+    :raises invenio_files_rest.errors.FileSizeError: If the bucket quota is
+        exceeded.
+    """
+    for key, entry in sorted(files.items()):
+        size_limit = bucket.size_limit
+        if size_limit is not None and entry['size'] > size_limit.limit:
+            raise FileSizeError(description=size_limit.reason)
+        ObjectVersion.create(
+            bucket=bucket,
+            key=key,
+            _file_id=entry['file_id'],
+            mimetype=entry.get('mimetype'),
+        )
+        bucket.size += entry['size']
+
+
+def remove_release_files(release):
+    """Remove the downloaded files of a release which were not published.
+
+    :param release: Release model.
+    """
+    file_ids = [entry['file_id'] for entry in (release.files or {}).values()
+                if entry.get('file_id')]
+    release.files = None
+    remove_files(file_ids)
+
+
 class ScienceDataAPI(object):
     """Wrapper for ScienceData API."""
 
@@ -46,68 +125,183 @@ class ScienceDataAPI(object):
         user_id = user_id or current_user.get_id()
         self.user_id = int(user_id)
 
+    def request(self, method, url, **kwargs):
+        """Send a request to ScienceData over the pooled HTTP session."""
+        kwargs.setdefault('timeout', current_app.config['SCIENCEDATA_HTTP_TIMEOUT'])
+        return current_sciencedata.http.request(method, url, **kwargs)
+
+    def proxy(self, method, path, **kwargs):
+        """Open a streamed request to a path on the ScienceData servers.
+
+        A temporary redirect to the home server of the user is followed once.
+        The caller is responsible for closing the returned response.
+        """
+        url = current_app.config['SCIENCEDATA_PRIVATE_URL'] + path
+        headers = dict(kwargs.pop('headers', None) or {})
+        kwargs.update(stream=True, allow_redirects=False,
+                      auth=(self.scienceDataUser, ''))
+        headers['Host'] = str(urlparse(url).hostname)
+        r = self.request(method, url, headers=headers, **kwargs)
+        if r.status_code == 307:
+            url = r.headers['location']
+            r.close()
+            current_app.logger.warn('now trying '+format(url))
+            headers['Host'] = str(urlparse(url).hostname)
+            r = self.request(method, url, headers=headers, **kwargs)
+        return r
+
+    @property
+    def cache_key(self):
+        """Cache key of the ScienceData lookups of the user."""
+        return 'sciencedata:user:{0}'.format(self.user_id)
+
+    def public_url_cache_key(self, path, group):
+        """Cache key of the public URL of an object of the user."""
+        return 'sciencedata:public_url:{0}:{1}'.format(
+            self.user_id,
+            hashlib.sha1(u'{0}:{1}'.format(group, path).encode('utf-8')).hexdigest())
+
     @cached_property
-    def orcid(self):
-        """Get our ORCID string"""
+    def lookups(self):
+        """Get the ScienceData account, groups and home server of the user.
+
+        The lookups are cached for ``SCIENCEDATA_CACHE_TIMEOUT`` seconds. On
+        a miss, the groups and the home server are fetched concurrently.
+        Lookups which failed or found no ScienceData account are not cached.
+        """
+        lookups = current_cache.get(self.cache_key)
+        if lookups is None:
+            lookups, complete = self._fetch_lookups()
+            if complete:
+                current_cache.set(
+                    self.cache_key, lookups,
+                    timeout=current_app.config['SCIENCEDATA_CACHE_TIMEOUT'])
+        return lookups
+
+    def _fetch_lookups(self):
+        """Fetch the ScienceData lookups of the user.
+
+        :returns: The lookups, and whether the ScienceData account of the
+            user was found and all its lookups succeeded.
+        """
+        orcid = self._fetch_orcid()
+        sciencedata_user = self._fetch_user(orcid) if orcid else None
+        lookups = dict(
+            orcid=orcid,
+            user=sciencedata_user or '',
+            groups=[],
+            home_url=current_app.config['SCIENCEDATA_PRIVATE_URL'].rstrip('/')+'/',
+        )
+        if not sciencedata_user:
+            return lookups, False
+        app = current_app._get_current_object()
+
+        def fetch(func):
+            with app.app_context():
+                return func(sciencedata_user)
+
+        pool = ThreadPool(2)
+        try:
+            groups, home_url = pool.map(
+                fetch, (self._fetch_groups, self._fetch_home_url))
+        finally:
+            pool.close()
+            pool.join()
+        if groups is not None:
+            lookups['groups'] = groups
+        if home_url is not None:
+            lookups['home_url'] = home_url
+        return lookups, groups is not None and home_url is not None
+
+    def _fetch_orcid(self):
+        """Get ORCID string of the user, if present."""
         orcid_app_key = current_app.config['ORCID_APP_CREDENTIALS']['consumer_key']
         accounts = RemoteAccount.query.filter_by(user_id=self.user_id).all()
         for a in accounts:
             if a.client_id == orcid_app_key:
                 current_app.logger.warn('extra_data '+format(a.extra_data))
-                orcid = a.extra_data['orcid']
-                return orcid
-                """Return ORCID string of logged-in user, if present."""
+                return a.extra_data['orcid']
         return ""
 
-    @cached_property
-    def scienceDataUser(self):
+    def _fetch_user(self, orcid):
         """Get ID string of ScienceData account with ORCID enabled and matching 'orcid'"""
-        orcid = self.orcid
         headers = {'Accept': 'application/json'}
-        r = requests.get(current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/user_orcid/ws/get_user_from_orcid.php?orcid='+orcid, headers=headers, verify=False)
-        sciencedata_user = r.text.replace('"', '')
+        r = self.request('GET', current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/user_orcid/ws/get_user_from_orcid.php?orcid='+orcid, headers=headers)
+        if not r.ok:
+            current_app.logger.error(
+                'could not get the ScienceData user of {0}: {1}'.format(
+                    orcid, r.status_code))
+            return None
+        sciencedata_user = r.text.replace('"', '').strip()
         current_app.logger.warn('sciencedata_user: '+sciencedata_user)
         return sciencedata_user
 
-    @cached_property
-    def getGroups(self):
-        """Get groups the current user is member of"""
-        sciencedata_userid = self.scienceDataUser
-        if not sciencedata_userid:
-            return []
+    def _fetch_groups(self, sciencedata_userid):
+        """Get groups the ScienceData user is member of"""
         headers = {'Accept': 'application/json'}
-        r = requests.get(current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/user_group_admin/ws/getUserGroups.php?onlyOwned=no&userid='+sciencedata_userid, headers=headers, verify=False)
+        r = self.request('GET', current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/user_group_admin/ws/getUserGroups.php?onlyOwned=no&userid='+sciencedata_userid, headers=headers)
+        if not r.ok:
+            current_app.logger.error(
+                'could not get the groups of {0}: {1}'.format(
+                    sciencedata_userid, r.status_code))
+            return None
         try:
             groupsData = r.json()
         except ValueError as e:
-            groupsData = []
-        groups = [group['gid'] for group in groupsData]
-        return groups
+            return None
+        return [group['gid'] for group in groupsData]
 
-    @cached_property
-    def scienceDataPrivateHomeURL(self):
-        """Get the https://10.2.0.x/ URL of the home server of the current user"""
+    def _fetch_home_url(self, sciencedata_username):
+        """Get the https://10.2.0.x/ URL of the home server of the ScienceData user"""
         masterPrivateURL = current_app.config['SCIENCEDATA_PRIVATE_URL']
-        sciencedata_username = self.scienceDataUser
-        r = requests.request('GET', masterPrivateURL.rstrip('/')+'/files/', allow_redirects=False, verify=False, auth=(sciencedata_username, ''))
+        r = self.request('GET', masterPrivateURL.rstrip('/')+'/files/', allow_redirects=False, auth=(sciencedata_username, ''))
         current_app.logger.warn('status '+format(r.status_code))
         if r.status_code == 307:
             filesLocation = r.headers['location']
             url = re.sub(r"/+files/*", "/", filesLocation)
             return url
+        if not r.ok:
+            return None
         return masterPrivateURL.rstrip('/')+'/'
 
+    @property
+    def orcid(self):
+        """Get our ORCID string"""
+        return self.lookups['orcid']
+
+    @property
+    def scienceDataUser(self):
+        """Get ID string of ScienceData account with ORCID enabled and matching 'orcid'"""
+        return self.lookups['user']
+
+    @property
+    def getGroups(self):
+        """Get groups the current user is member of"""
+        return self.lookups['groups']
+
+    @property
+    def scienceDataPrivateHomeURL(self):
+        """Get the https://10.2.0.x/ URL of the home server of the current user"""
+        return self.lookups['home_url']
+
     def getScienceDataPublicURL(self, path, group):
         """Get public url of object - if object has been shared publicly"""
         sciencedata_userid = self.scienceDataUser
         if not sciencedata_userid:
             return ''
+        key = self.public_url_cache_key(path, group)
+        url = current_cache.get(key)
+        if url is not None:
+            return url
         try:
-            r = requests.get(current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/files_zenodo/get_public_url.php?path='+path+'&group='+group, verify=False, auth=(sciencedata_userid, ''))
+            r = self.request('GET', current_app.config.get('SCIENCEDATA_PRIVATE_URL')+'/apps/files_zenodo/get_public_url.php?path='+path+'&group='+group, auth=(sciencedata_userid, ''))
             url = r.json()
             current_app.logger.warn('sciencedata url: '+url)
         except ValueError as e:
-            url = ''
+            # Do not cache failed lookups
+            return ''
+        current_cache.set(
+            key, url, timeout=current_app.config['SCIENCEDATA_CACHE_TIMEOUT'])
         return url
 
 
@@ -121,8 +315,16 @@ class ScienceDataRelease(object):
 
     @cached_property
     def sd(self):
-        """Return ScienceDataAPI object."""
-        return ScienceDataAPI()
+        """Return ScienceDataAPI object of the owner of the object.
+
+        The API object of the current request is reused when the owner is
+        logged in, e.g. outside of Celery tasks.
+        """
+        user_id = self.sciencedata_object.user_id
+        if has_request_context() and current_user.is_authenticated and \
+                current_sciencedata_api.user_id == user_id:
+            return current_sciencedata_api._get_current_object()
+        return ScienceDataAPI(user_id=user_id)
 
     @cached_property
     def deposit_class(self):
@@ -178,7 +380,7 @@ class ScienceDataRelease(object):
             path = self.sciencedata_object.path
             sciencedata_username = self.sd.scienceDataUser
             home_server_url = self.sd.scienceDataPrivateHomeURL
-            r = requests.get(home_server_url+'metadata/getmetadata?files=%5B%22'+urllib.quote_plus(path)+'%22%5D&tag=Zenodo', headers=headers, allow_redirects=True, verify=False, auth=(sciencedata_username, ''))
+            r = self.sd.request('GET', home_server_url+'metadata/getmetadata?files=%5B%22'+urllib.quote_plus(path)+'%22%5D&tag=Zenodo', headers=headers, allow_redirects=True, auth=(sciencedata_username, ''))
             if r.status_code >= 400:
                 current_app.logger.error('could not get metadata from sciencedata')
             else:
@@ -209,7 +411,7 @@ class ScienceDataRelease(object):
 
     @cached_property
     def files(self):
-        """Get URL of file/archive to download from ScienceData."""
+        """Get URL and version of file/archive to download from ScienceData."""
         version = self.version
         name = os.path.basename(self.sciencedata_object.path)
         group = self.sciencedata_object.group
@@ -224,11 +426,11 @@ class ScienceDataRelease(object):
         else:
             filename = u'{name}'.format(name=name, version=version)
         sciencedata_username = self.sd.scienceDataUser
-        response = requests.head(download_url, allow_redirects=True, verify=False, auth=(sciencedata_username, ''))
+        response = self.sd.request('HEAD', download_url, allow_redirects=True, auth=(sciencedata_username, ''))
         assert response.status_code == 200, \
             u'Could not retrieve archive from ScienceData: {0}'.format(download_url)
 
-        yield filename, download_url
+        yield filename, download_url, remote_version(response.headers)
 
     @cached_property
     def record(self):
@@ -292,9 +494,138 @@ class ScienceDataRelease(object):
         #latest_version = latest_version + 1
         #return str(latest_version)
 
+    def ingest(self):
+        """Download the files of the release.
+
+        Files are downloaded concurrently, ``SCIENCEDATA_INGEST_WORKERS`` at
+        a time, and their checksum is verified against the one announced by
+        ScienceData while streaming. The progress is committed to
+        ``Release.files`` after each file, so that publishing a failed
+        release again only downloads its missing files and the files which
+        changed on ScienceData since they were downloaded. Superseded
+        downloads are removed.
+
+        :returns: Ingestion progress of the files, by file key.
+        """
+        sd = self.sd
+        sciencedata_username = sd.scienceDataUser
+        previous = dict(self.model.files or {})
+        progress = {}
+        pending = []
+        for key, url, remote in self.files:
+            entry = previous.pop(key, None) or {}
+            if entry.get('status') == 'done' and entry.get('url') == url \
+                    and remote is not None \
+                    and entry.get('remote') == remote \
+                    and FileInstance.query.get(entry['file_id']):
+                progress[key] = entry
+                continue
+            if entry.get('file_id'):
+                previous[key] = entry
+            progress[key] = dict(url=url, remote=remote, status='pending')
+            fileinstance = FileInstance(
+                id=uuid.uuid4(), writable=True, readable=False, size=0)
+            pending.append((key, url, remote, fileinstance))
+        self.model.status = ReleaseStatus.PROCESSING
+        self.model.files = dict(progress)
+        # Downloads of files which changed or disappeared since
+        remove_files(
+            entry['file_id'] for entry in previous.values()
+            if entry.get('file_id'))
+        if not pending:
+            return progress
+
+        app = current_app._get_current_object()
+        location = Location.get_default()
+        chunk_size = app.config['SCIENCEDATA_INGEST_CHUNK_SIZE']
+        size_limit = FileSizeLimit(
+            app.config['ZENODO_MAX_FILE_SIZE'], 'File size limit exceeded.')
+        storages = dict(
+            (key, fileinstance.storage(default_location=location.uri))
+            for key, url, remote, fileinstance in pending)
+
+        def download(item):
+            key, url, remote, fileinstance = item
+            start = default_timer()
+            with app.app_context():
+                try:
+                    with sd.request(
+                            'GET', url, allow_redirects=True, stream=True,
+                            auth=(sciencedata_username, '')) as r:
+                        r.raise_for_status()
+                        checksum = announced_checksum(r.headers)
+                        stream = ChecksumStream(
+                            r.raw, checksum[0] if checksum else 'md5')
+                        uri, size, md5 = storages[key].save(
+                            stream, size=int(r.headers.get('Content-Length', 0)) or None,
+                            size_limit=size_limit, chunk_size=chunk_size)
+                        if checksum and stream.hexdigest() != checksum[1]:
+                            raise ChecksumMismatchError(
+                                key, expected=checksum[1], actual=stream.hexdigest())
+                    return item, dict(
+                        uri=uri, size=size, checksum=md5,
+                        mimetype=r.headers.get('Content-Type'),
+                        duration=default_timer() - start), None
+                except Exception as e:
+                    # Do not leave partial or corrupt downloads behind
+                    try:
+                        storages[key].delete()
+                    except Exception:
+                        pass  # Nothing was written
+                    return item, None, e
+
+        start = default_timer()
+        total, error = 0, None
+        pool = ThreadPool(min(app.config['SCIENCEDATA_INGEST_WORKERS'], len(pending)))
+        try:
+            for (key, url, remote, fileinstance), result, e in pool.imap_unordered(
+                    download, pending):
+                if e is not None:
+                    current_app.logger.error(
+                        'could not download {0}: {1}'.format(url, e))
+                    progress[key] = dict(
+                        url=url, remote=remote, status='failed', error=str(e))
+                    error = error or e
+                else:
+                    db.session.add(fileinstance)
+                    fileinstance.set_uri(
+                        result['uri'], result['size'], result['checksum'])
+                    progress[key] = dict(
+                        url=url, remote=remote, status='done',
+                        file_id=str(fileinstance.id),
+                        size=result['size'], checksum=result['checksum'],
+                        mimetype=result['mimetype'],
+                        duration=round(result['duration'], 3))
+                    total += result['size']
+                    _ingest_duration.observe(result['duration'])
+                    _ingest_bytes.inc(result['size'])
+                    current_app.logger.info(
+                        'downloaded {0} ({1} bytes) in {2:.1f}s'.format(
+                            key, result['size'], result['duration']))
+                self.model.files = dict(progress)
+                db.session.commit()
+        finally:
+            pool.close()
+            pool.join()
+        duration = default_timer() - start
+        current_app.logger.info(
+            'ingested {0} bytes of release {1} in {2:.1f}s ({3:.1f} MB/s)'.format(
+                total, self.model.id, duration,
+                total / 1e6 / duration if duration else 0))
+        if error is not None:
+            raise error
+        return progress
+
     def publish(self):
         """Publish ScienceData object as record."""
         id_ = uuid.uuid4()
+        try:
+            files = self.ingest()
+        except Exception as e:
+            self.model.status = ReleaseStatus.FAILED
+            self.model.errors = {'errors': str(e)}
+            db.session.commit()
+            raise
         deposit_metadata = dict(self.metadata)
         deposit = None
         try:
@@ -332,21 +663,9 @@ class ScienceDataRelease(object):
             deposit['_deposit']['created_by'] = self.sd.user_id
             deposit['_deposit']['owners'] = [self.sd.user_id]
 
-            # Fetch the deposit files
+            # Attach the downloaded files
             sciencedata_username = self.sd.scienceDataUser
-            for key, url in self.files:
-                with requests.get(url, allow_redirects=True, stream=True, verify=False, auth=(sciencedata_username, '')) as r:
-                    #deposit.files[key] = r.raw
-                    current_app.logger.warn('got file '+format(key)+':'+url+':'+str(r.status_code)+':'+format(r.headers))
-
-                    size = int(r.headers.get('Content-Length', 0))
-                    ObjectVersion.create(
-                        bucket=deposit.files.bucket,
-                        key=key,
-                        stream=r.raw,
-                        size=size or None,
-                        mimetype=r.headers.get('Content-Type'),
-                    )
+            attach_files(deposit.files.bucket, files)
 
             # ScienceData-specific SIP store agent
             sip_agent = {
@@ -376,8 +695,12 @@ class ScienceDataRelease(object):
 
             # Index the record
             RecordIndexer().index_by_id(record_id)
-        except Exception:
+        except Exception as e:
             db.session.rollback()
+            # Keep the downloaded files for the next attempt
+            self.model.status = ReleaseStatus.FAILED
+            self.model.errors = {'errors': str(e)}
+            db.session.commit()
             # Remove deposit from index since it was not commited.
             if deposit and deposit.id:
                 try:
@@ -18,9 +18,42 @@ SCIENCEDATA_TEMPLATE_INDEX = 'sciencedata/settings/index.html'
 SCIENCEDATA_TEMPLATE_VIEW = 'sciencedata/settings/view.html'
 """ScienceData object detail view template."""
 
+SCIENCEDATA_OBJECTS_PER_PAGE = 50
+"""Number of preserved objects listed per page."""
+
 SCIENCEDATA_PRIVATE_URL = 'https://10.2.0.13/'
 """ScienceData object detail view template."""
 
+SCIENCEDATA_CACHE_TIMEOUT = 300
+"""Time in seconds to cache the ScienceData account, groups, home server
+and public URLs of a user."""
+
+SCIENCEDATA_HTTP_TIMEOUT = (5, 60)
+"""Connect and read timeouts, in seconds, of requests to ScienceData."""
+
+SCIENCEDATA_HTTP_POOL_CONNECTIONS = 10
+"""Number of ScienceData hosts to keep connection pools for."""
+
+SCIENCEDATA_HTTP_POOL_SIZE = 10
+"""Maximum number of kept-alive connections per ScienceData host."""
+
+SCIENCEDATA_PROXY_CHUNK_SIZE = 64 * 1024
+"""Size in bytes of the chunks streamed by the ScienceData proxy."""
+
+SCIENCEDATA_INGEST_WORKERS = 4
+"""Number of files of a release downloaded concurrently."""
+
+SCIENCEDATA_INGEST_CHUNK_SIZE = 1024 * 1024
+"""Size in bytes of the chunks written when downloading release files."""
+
+SCIENCEDATA_RELEASE_PROCESSING_TIMEOUT = 6 * 3600
+"""Time in seconds after which a release still received or processing is
+considered abandoned, e.g. by a killed worker, and can be resumed."""
+
+SCIENCEDATA_FAILED_RELEASE_RETENTION = 7 * 24 * 3600
+"""Time in seconds to keep the downloaded files of failed or abandoned
+releases which are not retried."""
+
 SCIENCEDATA_RECORD_SERIALIZER = 'zenodo.modules.records.serializers.githubjson_v1'
 """Record serializer to use for serialize record metadata. The GitHub module allows a .json file containing plain json."""
 
@@ -61,3 +61,17 @@ class ScienceDataObjectDisabledError(ScienceDataError):
         super(ScienceDataObjectDisabledError, self).__init__(message or self.message)
 
 
+
+
+class ChecksumMismatchError(ScienceDataError):
+    """Checksum of a downloaded file does not match ScienceData's."""
+
+    message = u'Checksum mismatch of {key}: expected {expected}, got {actual}'
+
+    def __init__(self, key=None, expected=None, actual=None):
+        """Constructor."""
+        super(ChecksumMismatchError, self).__init__(self.message.format(
+            key=key, expected=expected, actual=actual))
+        self.key = key
+        self.expected = expected
+        self.actual = actual
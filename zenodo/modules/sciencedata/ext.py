@@ -5,8 +5,11 @@
 
 from __future__ import absolute_import, print_function
 
+import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
 from six import string_types
+from six.moves.http_cookiejar import DefaultCookiePolicy
 from sqlalchemy import event
 from werkzeug.utils import cached_property, import_string
 
@@ -29,6 +32,26 @@ class ScienceData(object):
             return import_string(imp)
         return imp
 
+    @cached_property
+    def http(self):
+        """Pooled HTTP session shared by all ScienceData requests.
+
+        Connections to the ScienceData servers are kept alive and reused
+        across requests of the same process. Since the session is shared by
+        all users, cookies set by the servers are never stored or sent.
+        """
+        session = requests.Session()
+        session.verify = False
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=current_app.config[
+                'SCIENCEDATA_HTTP_POOL_CONNECTIONS'],
+            pool_maxsize=current_app.config['SCIENCEDATA_HTTP_POOL_SIZE'],
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
     def init_app(self, app):
         """Flask application initialization."""
         self.init_config(app)
@@ -6,6 +6,7 @@
 from __future__ import absolute_import
 
 import uuid
+from datetime import datetime, timedelta
 from enum import Enum
 
 from flask import current_app
@@ -99,6 +100,13 @@ class ScienceDataObject(db.Model, Timestamp):
 
     __tablename__ = 'sciencedata_objects'
 
+    __table_args__ = (
+        db.Index(
+            'ix_sciencedata_objects_user_id_created',
+            'user_id', 'created', 'id',
+        ),
+    )
+
     id = db.Column(
         UUIDType,
         primary_key=True,
@@ -173,6 +181,32 @@ class ScienceDataObject(db.Model, Timestamp):
             raise AccessError(user=user_id, path=path)
         return sciencedata_object
 
+    @classmethod
+    def get_user_objects(cls, user_id, after=None, limit=None):
+        """Return a page of the objects of a user, newest first.
+
+        The page is selected with a keyset on ``(created, id)``, so that
+        deep pages cost the same as the first one.
+
+        :param integer user_id: User identifier.
+        :param after: Identifier of the last object of the previous page.
+        :param integer limit: Maximum number of objects to return.
+        :returns: List of ScienceData objects.
+        :raises: :py:exc:`~sqlalchemy.orm.exc.NoResultFound`: if ``after``
+                 is not an object of the user.
+        """
+        q = cls.query.filter(cls.user_id == user_id)
+        if after is not None:
+            cursor = q.filter(cls.id == after).one()
+            q = q.filter(db.or_(
+                cls.created < cursor.created,
+                db.and_(cls.created == cursor.created, cls.id < cursor.id),
+            ))
+        q = q.order_by(db.desc(cls.created), db.desc(cls.id))
+        if limit is not None:
+            q = q.limit(limit)
+        return q.all()
+
     def latest_release(self, status=None):
         """Chronologically latest published release of the object (path)."""
         # Bail out fast if object not in DB session.
@@ -191,6 +225,13 @@ class Release(db.Model, Timestamp):
 
     __tablename__ = 'sciencedata_releases'
 
+    __table_args__ = (
+        db.Index(
+            'ix_sciencedata_releases_object_id_created',
+            'sciencedata_object_id', 'created',
+        ),
+    )
+
     id = db.Column(
         UUIDType,
         primary_key=True,
@@ -210,6 +251,15 @@ class Release(db.Model, Timestamp):
     )
     """Release processing errors."""
 
+    files = db.Column(
+        JSONType().with_variant(
+            postgresql.JSON(none_as_null=True),
+            'postgresql',
+        ),
+        nullable=True,
+    )
+    """Ingestion progress of the release files, by file key."""
+
     sciencedata_object_id = db.Column(UUIDType, db.ForeignKey(ScienceDataObject.id))
     """ScienceDataObject identifier."""
 
@@ -264,6 +314,53 @@ class Release(db.Model, Timestamp):
         release_object = cls.query.filter(Release.id == object_id).one()
         return release_object
 
+    @classmethod
+    def get_latest(cls, object_ids, status=None):
+        """Return the latest release of each of the given objects.
+
+        All releases are fetched in a single query, ranking the releases of
+        each object with a ``row_number()`` window.
+
+        :param object_ids: ScienceData object identifiers.
+        :param status: Only consider releases with this status.
+        :returns: Dictionary mapping object identifiers to their latest
+                  release. Objects without releases are left out.
+        """
+        if not object_ids:
+            return {}
+        rank = db.func.row_number().over(
+            partition_by=cls.sciencedata_object_id,
+            order_by=(db.desc(cls.created), db.desc(cls.id)),
+        ).label('rank')
+        ranked = db.session.query(cls.id.label('id'), rank).filter(
+            cls.sciencedata_object_id.in_(object_ids))
+        if status is not None:
+            ranked = ranked.filter(cls.status == status)
+        ranked = ranked.subquery()
+        releases = cls.query.join(ranked, cls.id == ranked.c.id).filter(
+            ranked.c.rank == 1)
+        return {r.sciencedata_object_id: r for r in releases}
+
+    @property
+    def in_progress(self):
+        """Whether the release is being received or processed."""
+        return self.status in (ReleaseStatus.RECEIVED,
+                               ReleaseStatus.PROCESSING)
+
+    @property
+    def resumable(self):
+        """Whether publishing the release can be resumed.
+
+        Failed releases can be resumed, as well as releases left received or
+        processing for ``SCIENCEDATA_RELEASE_PROCESSING_TIMEOUT`` seconds,
+        e.g. by a worker killed while downloading their files.
+        """
+        if self.status == ReleaseStatus.FAILED:
+            return True
+        timeout = current_app.config['SCIENCEDATA_RELEASE_PROCESSING_TIMEOUT']
+        return self.in_progress and \
+            self.updated < datetime.utcnow() - timedelta(seconds=timeout)
+
     @property
     def record(self):
         """Get Record object."""
@@ -5,8 +5,23 @@
 
 from __future__ import absolute_import, print_function
 
-from flask import current_app
+from flask import current_app, g
+from flask_login import current_user
 from werkzeug.local import LocalProxy
 
+
+def _get_current_api():
+    """Return the ScienceData API of the current user, once per request."""
+    from .api import ScienceDataAPI
+    user_id = int(current_user.get_id())
+    api = g.get('sciencedata_api')
+    if api is None or api.user_id != user_id:
+        api = g.sciencedata_api = ScienceDataAPI(user_id=user_id)
+    return api
+
+
 current_sciencedata = LocalProxy(
     lambda: current_app.extensions['sciencedata'])
+
+current_sciencedata_api = LocalProxy(_get_current_api)
+"""ScienceData API of the current user, shared within a request."""
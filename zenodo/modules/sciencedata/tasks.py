@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+
+"""Celery tasks for ScienceData."""
+
+from __future__ import absolute_import
+
+from datetime import datetime, timedelta
+
+from celery import shared_task
+from flask import current_app
+from invenio_db import db
+
+from .api import ScienceDataRelease, remove_release_files
+from .models import Release, ReleaseStatus
+
+
+@shared_task(ignore_result=True)
+def publish_release(release_id):
+    """Download the files of a release and publish it.
+
+    :param release_id: Release identifier.
+    """
+    release = Release.query.get(release_id)
+    if release is None:
+        return
+    ScienceDataRelease(release.sciencedata_object, release).publish()
+
+
+@shared_task(ignore_result=True)
+def cleanup_failed_releases():
+    """Remove the downloaded files of failed releases which were abandoned.
+
+    Failed releases keep their downloaded files so that they can be resumed.
+    Those not retried for ``SCIENCEDATA_FAILED_RELEASE_RETENTION`` seconds
+    are downloaded again from scratch if resumed later. Releases left
+    received or processing for as long, e.g. by a killed worker, are marked
+    as failed.
+    """
+    retention = current_app.config['SCIENCEDATA_FAILED_RELEASE_RETENTION']
+    releases = Release.query.filter(
+        Release.status.in_([ReleaseStatus.FAILED, ReleaseStatus.RECEIVED,
+                            ReleaseStatus.PROCESSING]),
+        Release.updated < datetime.utcnow() - timedelta(seconds=retention),
+    )
+    for release in releases.all():
+        if release.in_progress:
+            release.status = ReleaseStatus.FAILED
+            release.errors = {'errors': 'Abandoned while processing.'}
+            db.session.commit()
+        if release.files:
+            remove_release_files(release)
@@ -3,7 +3,11 @@
 
 """Various utility functions."""
 
+import base64
+import binascii
+import hashlib
 import json
+import re
 import yaml
 
 from datetime import datetime
@@ -55,3 +59,98 @@ def obj_or_import_string(value, default=None):
     elif value:
         return value
     return default
+
+
+LINK_ATTRIBUTES = re.compile(b'(href|src)="')
+"""Link attributes rewritten by the ScienceData proxy."""
+
+LINK_ATTRIBUTES_MAX_LENGTH = len(b'href="')
+
+
+def rewrite_links(chunks, prefix):
+    """Prefix the links of a streamed HTML document.
+
+    ``href="`` and ``src="`` attributes are rewritten chunk by chunk. The
+    end of each chunk that could be the beginning of an attribute is held
+    back until the next chunk arrives, so that attributes split between two
+    chunks are rewritten as well.
+
+    :param chunks: Iterable of byte strings.
+    :param prefix: Byte string inserted at the beginning of each link.
+    :returns: Generator of rewritten byte strings.
+    """
+    replacement = b'\\1="' + prefix.replace(b'\\', b'\\\\')
+    tail = b''
+    for chunk in chunks:
+        data = tail + chunk
+        cut = len(data) - (LINK_ATTRIBUTES_MAX_LENGTH - 1)
+        # Do not cut the data in the middle of an attribute
+        for match in LINK_ATTRIBUTES.finditer(data):
+            if match.start() < cut < match.end():
+                cut = match.end()
+        if cut <= 0:
+            tail = data
+            continue
+        tail = data[cut:]
+        yield LINK_ATTRIBUTES.sub(replacement, data[:cut])
+    if tail:
+        yield LINK_ATTRIBUTES.sub(replacement, tail)
+
+
+def announced_checksum(headers):
+    """Get the checksum announced by ScienceData for a download.
+
+    ScienceData sends ``OC-Checksum`` headers (e.g. ``SHA1:<hex digest>``);
+    ``Content-MD5`` is used as a fallback.
+
+    :param headers: Response headers.
+    :returns: Tuple of the hash algorithm and the hex digest, or ``None``.
+    """
+    for algo, digest in re.findall(
+            r'(\w+):([0-9a-fA-F]+)', headers.get('OC-Checksum', '')):
+        try:
+            hashlib.new(algo.lower())
+        except ValueError:
+            continue
+        return algo.lower(), digest.lower()
+    content_md5 = headers.get('Content-MD5')
+    if content_md5:
+        try:
+            digest = base64.b64decode(content_md5)
+        except (TypeError, binascii.Error):
+            return None
+        return 'md5', binascii.hexlify(digest).decode('ascii')
+    return None
+
+
+def remote_version(headers):
+    """Get an identifier of the content of a ScienceData download.
+
+    :param headers: Response headers.
+    :returns: The announced checksum (e.g. ``sha1:<hex digest>``), falling
+        back to the ``ETag``, or ``None`` if the content cannot be told
+        apart from another one.
+    """
+    checksum = announced_checksum(headers)
+    if checksum:
+        return u'{0}:{1}'.format(*checksum)
+    return headers.get('ETag') or None
+
+
+class ChecksumStream(object):
+    """File-like wrapper hashing a stream as it is read."""
+
+    def __init__(self, stream, algo='md5'):
+        """Initialize the wrapper."""
+        self.stream = stream
+        self.hash = hashlib.new(algo)
+
+    def read(self, size=None):
+        """Read a chunk of the stream."""
+        chunk = self.stream.read(size)
+        self.hash.update(chunk)
+        return chunk
+
+    def hexdigest(self):
+        """Hex digest of the data read so far."""
+        return self.hash.hexdigest()
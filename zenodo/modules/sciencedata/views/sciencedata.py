@@ -7,6 +7,7 @@ from __future__ import absolute_import
 
 import os
 import json
+import uuid
 from datetime import datetime
 
 import humanize
@@ -22,17 +23,13 @@ from flask import jsonify
 from invenio_db import db
 from sqlalchemy.orm.exc import NoResultFound
 import urllib
-try:
-    from urllib.parse import urlparse
-except ImportError:
-    from urlparse import urlparse
 
-import requests
-
-from ..api import ScienceDataAPI, ScienceDataRelease
-from ..models import Release, ScienceDataObject
+from ..api import ScienceDataRelease, remove_release_files
+from ..models import Release, ReleaseStatus, ScienceDataObject
 from ..errors import AccessError, NoORCIDError, MultipleORCIDAccountsError, NoORCIDAccountError
-from ..proxies import current_sciencedata
+from ..proxies import current_sciencedata, current_sciencedata_api
+from ..tasks import publish_release
+from ..utils import rewrite_links
 
 
 blueprint = Blueprint(
@@ -43,20 +40,59 @@ blueprint = Blueprint(
     url_prefix='/account/settings/sciencedata',
 )
 
-def getPreservedObjects():
-    """Get list (dictionary) of already preserved paths on ScienceData."""
-        # Generate the ScienceData preserved objects view object
-    sd_objects = {}
-    db_sciencedata_objects = ScienceDataObject.query.filter_by().all()
-    for sd_object in db_sciencedata_objects:
-        current_app.logger.warn('getting '+format(sd_object))
-        sd_objects[str(sd_object.id)] = {'instance': sd_object,
-                                         'latest': ScienceDataRelease(sd_object, sd_object.latest_release())}
-    return sd_objects.items()
+def getPreservedObjects(after=None, limit=None):
+    """Get a page of the objects preserved by the current user.
+
+    :param after: Identifier of the last object of the previous page.
+    :param limit: Page size, defaults to ``SCIENCEDATA_OBJECTS_PER_PAGE``.
+    :returns: Tuple of the list of ``(id, object info)`` pairs and the
+              identifier to pass as ``after`` for the next page (``None``
+              on the last page).
+    """
+    limit = limit or current_app.config['SCIENCEDATA_OBJECTS_PER_PAGE']
+    # Fetch one extra object to know if there is a next page.
+    db_sciencedata_objects = ScienceDataObject.get_user_objects(
+        current_user.id, after=after, limit=limit + 1)
+    next_after = None
+    if len(db_sciencedata_objects) > limit:
+        db_sciencedata_objects = db_sciencedata_objects[:limit]
+        next_after = str(db_sciencedata_objects[-1].id)
+    latest = Release.get_latest([o.id for o in db_sciencedata_objects])
+    sd_objects = [
+        (str(sd_object.id), getPreservedObjectInfo(
+            sd_object, latest.get(sd_object.id)))
+        for sd_object in db_sciencedata_objects
+    ]
+    return sd_objects, next_after
+
+
+def getPreservedObjectInfo(sd_object, latest_release=None):
+    """Get the view object of a preserved object."""
+    return {'instance': sd_object,
+            'latest': ScienceDataRelease(sd_object, latest_release)}
+
+
+def getObjectId(value):
+    """Parse a ScienceData object identifier or abort with 404."""
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        abort(404)
+
+
+def getPreservedObject(**filters):
+    """Get a preserved object of the current user or abort with 404."""
+    if 'id' in filters:
+        filters['id'] = getObjectId(filters['id'])
+    sd_object = ScienceDataObject.query.filter_by(
+        user_id=current_user.id, **filters).first()
+    if sd_object is None:
+        abort(404)
+    return getPreservedObjectInfo(sd_object, sd_object.latest_release())
 
 def getScienceDataUser():
     """Get list ScienceData user with an attached ORCID matching the ORCID of the logged-in user, if a such exists."""
-    sciencedata = ScienceDataAPI(user_id=current_user.id)
+    sciencedata = current_sciencedata_api
     orcid = sciencedata.orcid
     if orcid == "":
         raise NoORCIDError()
@@ -69,8 +105,7 @@ def getScienceDataUser():
 
 def getScienceDataGroups():
     """Get list of ScienceData groups."""
-    sciencedata = ScienceDataAPI(user_id=current_user.id)
-    sciencedata_groups = sciencedata.getGroups
+    sciencedata_groups = current_sciencedata_api.getGroups
     return sciencedata_groups
 
 #
@@ -148,10 +183,15 @@ def index():
     except NoORCIDError as e:
         message = "You need to attach an ORCID to access ScienceData. " + e.message
     # Generate the ScienceData preserved objects view object
-    sd_objects = getPreservedObjects()
+    after = request.args.get('after')
+    try:
+        sd_objects, next_after = getPreservedObjects(
+            after=getObjectId(after) if after else None)
+    except NoResultFound:
+        abort(404)
     sd_groups = getScienceDataGroups()
 
-    return render_template(current_app.config['SCIENCEDATA_TEMPLATE_INDEX'], sciencedata_user=sciencedata_user, sd_objects=sd_objects, sd_groups=sd_groups, message=message)
+    return render_template(current_app.config['SCIENCEDATA_TEMPLATE_INDEX'], sciencedata_user=sciencedata_user, sd_objects=sd_objects, sd_groups=sd_groups, message=message, next_after=next_after)
 
 @blueprint.route('/sciencedataobject/<path:path>', methods=["GET", 'POST'])
 @login_required
@@ -161,13 +201,7 @@ def sciencedataobject(path):
     """Display selected preserved object."""
     group = request.args['group']
     user_id = current_user.id
-    sd_objects = getPreservedObjects()
-    sd_object = next((sd_object for sd_object_id, sd_object in sd_objects
-                  if sd_object['instance'].user_id == user_id and sd_object['instance'].path == '/'+path.lstrip('/') and sd_object['instance'].group == group), {})
-    if not sd_object:
-        sdo = next(sd_object for sd_object_id, sd_object in sd_objects)
-        current_app.logger.warn('not found '+format(sdo['instance'].user_id)+':'+path+':'+format(sdo['instance'].path)+':'+group+':'+format(sdo['instance'].group))
-        abort(404)
+    sd_object = getPreservedObject(path='/'+path.lstrip('/'), group=group)
     sd_object_instance = sd_object['instance']
     current_app.logger.warn('found '+format(sd_object_instance.user_id)+':'+path+':'+format(sd_object_instance.path)+':'+group+':'+format(sd_object_instance.group))
     releases = [
@@ -194,13 +228,7 @@ def sciencedataobject(path):
 def sciencedataobject_by_id(sciencedata_object_id):
     """Display selected preserved object."""
     user_id = current_user.id
-    sd_objects = getPreservedObjects()
-    sd_object = next((sd_object for sd_object_id, sd_object in sd_objects
-                  if sd_object['instance'].user_id == user_id and sd_object_id == sciencedata_object_id), {})
-    if not sd_object:
-        sdo = next(sd_object for sd_object_id, sd_object in sd_objects)
-        current_app.logger.warn('not found '+':'+format(sdo['instance'].id)+':'+sciencedata_object_id+':')
-        abort(404)
+    sd_object = getPreservedObject(id=sciencedata_object_id)
     sd_object_instance = sd_object['instance']
     releases = [
         ScienceDataRelease(sd_object['instance'], r) for r in (
@@ -245,38 +273,34 @@ def create_version():
     path = request.args['path']
     group = request.args['group']
     user_id = current_user.id
-    sd_objects = getPreservedObjects()
-    sdo = next((sd_object for sd_object_id, sd_object in sd_objects
-                  if sd_object['instance'].user_id == user_id and sd_object['instance'].path == path and sd_object['instance'].group == group), {})
-    if not sdo:
-        sdo = next(sd_object for sd_object_id, sd_object in sd_objects)
-        current_app.logger.warn('not found '+':'+format(sdo['instance'].path)+':'+format(path)+':'+format(sdo['instance'].group)+':'+format(group)+':'+format(sdo['instance'].user_id)+':'+format(user_id))
-        abort(404)
-    new_version = 1
-    if sdo['latest'] is not None:
-        latest_version = int(sdo['latest'].version)
-        if latest_version:
-            new_version = latest_version+1
-    current_app.logger.warn('creating '+request.method+' '+format(user_id)+':'+format(path)+':'+format(group)+':'+format(new_version))
-    sd_release = Release.create(sdo['instance'], str(new_version))
-    sciencedata_release = ScienceDataRelease(sdo['instance'], sd_release)
-    sciencedata_release.publish()
+    sdo = getPreservedObject(path=path, group=group)
+    latest_release = sdo['latest'].model
+    if latest_release is not None and latest_release.resumable:
+        # Resume the failed or abandoned release, reusing its downloaded files
+        current_app.logger.warn('resuming '+request.method+' '+format(user_id)+':'+format(path)+':'+format(group)+':'+format(latest_release.version))
+        sd_release = latest_release
+        sd_release.status = ReleaseStatus.RECEIVED
+    elif latest_release is not None and latest_release.in_progress:
+        return jsonify({"status": "processing"}), 202
+    else:
+        new_version = 1
+        if sdo['latest'] is not None:
+            latest_version = int(sdo['latest'].version)
+            if latest_version:
+                new_version = latest_version+1
+        current_app.logger.warn('creating '+request.method+' '+format(user_id)+':'+format(path)+':'+format(group)+':'+format(new_version))
+        sd_release = Release.create(sdo['instance'], str(new_version))
     db.session.commit()
-    return jsonify({"status": "success"})
+    # Downloading the files may outlast the request
+    publish_release.delay(str(sd_release.id))
+    return jsonify({"status": "processing"}), 202
 
 @blueprint.route('/remove_object', methods=["GET", "POST"])
 @login_required
 def remove_object():
     """"Remove entry for path in DB."""
     sciencedata_object_id = request.args['sciencedata_object_id']
-    user_id = current_user.id
-    sd_objects = getPreservedObjects()
-    sd_object = next((sd_object for sd_object_id, sd_object in sd_objects
-                  if sd_object['instance'].user_id == user_id and sd_object_id == sciencedata_object_id), {})
-    if not sd_object:
-        sdo = next(sd_object for sd_object_id, sd_object in sd_objects)
-        current_app.logger.warn('not found '+':'+format(sdo['instance'].id)+':'+sciencedata_object_id+':')
-        abort(404)
+    sd_object = getPreservedObject(id=sciencedata_object_id)
     releases = [
         r for r in (
             sd_object['instance'].releases.order_by(db.desc(Release.created)).all()
@@ -284,39 +308,43 @@ def remove_object():
         )
     ]
     for r in releases:
+        remove_release_files(r)
         Release.delete(r)
     ScienceDataObject.delete(sd_object['instance'])
     db.session.commit()
     return ""
 
-sciencedata_username = ""
-
 @blueprint.route('/sciencedata_proxy/<path:path>', methods=["GET", "POST"])
 @blueprint.route('/sciencedata_proxy/', methods=["GET", "POST"])
 @blueprint.route('/sciencedata_proxy', methods=["GET", "POST"])
 @login_required
 def sciencedata_proxy(path="/"):
-    """Fetches the specified ScienceData path and serves it to the client."""
-    global sciencedata_username
+    """Fetches the specified ScienceData path and serves it to the client.
+
+    The upstream response is streamed to the client, rewriting the links of
+    HTML documents on the fly.
+    """
     current_app.logger.warn('fetching '+request.method+' '+format(path))
-    if not sciencedata_username:
-        sciencedata_username = getScienceDataUser()
-    sciencedata_private_ip = urlparse(current_app.config['SCIENCEDATA_PRIVATE_URL']).hostname
-    headers = dict(request.headers)
-    headers['Host'] = str(sciencedata_private_ip)
-    r = requests.request(request.method, current_app.config['SCIENCEDATA_PRIVATE_URL']+path, params=request.args, stream=True, headers=headers, allow_redirects=False, verify=False, auth=(sciencedata_username, ''))
+    # Make sure the user has a ScienceData account
+    getScienceDataUser()
+    r = current_sciencedata_api.proxy(request.method, path, params=request.args,
+                          headers=dict(request.headers))
     current_app.logger.warn('status '+format(r.status_code))
-    if r.status_code == 307:
-        redirect_url = r.headers['location']
-        current_app.logger.warn('now trying '+format(redirect_url))
-        sciencedata_private_ip = urlparse(redirect_url).hostname
-        headers['Host'] = str(sciencedata_private_ip)
-        r = requests.request(request.method, redirect_url, params=request.args, stream=True, headers=headers, allow_redirects=False, verify=False, auth=(sciencedata_username, ''))
-    #headers = dict(r.raw.headers)
-    ret_content = r.content.replace('href="', 'href="/account/settings/sciencedata/sciencedata_proxy').replace('src="', 'src="/account/settings/sciencedata/sciencedata_proxy')
-    current_app.logger.debug('got '+format(ret_content))
-    out = Response(ret_content)
-    return out
+    chunks = r.iter_content(
+        chunk_size=current_app.config['SCIENCEDATA_PROXY_CHUNK_SIZE'])
+    content_type = r.headers.get('Content-Type', 'text/html')
+    if content_type.startswith('text/html'):
+        chunks = rewrite_links(
+            chunks, url_for('sciencedata.sciencedata_proxy').rstrip('/').encode('utf-8'))
+
+    def generate():
+        try:
+            for chunk in chunks:
+                yield chunk
+        finally:
+            r.close()
+
+    return Response(generate(), content_type=content_type)
 
 
 #
@@ -31,3 +31,9 @@ ZENODO_SITEMAP_URL_SCHEME = 'https'
 
 #: Max URLs per sitemap page
 ZENODO_SITEMAP_MAX_URL_COUNT = 10000
+
+#: Store the sitemap pages gzip-compressed
+ZENODO_SITEMAP_GZIP = False
+
+#: Render the changed records pages of the sitemap in separate tasks
+ZENODO_SITEMAP_PARALLEL = False
@@ -26,6 +26,9 @@
 
 from __future__ import absolute_import, print_function
 
+import zlib
+
+from flask import current_app, render_template
 from invenio_cache import current_cache
 
 from . import config
@@ -65,6 +68,53 @@ class ZenodoSitemap(object):
             current_cache.delete(key)
         self.cache_keys = set()
 
+    @staticmethod
+    def page_key(section, page):
+        """Get the cache key of a page of a sitemap section."""
+        return 'sitemap:{0}:{1}'.format(section, page)
+
+    def set_page(self, section, page, urls):
+        """Render and store a page of a sitemap section.
+
+        The page replaces the previous version in a single cache write.
+        """
+        data = render_template('zenodo_sitemap/sitemap.xml', urlset=urls)
+        if current_app.config['ZENODO_SITEMAP_GZIP']:
+            compressor = zlib.compressobj(9, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            data = compressor.compress(data.encode('utf8')) + \
+                compressor.flush()
+        current_cache.set(self.page_key(section, page), data, timeout=-1)
+
+    def get_page(self, section, page, compressed=False):
+        """Get a page of a sitemap section.
+
+        :param compressed: Return the page gzip-compressed. Only available
+            if the pages are stored compressed.
+        """
+        data = current_cache.get(self.page_key(section, page))
+        if data and current_app.config['ZENODO_SITEMAP_GZIP']:
+            if not compressed:
+                data = zlib.decompress(
+                    data, 16 + zlib.MAX_WBITS).decode('utf8')
+        elif compressed:
+            return None
+        return data
+
+    def delete_page(self, section, page):
+        """Delete a page of a sitemap section."""
+        current_cache.delete(self.page_key(section, page))
+
+    @staticmethod
+    def get_state():
+        """Get the state of the pages from the last sitemap update."""
+        return current_cache.get('sitemap:state') or {}
+
+    @staticmethod
+    def set_state(state):
+        """Store the state of the pages of the sitemap."""
+        current_cache.set('sitemap:state', state, timeout=-1)
+
     @staticmethod
     def init_config(app):
         """Initialize configuration."""
@@ -32,6 +32,7 @@ from invenio_communities.models import Community
 from invenio_db import db
 from invenio_pidstore.models import PersistentIdentifier, PIDStatus
 from invenio_records.models import RecordMetadata
+from sqlalchemy import BigInteger, case, cast, func
 
 
 def _sitemapdtformat(dt):
@@ -45,21 +46,89 @@ def _sitemapdtformat(dt):
     return adt.format('YYYY-MM-DDTHH:mm:ss') + 'Z'
 
 
-def records_generator():
-    """Generate the records links."""
-    q = (db.session.query(PersistentIdentifier, RecordMetadata)
-         .join(RecordMetadata,
-               RecordMetadata.id == PersistentIdentifier.object_uuid)
-         .filter(PersistentIdentifier.status == PIDStatus.REGISTERED,
-                 PersistentIdentifier.pid_type == 'recid'))
+def _registered_records_query(*columns):
+    """Query columns of the registered records."""
+    return (db.session.query(*columns)
+            .join(RecordMetadata,
+                  RecordMetadata.id == PersistentIdentifier.object_uuid)
+            .filter(PersistentIdentifier.status == PIDStatus.REGISTERED,
+                    PersistentIdentifier.pid_type == 'recid'))
+
+
+def _recid_column():
+    """Get the recid of PIDs as an integer.
+
+    The cast is guarded by the PID type, since the database may evaluate it
+    on rows of other PID types (with non-numeric values) before filtering.
+    """
+    return case([(PersistentIdentifier.pid_type == 'recid',
+                  cast(PersistentIdentifier.pid_value, BigInteger))])
+
+
+def records_pages(page_size):
+    """Get the size and last modification of each records page.
+
+    Records pages cover fixed ranges of ``page_size`` recids, so that a
+    record always belongs to the same page.
+
+    :returns: Dictionary of page numbers to the number of records in the page
+        and the last modification time of its records.
+    """
+    page = (_recid_column() / page_size).label('page')
+    q = (_registered_records_query(
+            page,
+            func.count(PersistentIdentifier.id),
+            func.max(RecordMetadata.updated))
+         .group_by(page))
+    return dict((page, (count, updated)) for page, count, updated in q)
+
+
+def records_generator(start_recid=None, end_recid=None, batch_size=1000):
+    """Generate the records links, ordered by recid.
+
+    Only the recid and the last modification time of the records are
+    fetched, in batches starting after the last recid of the previous batch
+    (keyset pagination). No cursor is kept open between batches.
+
+    :param start_recid: First recid to include.
+    :param end_recid: Recid before which to stop (excluded).
+    :param batch_size: Number of records fetched per query.
+    """
+    recid = _recid_column()
+    q = (_registered_records_query(
+            recid, PersistentIdentifier.pid_value, RecordMetadata.updated)
+         .order_by(recid))
+    if end_recid is not None:
+        q = q.filter(recid < end_recid)
 
     scheme = current_app.config['ZENODO_SITEMAP_URL_SCHEME']
-    for pid, rm in q.yield_per(1000):
-        yield {
-            'loc': url_for('invenio_records_ui.recid', pid_value=pid.pid_value,
-                           _external=True, _scheme=scheme),
-            'lastmod': _sitemapdtformat(rm.updated)
-        }
+    batch = q.filter(recid >= start_recid) if start_recid is not None else q
+    while True:
+        rows = batch.limit(batch_size).all()
+        for _, pid_value, updated in rows:
+            yield {
+                'loc': url_for('invenio_records_ui.recid',
+                               pid_value=pid_value, _external=True,
+                               _scheme=scheme),
+                'lastmod': _sitemapdtformat(updated)
+            }
+        if len(rows) < batch_size:
+            break
+        batch = q.filter(recid > rows[-1][0])
+
+
+def records_page_generator(page, page_size):
+    """Generate the records links of a records page."""
+    return records_generator(
+        start_recid=page * page_size, end_recid=(page + 1) * page_size)
+
+
+def communities_lastmod():
+    """Get the number of communities and their last modification time."""
+    return (db.session.query(func.count(Community.id),
+                             func.max(Community.updated))
+            .filter(Community.deleted_at.is_(None))
+            .one())
 
 
 def communities_generator():
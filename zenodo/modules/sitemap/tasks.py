@@ -31,6 +31,9 @@ import itertools
 from celery import shared_task
 from flask import current_app, render_template, url_for
 
+from .generators import _sitemapdtformat, communities_generator, \
+    communities_lastmod, records_page_generator, records_pages
+
 
 @shared_task(ignore_results=True)
 def update_sitemap_cache(urls=None, max_url_count=None):
@@ -67,3 +70,100 @@ def update_sitemap_cache(urls=None, max_url_count=None):
         index_page = render_template('zenodo_sitemap/sitemapindex.xml',
             urlset=urlset, url_scheme=url_scheme)
         sitemap.set_cache('sitemap:0', index_page)
+
+
+def _page_url(section, page):
+    """Get the URL of a page of a sitemap section."""
+    endpoint = 'zenodo_sitemap.sitemapsection'
+    if current_app.config['ZENODO_SITEMAP_GZIP']:
+        endpoint += '_gz'
+    return url_for(endpoint, section=section, page=page, _external=True,
+                   _scheme=current_app.config['ZENODO_SITEMAP_URL_SCHEME'])
+
+
+@shared_task(ignore_results=True)
+def update_sitemap_records_page(page):
+    """Render a records page of the sitemap."""
+    siteurl = current_app.config['THEME_SITEURL']
+    with current_app.test_request_context(base_url=siteurl):
+        page_size = current_app.config['ZENODO_SITEMAP_MAX_URL_COUNT']
+        current_app.extensions['zenodo-sitemap'].set_page(
+            'records', page, records_page_generator(page, page_size))
+
+
+@shared_task(ignore_results=True)
+def update_sitemap(force=False):
+    """Update the sitemap pages of the changed records and communities.
+
+    Records pages cover fixed recid ranges (see
+    :func:`~zenodo.modules.sitemap.generators.records_pages`), and only the
+    pages with a different number of records or last modification time
+    than in the previous run are rendered again. Each page replaces its
+    previous version at once and the index is written before removing
+    the pages which became empty, so the sitemap is never partially empty.
+
+    With ``ZENODO_SITEMAP_PARALLEL`` the records pages are rendered by
+    separate tasks, so a new page may be listed in the index shortly before
+    it is available.
+
+    :param force: Render all pages, regardless of the previous run.
+    """
+    siteurl = current_app.config['THEME_SITEURL']
+    with current_app.test_request_context(base_url=siteurl):
+        sitemap = current_app.extensions['zenodo-sitemap']
+        page_size = current_app.config['ZENODO_SITEMAP_MAX_URL_COUNT']
+        gzip = current_app.config['ZENODO_SITEMAP_GZIP']
+        parallel = current_app.config['ZENODO_SITEMAP_PARALLEL']
+
+        state = {} if force else sitemap.get_state()
+        if state.get('page_size') != page_size or state.get('gzip') != gzip:
+            state = {}
+        new_state = dict(page_size=page_size, gzip=gzip, records={})
+
+        # Records, by recid range
+        old_pages = state.get('records', {})
+        for page, page_state in sorted(records_pages(page_size).items()):
+            if old_pages.get(page) != page_state:
+                if parallel:
+                    update_sitemap_records_page.delay(page)
+                else:
+                    sitemap.set_page('records', page,
+                                     records_page_generator(page, page_size))
+            new_state['records'][page] = page_state
+
+        # Communities, all pages at once
+        count, updated = communities_lastmod()
+        new_state['communities'] = state.get('communities')
+        if not new_state['communities'] or \
+                new_state['communities'][:2] != (count, updated):
+            urls = iter(communities_generator())
+            pages = 0
+            urls_slice = list(itertools.islice(urls, page_size))
+            while urls_slice:
+                sitemap.set_page('communities', pages, urls_slice)
+                pages += 1
+                urls_slice = list(itertools.islice(urls, page_size))
+            new_state['communities'] = (count, updated, pages)
+
+        urlset = [
+            {'loc': _page_url('records', page),
+             'lastmod': _sitemapdtformat(page_state[1])}
+            for page, page_state in sorted(new_state['records'].items())
+        ] + [
+            {'loc': _page_url('communities', page),
+             'lastmod': _sitemapdtformat(updated)}
+            for page in range(new_state['communities'][2])
+        ]
+        index_page = render_template(
+            'zenodo_sitemap/sitemapindex.xml', urlset=urlset,
+            url_scheme=current_app.config['ZENODO_SITEMAP_URL_SCHEME'])
+        sitemap.set_cache('sitemap:0', index_page)
+
+        for page in set(old_pages) - set(new_state['records']):
+            sitemap.delete_page('records', page)
+        old_communities = state.get('communities')
+        if old_communities:
+            for page in range(new_state['communities'][2],
+                              old_communities[2]):
+                sitemap.delete_page('communities', page)
+        sitemap.set_state(new_state)
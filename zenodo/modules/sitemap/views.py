@@ -54,3 +54,26 @@ def sitemapindex():
 def sitemappage(page):
     """Get the sitemap page."""
     return _get_cached_or_404(page)
+
+
+@blueprint.route(
+    '/sitemap-<any(records, communities):section>-<int:page>.xml',
+    methods=['GET', ])
+def sitemapsection(section, page):
+    """Get a page of a sitemap section."""
+    data = current_app.extensions['zenodo-sitemap'].get_page(section, page)
+    if not data:
+        abort(404)
+    return current_app.response_class(data, mimetype='text/xml')
+
+
+@blueprint.route(
+    '/sitemap-<any(records, communities):section>-<int:page>.xml.gz',
+    methods=['GET', ])
+def sitemapsection_gz(section, page):
+    """Get a gzip-compressed page of a sitemap section."""
+    data = current_app.extensions['zenodo-sitemap'].get_page(
+        section, page, compressed=True)
+    if not data:
+        abort(404)
+    return current_app.response_class(data, mimetype='application/gzip')
@@ -26,21 +26,31 @@
 
 import csv
 import glob
+import hashlib
+import io
 import re
 import sys
+import uuid
 from datetime import datetime as dt
+from multiprocessing import Pool
 
 import click
 from dateutil.parser import parse as dateutil_parse
+from flask import current_app
 from flask.cli import with_appcontext
+from invenio_cache import current_cache
+from invenio_db import db
+from invenio_files_rest.models import ObjectVersion
 from invenio_stats.cli import stats
 from invenio_stats.proxies import current_stats
-from six.moves import filter, map
+from six import binary_type, text_type
 from six.moves.urllib.parse import urlparse
+from sqlalchemy.orm import joinedload
 
 from zenodo.modules.stats.tasks import update_record_statistics
 from zenodo.modules.stats.utils import chunkify, \
-    extract_event_record_metadata, fetch_record, fetch_record_file
+    extract_event_record_metadata, fetch_record, fetch_record_file, \
+    fetch_records
 
 PY3 = sys.version_info[0] == 3
 
@@ -51,30 +61,45 @@ def _verify_date(ctx, param, value):
         return value
 
 
+RECORD_URL_PATH = re.compile(
+    # matches "/record/(123)", "/record/(123)/export", etc
+    r'^\/record\/(?P<recid>\d+)'
+    # matches "/record/(123)/files/(some.pdf)"
+    r'(?:\/files\/(?P<filename>.+)$)?'
+)
+
+
 def parse_record_url(url):
     """Parses a recid and filename from a record-like URL."""
     record_url = urlparse(url)
     assert record_url.hostname.lower().endswith('zenodo.org'), 'non-Zenodo url'
-    match = re.match(
-        # matches "/record/(123)", "/record/(123)/export", etc
-        r'^\/record\/(?P<recid>\d+)'
-        # matches "/record/(123)/files/(some.pdf)"
-        r'(?:\/files\/(?P<filename>.+)$)?',
-        record_url.path).groupdict()
+    match = RECORD_URL_PATH.match(record_url.path).groupdict()
     return match.get('recid'), match.get('filename')
 
 
+def _text(value):
+    """Get a value as text, decoding byte strings as UTF-8."""
+    if isinstance(value, binary_type):
+        return value.decode('utf-8')
+    return text_type(value)
+
+
 def build_common_event(record, data):
     """Build common fields of a stats event from a record and request data."""
+    return _build_event(extract_event_record_metadata(record), data)
+
+
+def _build_event(metadata, data):
+    """Build common fields of a stats event from the record's metadata."""
     return dict(
         timestamp=dt.utcfromtimestamp(float(data['timestamp'])).isoformat(),
         pid_type='recid',
-        pid_value=str(record.get('recid')),
+        pid_value=str(metadata['recid']),
         referrer=data['referrer'],
         ip_address=data['ipAddress'],
         user_agent=data['userAgent'],
         user_id=None,
-        **extract_event_record_metadata(record)
+        **metadata
     )
 
 
@@ -115,12 +140,171 @@ EVENT_TYPE_BUILDERS = {
 }
 
 
+class EventsImporter(object):
+    """Import of stats events resolving the records of rows in bulk.
+
+    The metadata of the records and files are kept in the cache for the
+    duration of the import, under keys specific to the import run, so that
+    all the workers of a run share them.
+    """
+
+    def __init__(self, event_type, run_id, chunk_size=1000):
+        """Initialize the importer."""
+        self.event_type = event_type
+        self.run_id = run_id
+        self.chunk_size = chunk_size
+        self.timeout = current_app.config['ZENODO_STATS_IMPORT_CACHE_TIMEOUT']
+
+    def _key(self, *parts):
+        """Get the cache key of a value, hashing its (text) parts."""
+        digest = hashlib.sha1(
+            u'\0'.join(_text(p) for p in parts).encode('utf-8')).hexdigest()
+        return 'stats:import:{0}:{1}'.format(self.run_id, digest)
+
+    def _cached(self, keys, fetch):
+        """Get values from the cache, fetching and storing the missing ones.
+
+        Missing values are stored as ``False`` to avoid fetching them again.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = dict(zip(keys, current_cache.get_many(
+            *[self._key(*k) for k in keys])))
+        missing = [k for k, v in values.items() if v is None]
+        if missing:
+            fetched = fetch(missing)
+            for k in missing:
+                values[k] = fetched.get(k, False)
+            current_cache.set_many(
+                dict((self._key(*k), values[k]) for k in missing),
+                timeout=self.timeout)
+        return values
+
+    @staticmethod
+    def _fetch_records(keys):
+        """Fetch the event metadata and bucket of records."""
+        records = fetch_records(recid for _, recid in keys)
+        return dict(
+            (('record', recid), {
+                'event': extract_event_record_metadata(record),
+                'bucket_id': record.get('_buckets', {}).get('record'),
+            })
+            for recid, record in records.items())
+
+    @staticmethod
+    def _fetch_files(keys):
+        """Fetch the event fields of files by bucket and key."""
+        keys = dict(((k[1], k[2]), k) for k in keys)
+        objs = ObjectVersion.query.options(
+            joinedload(ObjectVersion.file)
+        ).filter(
+            ObjectVersion.bucket_id.in_(set(b for b, _ in keys)),
+            ObjectVersion.key.in_(set(k for _, k in keys)),
+            ObjectVersion.is_head.is_(True),
+            ObjectVersion.file_id.isnot(None),
+        )
+        result = {}
+        for obj in objs:
+            k = keys.get((str(obj.bucket_id), obj.key))
+            if k:
+                result[k] = dict(
+                    bucket_id=str(obj.bucket_id),
+                    file_id=str(obj.file_id),
+                    file_key=obj.key,
+                    size=obj.file.size,
+                )
+        return result
+
+    def build_events(self, rows):
+        """Build the events of a chunk of rows, skipping invalid ones."""
+        parsed = []
+        for row in rows:
+            try:
+                recid, filename = parse_record_url(row['url'])
+                if filename is not None:
+                    filename = _text(filename)
+            except Exception:
+                continue
+            if recid and (filename or self.event_type == 'record-view'):
+                parsed.append((row, recid, filename))
+
+        records = self._cached(
+            set(('record', recid) for _, recid, _ in parsed),
+            self._fetch_records)
+
+        files = {}
+        if self.event_type == 'file-download':
+            files = self._cached(
+                set(('file', records[('record', recid)]['bucket_id'],
+                     filename)
+                    for _, recid, filename in parsed
+                    if records[('record', recid)] and
+                    records[('record', recid)]['bucket_id']),
+                self._fetch_files)
+
+        events = []
+        for row, recid, filename in parsed:
+            record = records[('record', recid)]
+            if not record:
+                continue
+            try:
+                event = _build_event(record['event'], row)
+            except Exception:
+                continue
+            if self.event_type == 'file-download':
+                obj = files.get(('file', record['bucket_id'], filename))
+                if not obj:
+                    continue
+                event.update(obj)
+            events.append(event)
+        return events
+
+    def import_file(self, csv_path):
+        """Import the events of a CSV file.
+
+        :returns: The number of published events.
+        """
+        count = 0
+        if PY3:
+            fp = io.open(csv_path, encoding='utf-8', newline='')
+        else:
+            fp = open(csv_path, 'rb')
+        with fp:
+            reader = csv.DictReader(fp, delimiter=',')
+            for rows in chunkify(reader, self.chunk_size):
+                events = self.build_events(rows)
+                if events:
+                    current_stats.publish(self.event_type, events)
+                    count += len(events)
+        return count
+
+
+_worker_app_context = None
+
+
+def _init_import_worker(app):
+    """Push an application context in an import worker process."""
+    global _worker_app_context
+    _worker_app_context = app.app_context()
+    _worker_app_context.push()
+
+
+def _import_file(args):
+    """Import a CSV file in a worker process."""
+    event_type, run_id, chunk_size, csv_path = args
+    return EventsImporter(event_type, run_id, chunk_size).import_file(
+        csv_path)
+
+
 @stats.command('import')
 @click.argument('event-type', type=click.Choice(EVENT_TYPE_BUILDERS.keys()))
 @click.argument('csv-dir', type=click.Path(file_okay=False, resolve_path=True))
-@click.option('--chunk-size', '-s', type=int, default=100)
+@click.option('--chunk-size', '-s', type=int, default=1000)
+@click.option('--workers', '-w', type=int, default=1,
+              help='Number of processes importing files in parallel.')
 @with_appcontext
-def import_events(event_type, csv_dir, chunk_size):
+def import_events(event_type, csv_dir, chunk_size, workers):
     r"""Import stats events from a directory of CSV files.
 
     Available event types: "file-download", "record-view"
@@ -133,16 +317,36 @@ def import_events(event_type, csv_dir, chunk_size):
     - url ("https://zenodo.org/record/1234/files/article.pdf")
     - timestamp (1388506249)
     - referrer ("Google", "example.com", etc)
+
+    Rows are processed in chunks, resolving the records and files of a
+    chunk with bulk queries and publishing its events at once. Files are
+    split across ``--workers`` processes.
     """
     csv_files = glob.glob(csv_dir + '/*.csv')
-    with click.progressbar(csv_files, len(csv_files)) as csv_files_bar:
-        for csv_path in csv_files_bar:
-            with open(csv_path, 'r' if PY3 else 'rb') as fp:
-                reader = csv.DictReader(fp, delimiter=',')
-                events = filter(
-                    None, map(EVENT_TYPE_BUILDERS[event_type], reader))
-                for event_chunk in chunkify(events, chunk_size):
-                    current_stats.publish(event_type, event_chunk)
+    run_id = uuid.uuid4().hex
+    count = 0
+    with click.progressbar(length=len(csv_files)) as csv_files_bar:
+        if workers > 1:
+            # Do not share database connections with the worker processes
+            db.engine.dispose()
+            pool = Pool(workers, initializer=_init_import_worker,
+                        initargs=(current_app._get_current_object(), ))
+            try:
+                args = [(event_type, run_id, chunk_size, p)
+                        for p in csv_files]
+                for n in pool.imap_unordered(_import_file, args):
+                    count += n
+                    csv_files_bar.update(1)
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            importer = EventsImporter(event_type, run_id, chunk_size)
+            for csv_path in csv_files:
+                count += importer.import_file(csv_path)
+                csv_files_bar.update(1)
+    click.secho('{0} events imported.'.format(count), fg='green')
     click.secho(
         'Run the "invenio_stats.tasks.process_events" to index the events...',
         fg='yellow')
@@ -28,11 +28,21 @@ ZENODO_STATS_PIWIK_EXPORTER = {
     'id_site': 1,
     'url': 'https://analytics.openaire.eu/piwik.php',
     'token_auth': 'api-token',
-    'chunk_size': 50  # [max piwik payload size = 64k] / [max querystring size = 750]
+    'chunk_size': 50,  # [max piwik payload size = 64k] / [max querystring size = 750]
+    'concurrency': 4,  # chunks submitted concurrently
+    'timeout': 60,
 }
 
 ZENODO_STATS_PIWIK_EXPORT_ENABLED = True
 
+# Seconds during which the records and files resolved by an import of
+# events are kept in the cache.
+ZENODO_STATS_IMPORT_CACHE_TIMEOUT = 6 * 3600
+
+# Seconds during which the statistics of a record are cached (e.g. for the
+# landing page).
+ZENODO_STATS_RECORD_CACHE_TIMEOUT = 300
+
 # Queries performed when processing aggregations might take more time than
 # usual. This is fine though, since this is happening during Celery tasks.
 ZENODO_STATS_ELASTICSEARCH_CLIENT_CONFIG = {'timeout': 60}
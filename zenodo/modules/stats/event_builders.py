@@ -26,7 +26,8 @@
 
 from zenodo.modules.records.utils import is_deposit
 
-from .utils import extract_event_record_metadata, get_record_from_context
+from .utils import bucket_event_payload, get_record_from_context, \
+    record_event_payload
 
 
 def skip_deposit(event, sender_app, **kwargs):
@@ -39,8 +40,18 @@ def skip_deposit(event, sender_app, **kwargs):
 
 
 def add_record_metadata(event, sender_app, **kwargs):
-    """Add Zenodo-specific record fields to the event."""
+    """Add Zenodo-specific record fields to the event.
+
+    For file downloads without a record in the context, the record is found
+    from the bucket of the downloaded file.
+    """
     record = get_record_from_context(**kwargs)
     if record:
-        event.update(extract_event_record_metadata(record))
+        event.update(record_event_payload(record))
+    elif kwargs.get('obj') is not None:
+        payload = bucket_event_payload(kwargs['obj'].bucket_id)
+        if payload is False:  # Deposit file
+            return None
+        if payload:
+            event.update(payload)
     return event
@@ -25,24 +25,32 @@
 """Zenodo stats exporters."""
 
 import json
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
 
 import requests
 from dateutil.parser import parse as dateutil_parse
 from elasticsearch_dsl import Search
 from flask import current_app
 from invenio_cache import current_cache
-from invenio_pidstore.errors import PIDDeletedError
 from invenio_search import current_search_client
 from invenio_search.utils import build_alias_name
+from requests.adapters import HTTPAdapter
 from six.moves.urllib.parse import urlencode, urlsplit, urlunsplit
 
 from zenodo.modules.records.serializers.schemas.common import ui_link_for
 from zenodo.modules.stats.errors import PiwikExportRequestError
-from zenodo.modules.stats.utils import chunkify, fetch_record
+from zenodo.modules.stats.utils import chunkify, fetch_records
 
 
 class PiwikExporter:
-    """Events exporter."""
+    """Events exporter.
+
+    Events are sent in chunks, several of them being submitted concurrently.
+    Chunks are however acknowledged in order, so that the bookmark only
+    moves forward and never skips a chunk that failed.
+    """
 
     def run(self, start_date=None, end_date=None, update_bookmark=True):
         """Run export job."""
@@ -69,64 +77,102 @@ class PiwikExporter:
             {'timestamp': {'order': 'asc'}}
         ).params(preserve_order=True).scan()
 
-        url = current_app.config['ZENODO_STATS_PIWIK_EXPORTER'].get('url', None)
-        token_auth = current_app.config['ZENODO_STATS_PIWIK_EXPORTER'] \
-            .get('token_auth', None)
-        chunk_size = current_app.config['ZENODO_STATS_PIWIK_EXPORTER']\
-            .get('chunk_size', 0)
-
-        for event_chunk in chunkify(events, chunk_size):
-            query_strings = []
-            for event in event_chunk:
-                if 'recid' not in event:
-                    continue
-                try:
-                    query_string = self._build_query_string(event)
-                    query_strings.append(query_string)
-                except PIDDeletedError:
-                    pass
-
-            # Check and bail if the bookmark has progressed, e.g. from another
-            # duplicate task or manual run of the exporter.
-            bookmark = current_cache.get('piwik_export:bookmark')
-            if event_chunk[-1].timestamp < bookmark:
-                return
-
-            payload = {
-                'requests': query_strings,
-                'token_auth': token_auth
-            }
-            res = requests.post(url, json=payload, timeout=60)
-
-            # Failure: not 200 or not "success"
-            content = res.json() if res.ok else None
-            if res.status_code == 200 and content.get('status') == 'success':
-                if content.get('invalid') != 0:
-                    msg = 'Invalid events in Piwik export request.'
-                    info = {
-                        'begin_event_timestamp': event_chunk[0].timestamp,
-                        'end_event_timestamp': event_chunk[-1].timestamp,
-                        'invalid_events': content.get('invalid')
-                    }
-                    current_app.logger.warning(msg, extra=info)
-                elif update_bookmark is True:
-                    current_cache.set('piwik_export:bookmark',
-                                      event_chunk[-1].timestamp,
-                                      timeout=-1)
-            else:
+        config = current_app.config['ZENODO_STATS_PIWIK_EXPORTER']
+        url = config.get('url', None)
+        token_auth = config.get('token_auth', None)
+        chunk_size = config.get('chunk_size', 0)
+        concurrency = config.get('concurrency', 1)
+        timeout = config.get('timeout', 60)
+
+        session = requests.Session()
+        session.mount(url, HTTPAdapter(pool_maxsize=concurrency))
+        pool = ThreadPool(concurrency)
+        pending = deque()
+        stats = {'events': 0, 'chunks': 0}
+        started = default_timer()
+        try:
+            for event_chunk in chunkify(events, chunk_size):
+                # Check and bail if the bookmark has progressed, e.g. from
+                # another duplicate task or manual run of the exporter.
+                bookmark = current_cache.get('piwik_export:bookmark')
+                if bookmark and event_chunk[-1].timestamp < bookmark:
+                    break
+
+                records = fetch_records(
+                    e.recid for e in event_chunk if 'recid' in e)
+                query_strings = [
+                    self._build_query_string(event, records[str(event.recid)])
+                    for event in event_chunk
+                    if 'recid' in event and str(event.recid) in records
+                ]
+                payload = {
+                    'requests': query_strings,
+                    'token_auth': token_auth
+                }
+                pending.append((event_chunk, pool.apply_async(
+                    session.post, (url, ),
+                    {'json': payload, 'timeout': timeout})))
+
+                while len(pending) >= concurrency:
+                    self._acknowledge(
+                        *pending.popleft(), update_bookmark=update_bookmark,
+                        stats=stats)
+            while pending:
+                self._acknowledge(
+                    *pending.popleft(), update_bookmark=update_bookmark,
+                    stats=stats)
+        finally:
+            pool.terminate()
+            session.close()
+
+        duration = default_timer() - started
+        stats['duration'] = duration
+        stats['events_per_second'] = \
+            stats['events'] / duration if duration else 0
+        current_app.logger.info('Piwik export finished.', extra=stats)
+        return stats
+
+    def _acknowledge(self, event_chunk, result, update_bookmark=True,
+                     stats=None):
+        """Wait for the submission of a chunk and move the bookmark."""
+        try:
+            res = result.get()
+        except requests.RequestException:
+            res = None
+
+        # Failure: not 200 or not "success"
+        content = res.json() if res is not None and res.ok else None
+        if res is not None and res.status_code == 200 and \
+                content.get('status') == 'success':
+            stats['events'] += len(event_chunk)
+            stats['chunks'] += 1
+            if content.get('invalid') != 0:
                 msg = 'Invalid events in Piwik export request.'
                 info = {
                     'begin_event_timestamp': event_chunk[0].timestamp,
                     'end_event_timestamp': event_chunk[-1].timestamp,
+                    'invalid_events': content.get('invalid')
                 }
-                raise PiwikExportRequestError(msg, export_info=info)
+                current_app.logger.warning(msg, extra=info)
+            elif update_bookmark is True:
+                bookmark = current_cache.get('piwik_export:bookmark')
+                if not bookmark or bookmark < event_chunk[-1].timestamp:
+                    current_cache.set('piwik_export:bookmark',
+                                      event_chunk[-1].timestamp,
+                                      timeout=-1)
+        else:
+            msg = 'Invalid events in Piwik export request.'
+            info = {
+                'begin_event_timestamp': event_chunk[0].timestamp,
+                'end_event_timestamp': event_chunk[-1].timestamp,
+            }
+            raise PiwikExportRequestError(msg, export_info=info)
 
-    def _build_query_string(self, event):
+    def _build_query_string(self, event, record):
         id_site = current_app.config['ZENODO_STATS_PIWIK_EXPORTER']\
             .get('id_site', None)
         url = ui_link_for('record_html', id=event.recid)
         visitor_id = event.visitor_id[0:16]
-        _, record = fetch_record(event.recid)
         oai = record.get('_oai', {}).get('id')
         cvar = json.dumps({'1': ['oaipmhID', oai]})
         action_name = record.get('title')[:150]  # max 150 characters
@@ -25,15 +25,32 @@
 """Statistics utilities."""
 
 import itertools
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
 
 from elasticsearch.exceptions import NotFoundError
-from flask import request
+from elasticsearch.helpers import bulk
+from elasticsearch_dsl import Search
+from flask import g, has_request_context, request
+from invenio_cache import current_cache
+from invenio_db import db
+from invenio_pidrelations.models import PIDRelation
+from invenio_pidrelations.utils import resolve_relation_type_config
+from invenio_pidstore.models import PersistentIdentifier, PIDStatus
+from invenio_records.api import Record
+from invenio_records.models import RecordMetadata
+from invenio_records_files.models import RecordsBuckets
 from invenio_search.api import RecordsSearch
 from invenio_search.proxies import current_search_client
 from invenio_search.utils import build_alias_name
 from invenio_stats import current_stats
+from sqlalchemy import or_
+from sqlalchemy.orm import aliased
 
+from zenodo.modules.records.api import ZenodoRecord
 from zenodo.modules.records.resolvers import record_resolver
+from zenodo.modules.records.utils import is_deposit
 from flask import current_app
 
 try:
@@ -67,48 +84,123 @@ def extract_event_record_metadata(record):
     )
 
 
-def build_record_stats(recid, conceptrecid):
-    """Build the record's stats."""
-    stats = {}
-    stats_sources = {
-        'record-view': {
-            'params': {'recid': recid},
-            'fields': {
-                'views': 'count',
-                'unique_views': 'unique_count',
-            },
-        },
-        'record-download': {
-            'params': {'recid': recid},
-            'fields': {
-                'downloads': 'count',
-                'unique_downloads': 'unique_count',
-                'volume': 'volume',
-            },
+class LRUCache(object):
+    """Thread-safe, bounded, least recently used cache."""
+
+    def __init__(self, maxsize):
+        """Initialize the cache."""
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Get a value, or ``None`` if not cached."""
+        with self._lock:
+            value = self._data.pop(key, None)
+            if value is not None:
+                self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        """Cache a value, evicting the least recently used one if full."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+
+_event_payloads = LRUCache(4096)
+"""Event payloads of records by record UUID and revision."""
+
+
+def record_event_payload(record):
+    """Get the statistics event payload of a record.
+
+    The payload only depends on the record revision, so it is built once per
+    revision and reused for every event of the record.
+    """
+    revision_id = getattr(record, 'revision_id', None)
+    if revision_id is None:
+        return extract_event_record_metadata(record)
+    key = (str(record.id), revision_id)
+    return _event_payloads.get(key) or \
+        _event_payloads.set(key, extract_event_record_metadata(record))
+
+
+def bucket_event_payload(bucket_id):
+    """Get the statistics event payload of the record of a bucket.
+
+    Only the record UUID and revision are queried, the record itself is
+    loaded only if its payload is not cached yet.
+
+    :returns: The payload, ``False`` for deposits, or ``None`` if the bucket
+        does not belong to a single record.
+    """
+    rows = db.session.query(
+        RecordMetadata.id, RecordMetadata.version_id
+    ).join(
+        RecordsBuckets, RecordsBuckets.record_id == RecordMetadata.id
+    ).filter(RecordsBuckets.bucket_id == bucket_id).all()
+    if len(rows) != 1:  # Extra formats bucket or unknown bucket
+        return None
+    record_id, version_id = rows[0]
+    key = (str(record_id), version_id - 1)
+    payload = _event_payloads.get(key)
+    if payload is None:
+        record = Record.get_record(record_id)
+        payload = _event_payloads.set(
+            key,
+            False if is_deposit(record)
+            else extract_event_record_metadata(record))
+    return payload
+
+
+RECORD_STATS_SOURCES = {
+    'record-view': {
+        'param': 'recid',
+        'fields': {
+            'views': 'count',
+            'unique_views': 'unique_count',
         },
-        'record-view-all-versions': {
-            'params': {'conceptrecid': conceptrecid},
-            'fields': {
-                'version_views': 'count',
-                'version_unique_views': 'unique_count',
-            }
+    },
+    'record-download': {
+        'param': 'recid',
+        'fields': {
+            'downloads': 'count',
+            'unique_downloads': 'unique_count',
+            'volume': 'volume',
         },
-        'record-download-all-versions': {
-            'params': {'conceptrecid': conceptrecid},
-            'fields': {
-                'version_downloads': 'count',
-                'version_unique_downloads': 'unique_count',
-                'version_volume': 'volume',
-            },
+    },
+    'record-view-all-versions': {
+        'param': 'conceptrecid',
+        'fields': {
+            'version_views': 'count',
+            'version_unique_views': 'unique_count',
+        }
+    },
+    'record-download-all-versions': {
+        'param': 'conceptrecid',
+        'fields': {
+            'version_downloads': 'count',
+            'version_unique_downloads': 'unique_count',
+            'version_volume': 'volume',
         },
-    }
-    for query_name, cfg in stats_sources.items():
+    },
+}
+"""Statistics queries used to build the records' "_stats" field."""
+
+
+def build_record_stats(recid, conceptrecid):
+    """Build the record's stats."""
+    stats = {}
+    params = {'recid': recid, 'conceptrecid': conceptrecid}
+    for query_name, cfg in RECORD_STATS_SOURCES.items():
         try:
             query_cfg = current_stats.queries[query_name]
             query = query_cfg.cls(name=query_name, **query_cfg.params)
-            current_app.logger.warn('building record stats, '+format(query_cfg)+':'+format(query_name)+':'+format(query_cfg.params))
-            result = query.run(**cfg['params'])
-            current_app.logger.warn('built record stats, '+format(result))
+            result = query.run(**{cfg['param']: params[cfg['param']]})
             for dst, src in cfg['fields'].items():
                 stats[dst] = result.get(src)
         except Exception:
@@ -116,23 +208,226 @@ def build_record_stats(recid, conceptrecid):
     return stats
 
 
+def build_records_stats(records):
+    """Build the stats of many records at once.
+
+    Instead of running each statistics query per record, each query is run
+    once for all the records, aggregating its metrics per recid (or
+    conceptrecid). Versions of the same concept share their results.
+
+    :param records: List of ``(recid, conceptrecid)`` tuples.
+    :returns: Dictionary of recid to stats.
+    """
+    params = {
+        'recid': {str(r) for r, _ in records if r},
+        'conceptrecid': {str(c) for _, c in records if c},
+    }
+    results = {}
+    for query_name, cfg in RECORD_STATS_SOURCES.items():
+        values = params[cfg['param']]
+        if not values:
+            continue
+        try:
+            query_cfg = current_stats.queries[query_name]
+            query = query_cfg.cls(name=query_name, **query_cfg.params)
+            field = query.required_filters[cfg['param']]
+            search = Search(using=query.client, index=query.index)[0:0]
+            for modifier in query.query_modifiers:
+                search = modifier(search)
+            search = search.filter('terms', **{field: list(values)})
+            buckets = search.aggs.bucket(
+                'ids', 'terms', field=field, size=len(values))
+            for dst, (metric, src, opts) in query.metric_fields.items():
+                buckets.metric(dst, metric, field=src, **opts)
+            res = search.execute().to_dict()
+            metrics = {
+                str(b['key']): {m: b[m]['value'] for m in query.metric_fields}
+                for b in res['aggregations']['ids']['buckets']
+            }
+        except Exception:
+            continue
+        # Like the single record query, records without events get zeros.
+        empty = {m: 0.0 for m in query.metric_fields}
+        results[query_name] = {v: metrics.get(v, empty) for v in values}
+
+    stats = {}
+    for recid, conceptrecid in records:
+        record_stats = stats.setdefault(recid, {})
+        ids = {'recid': str(recid), 'conceptrecid': str(conceptrecid)}
+        for query_name, cfg in RECORD_STATS_SOURCES.items():
+            result = results.get(query_name, {}).get(ids[cfg['param']])
+            if result is not None:
+                for dst, src in cfg['fields'].items():
+                    record_stats[dst] = result.get(src)
+    return stats
+
+
+def record_versions(conceptrecids):
+    """Get the published versions of many concepts with a single query.
+
+    :returns: List of ``(recid, conceptrecid, record_uuid)`` tuples.
+    """
+    if not conceptrecids:
+        return []
+    version_type = resolve_relation_type_config('version').id
+    parent = aliased(PersistentIdentifier)
+    child = aliased(PersistentIdentifier)
+    return db.session.query(
+        child.pid_value, parent.pid_value, child.object_uuid
+    ).join(
+        PIDRelation, PIDRelation.child_id == child.id
+    ).join(
+        parent, PIDRelation.parent_id == parent.id
+    ).filter(
+        parent.pid_type == 'recid',
+        parent.pid_value.in_([str(c) for c in conceptrecids]),
+        PIDRelation.relation_type == version_type,
+        child.status == PIDStatus.REGISTERED,
+    ).all()
+
+
+def changed_concepts(conceptrecids, since):
+    """Get the concepts with a version, PID or record changed since a date.
+
+    :returns: Set of concept recids.
+    """
+    if not conceptrecids:
+        return set()
+    version_type = resolve_relation_type_config('version').id
+    parent = aliased(PersistentIdentifier)
+    child = aliased(PersistentIdentifier)
+    return set(c for c, in db.session.query(
+        parent.pid_value
+    ).join(
+        PIDRelation, PIDRelation.parent_id == parent.id
+    ).join(
+        child, PIDRelation.child_id == child.id
+    ).outerjoin(
+        RecordMetadata, RecordMetadata.id == child.object_uuid
+    ).filter(
+        parent.pid_type == 'recid',
+        parent.pid_value.in_([str(c) for c in conceptrecids]),
+        PIDRelation.relation_type == version_type,
+        or_(parent.updated >= since, child.updated >= since,
+            RecordMetadata.updated >= since),
+    ).distinct())
+
+
+def update_records_stats(versions, chunk_size=500):
+    """Update only the "_stats" field of indexed records.
+
+    Stats are computed in bulk for each chunk of records and written back
+    into their current document, leaving the rest of it untouched. The
+    document is re-indexed with its current external version rather than
+    with the update API, which would bump the version and make the next
+    indexing of the record revision conflict. A newer revision indexed in
+    the meantime is therefore kept, but not a re-indexing of the same
+    revision (e.g. of the siblings of a new version), which the written
+    document would overwrite. The records of concepts changed in the
+    database since the search are thus skipped: they are being re-indexed,
+    with fresh stats. Changes made by a transaction started before the
+    search can still be overwritten, until the next indexing of the record.
+
+    :param versions: List of ``(recid, conceptrecid, record_uuid)`` tuples.
+    :returns: UUIDs of the records which are not indexed yet.
+    """
+    missing = []
+    for chunk in chunkify(versions, chunk_size):
+        stats = build_records_stats([(r, c) for r, c, _ in chunk])
+        recids = dict((str(uuid), recid) for recid, _, uuid in chunk)
+        concepts = dict((str(uuid), c) for _, c, uuid in chunk)
+        since = datetime.utcnow()
+        hits = Search(
+            using=current_search_client,
+            index=build_alias_name('records'),
+        ).filter('ids', values=list(recids)).extra(
+            version=True)[:len(recids)].execute()
+
+        changed = changed_concepts(set(concepts.values()), since)
+        actions = []
+        for hit in hits:
+            source = hit.to_dict()
+            record_stats = stats.get(recids.pop(hit.meta.id))
+            if source.get('_stats') == record_stats or \
+                    concepts[hit.meta.id] in changed:
+                continue
+            source['_stats'] = record_stats
+            actions.append({
+                '_op_type': 'index',
+                '_index': hit.meta.index,
+                '_id': hit.meta.id,
+                '_version': hit.meta.version,
+                '_version_type': 'external_gte',
+                '_source': source,
+            })
+        if actions:
+            _, errors = bulk(
+                current_search_client, actions, raise_on_error=False)
+            for error in errors:
+                info = error.get('index', {})
+                if info.get('status') == 409:
+                    # A newer revision of the record was indexed
+                    continue
+                current_app.logger.error(
+                    'could not update the stats of record {0}: {1}'.format(
+                        info.get('_id'), info.get('error')))
+            current_cache.delete_many(
+                *[_record_stats_key(a['_id']) for a in actions])
+        missing.extend(recids)
+    return missing
+
+
+def _record_stats_key(recordid):
+    return 'stats:record:{0}'.format(recordid)
+
+
+def get_records_stats(recordids, throws=True):
+    """Fetch the statistics of many records.
+
+    Statistics are memoized for the duration of the request and cached for
+    ``ZENODO_STATS_RECORD_CACHE_TIMEOUT`` seconds. The ones missing from
+    both are fetched from Elasticsearch with a single request.
+
+    :returns: Dictionary of record UUID (as string) to statistics, or
+        ``None`` for records which are not indexed.
+    """
+    recordids = [str(r) for r in recordids]
+    memo = g.setdefault('zenodo_record_stats', {}) \
+        if has_request_context() else {}
+    missing = [r for r in recordids if r not in memo]
+    if missing:
+        cached = current_cache.get_many(
+            *[_record_stats_key(r) for r in missing])
+        memo.update((r, s) for r, s in zip(missing, cached) if s is not None)
+        missing = [r for r in missing if r not in memo]
+    if missing:
+        try:
+            res = current_search_client.mget(
+                index=build_alias_name('records'),
+                body={'ids': missing},
+                params={'_source_includes': '_stats'},
+            )
+        except NotFoundError:
+            res = {'docs': []}
+        except Exception:
+            if throws:
+                raise
+            res = {'docs': []}
+        found = dict(
+            (doc['_id'], doc['_source'].get('_stats'))
+            for doc in res['docs'] if doc.get('found'))
+        memo.update((r, found.get(r)) for r in missing)
+        if found:
+            current_cache.set_many(
+                dict((_record_stats_key(r), s) for r, s in found.items()),
+                timeout=current_app.config[
+                    'ZENODO_STATS_RECORD_CACHE_TIMEOUT'])
+    return dict((r, memo[r]) for r in recordids)
+
+
 def get_record_stats(recordid, throws=True):
     """Fetch record statistics from Elasticsearch."""
-    try:
-        current_app.logger.warn('getting '+format(build_alias_name('records'))+':'+format(id))
-        res = current_search_client.get(
-            index=build_alias_name('records'),
-            id=recordid,
-            params={'_source_includes': '_stats'},
-        )
-        current_app.logger.warn('got '+format(res))
-        return res['_source']['_stats']
-    except NotFoundError:
-        return None
-    except Exception:
-        if throws:
-            raise
-        pass
+    return get_records_stats([recordid], throws=throws)[str(recordid)]
 
 
 def chunkify(iterable, n):
@@ -151,6 +446,30 @@ def fetch_record(recid):
     return record_resolver.resolve(recid)
 
 
+def fetch_records(recids):
+    """Fetch the records of several recids with a single query.
+
+    :returns: Dictionary of the records by recid. Deleted or unknown recids
+        are left out.
+    """
+    recids = set(str(recid) for recid in recids)
+    if not recids:
+        return {}
+    query = db.session.query(
+        PersistentIdentifier.pid_value, RecordMetadata
+    ).join(
+        RecordMetadata, RecordMetadata.id == PersistentIdentifier.object_uuid
+    ).filter(
+        PersistentIdentifier.pid_type == 'recid',
+        PersistentIdentifier.pid_value.in_(recids),
+        PersistentIdentifier.status == PIDStatus.REGISTERED,
+        RecordMetadata.json.isnot(None),
+    )
+    return dict(
+        (recid, ZenodoRecord(model.json, model=model))
+        for recid, model in query)
+
+
 @lru_cache(maxsize=1024)
 def fetch_record_file(recid, filename):
     """Cached record file fetch."""
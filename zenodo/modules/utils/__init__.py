@@ -26,8 +26,9 @@
 
 from __future__ import absolute_import, print_function
 
-from .common import obj_or_import_string
+from .common import delete_cache_after_commit, obj_or_import_string
 
 __all__ = (
+    'delete_cache_after_commit',
     'obj_or_import_string',
 )
@@ -27,8 +27,15 @@
 from __future__ import absolute_import, print_function
 
 import six
+from invenio_cache import current_cache
+from invenio_db import db
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from werkzeug.utils import import_string
 
+_CACHE_KEYS = 'zenodo_delete_cache_keys'
+"""Session info key of the cache entries to delete after the transaction."""
+
 
 def obj_or_import_string(value, default=None):
     """Import string or return object.
@@ -42,3 +49,26 @@ def obj_or_import_string(value, default=None):
     elif value:
         return value
     return default
+
+
+def delete_cache_after_commit(*keys):
+    """Delete cache entries now and once the current transaction is over.
+
+    An entry deleted before the transaction is committed can be cached again
+    from the old state by a concurrent reader, so the keys are also kept on
+    the session and deleted again when its outermost transaction is
+    committed or rolled back.
+
+    :params keys: Cache keys to delete.
+    """
+    current_cache.delete_many(*keys)
+    db.session.info.setdefault(_CACHE_KEYS, set()).update(keys)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _delete_cache_keys(session, transaction):
+    """Delete the cache entries collected during a transaction."""
+    if transaction.parent is None:
+        keys = session.info.pop(_CACHE_KEYS, None)
+        if keys:
+            current_cache.delete_many(*keys)